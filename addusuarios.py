@@ -1,5 +1,6 @@
 from db.database import SessionLocal
 from db.models import User
+from api.carteira import lancar, conta_usuario, CONTA_BONUS
 from passlib.context import CryptContext
 
 # Configura o contexto do PassLib com bcrypt
@@ -23,9 +24,11 @@ for user_data in usuarios:
             username=user_data["username"],
             email=user_data["email"],
             password=hashed_password,  # aqui usamos 'password' porque é o nome do campo
-            balance=100.0
         )
         db.add(novo_user)
+        db.flush()
+        # Saldo inicial de 100 reais (em centavos) entra pelo livro-razão
+        lancar(db, CONTA_BONUS, conta_usuario(novo_user.id), 10000, "bonus")
 
 db.commit()
 db.close()
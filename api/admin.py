@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from db.database import get_db
+from db.models import Mesa
+from db.dinheiro import reais_para_centavos
+from api.auth import get_current_user, UsuarioAutenticado, cache_usuarios
+from api.schemas import MesaConfigInput
+from api.senhas import pool_senhas
+from api import perfil_sql
+from game.config_mesas import carregar_configs, invalidar_config, obter_config
+from game.assentos import carregar_indice_assentos
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+CAMPOS_EM_CENTAVOS = {"valor_minimo", "valor_minimo_aposta", "small_blind", "big_blind"}
+
+
+def exigir_admin(current_user: UsuarioAutenticado = Depends(get_current_user)) -> UsuarioAutenticado:
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Acesso restrito a administradores.")
+    return current_user
+
+
+@router.put("/mesas/{mesa_id}")
+def editar_mesa(
+    mesa_id: int,
+    dados: MesaConfigInput,
+    db: Session = Depends(get_db),
+    admin: UsuarioAutenticado = Depends(exigir_admin),
+):
+    mesa = db.query(Mesa).filter(Mesa.id == mesa_id).first()
+    if not mesa:
+        raise HTTPException(status_code=404, detail="Mesa não encontrada.")
+
+    for campo, valor in dados.model_dump(exclude_unset=True).items():
+        if campo in CAMPOS_EM_CENTAVOS and valor is not None:
+            valor = reais_para_centavos(valor)
+        setattr(mesa, campo, valor)
+
+    db.commit()
+    invalidar_config(mesa_id)
+    obter_config(db, mesa_id)
+    carregar_indice_assentos(db)  # blinds ou limite podem ter mudado a faixa da mesa
+
+    return {"msg": f"Mesa {mesa.nome} atualizada."}
+
+
+@router.post("/mesas/recarregar_config")
+def recarregar_config_mesas(db: Session = Depends(get_db), admin: UsuarioAutenticado = Depends(exigir_admin)):
+    carregar_configs(db)
+    carregar_indice_assentos(db)
+    return {"msg": "Configuração das mesas recarregada."}
+
+
+@router.get("/cache/auth")
+def estatisticas_cache_auth(admin: UsuarioAutenticado = Depends(exigir_admin)):
+    return cache_usuarios.estatisticas()
+
+
+@router.get("/pool/senhas")
+def estatisticas_pool_senhas(admin: UsuarioAutenticado = Depends(exigir_admin)):
+    return pool_senhas.estatisticas()
+
+
+@router.get("/perfil_sql")
+def relatorio_perfil_sql(admin: UsuarioAutenticado = Depends(exigir_admin)):
+    if not perfil_sql.ATIVO:
+        raise HTTPException(status_code=404, detail="Perfil de SQL desligado (PANO_PERFIL_SQL).")
+    return perfil_sql.relatorio.gerar()
+
+
+@router.delete("/perfil_sql")
+def limpar_perfil_sql(admin: UsuarioAutenticado = Depends(exigir_admin)):
+    perfil_sql.relatorio.limpar()
+    return {"msg": "Relatório de SQL zerado."}
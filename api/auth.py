@@ -1,4 +1,10 @@
-from passlib.context import CryptContext
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
@@ -6,6 +12,7 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from db.database import get_db
 from db.models import User
+from api.metricas import Coletor
 
 
 
@@ -13,13 +20,27 @@ from db.models import User
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
 # Configurações de senha
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Custo do bcrypt configurável. Com rehash ligado, hashes gravados com custo
+# menor que o atual são refeitos no próximo login (ver api/senhas.py).
+BCRYPT_ROUNDS = int(os.getenv("PANO_BCRYPT_ROUNDS", "12"))
+REHASH_NO_LOGIN = os.getenv("PANO_REHASH_NO_LOGIN", "1") == "1"
+
+_config_bcrypt = {"bcrypt__default_rounds": BCRYPT_ROUNDS}
+if REHASH_NO_LOGIN:
+    _config_bcrypt["bcrypt__min_rounds"] = BCRYPT_ROUNDS
+
+# passlib/bcrypt só são importados no primeiro uso (login, cadastro)
+@lru_cache(maxsize=1)
+def contexto_senhas():
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", **_config_bcrypt)
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return contexto_senhas().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return contexto_senhas().verify(plain_password, hashed_password)
 
 # JWT Config
 SECRET_KEY = "pano_poker_secret_key_123"  # Em prod, usa variável de ambiente
@@ -28,7 +49,8 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
 # Criar o token com o ID do usuário
 def create_access_token(user_id: int, expires_delta: timedelta | None = None) -> str:
-    to_encode = {"sub": str(user_id)}
+    # jti identifica o token no cache de usuários autenticados
+    to_encode = {"sub": str(user_id), "jti": uuid.uuid4().hex}
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
@@ -37,11 +59,104 @@ def create_access_token(user_id: int, expires_delta: timedelta | None = None) ->
 def decode_access_token(token: str) -> dict:
     return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
 
+# Dados do usuário autenticado que as rotas usam. Fica em cache entre requests,
+# então não é um objeto do SQLAlchemy preso a uma sessão.
+@dataclass(frozen=True)
+class UsuarioAutenticado:
+    id: int
+    username: str
+    email: str
+    is_admin: bool
+
+
+AUTH_CACHE_TTL_SEGUNDOS = float(os.getenv("PANO_AUTH_CACHE_TTL", "30"))
+AUTH_CACHE_TAMANHO = int(os.getenv("PANO_AUTH_CACHE_TAMANHO", "10000"))
+
+
+class CacheDeUsuarios:
+    """LRU com TTL, chaveado pelo jti do token."""
+
+    def __init__(self, ttl: float, tamanho: int):
+        self.ttl = ttl
+        self.tamanho = tamanho
+        self._itens: OrderedDict[str, tuple[float, UsuarioAutenticado]] = OrderedDict()
+        self._chaves_por_usuario: dict[int, set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def obter(self, chave: str) -> UsuarioAutenticado | None:
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    self._remover(chave)
+                self.misses += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.hits += 1
+            return item[1]
+
+    def guardar(self, chave: str, usuario: UsuarioAutenticado, expira_em: float):
+        with self._lock:
+            if chave in self._itens:
+                self._remover(chave)
+            self._itens[chave] = (min(time.monotonic() + self.ttl, expira_em), usuario)
+            self._chaves_por_usuario.setdefault(usuario.id, set()).add(chave)
+            while len(self._itens) > self.tamanho:
+                self._remover(next(iter(self._itens)))
+                self.evictions += 1
+
+    def invalidar_usuario(self, user_id: int):
+        with self._lock:
+            for chave in list(self._chaves_por_usuario.get(user_id, ())):
+                self._remover(chave)
+
+    def _remover(self, chave: str):
+        _, usuario = self._itens.pop(chave)
+        chaves = self._chaves_por_usuario.get(usuario.id)
+        if chaves is not None:
+            chaves.discard(chave)
+            if not chaves:
+                del self._chaves_por_usuario[usuario.id]
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {
+                "tamanho": len(self._itens),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+cache_usuarios = CacheDeUsuarios(AUTH_CACHE_TTL_SEGUNDOS, AUTH_CACHE_TAMANHO)
+
+Coletor("panopoker_auth_cache_tamanho", "Entradas no cache de autenticação", lambda: cache_usuarios.estatisticas()["tamanho"])
+Coletor("panopoker_auth_cache_hits_total", "Acertos do cache de autenticação", lambda: cache_usuarios.estatisticas()["hits"], "counter")
+Coletor("panopoker_auth_cache_misses_total", "Faltas do cache de autenticação", lambda: cache_usuarios.estatisticas()["misses"], "counter")
+Coletor("panopoker_auth_cache_evictions_total", "Entradas descartadas do cache de autenticação", lambda: cache_usuarios.estatisticas()["evictions"], "counter")
+
+
+def invalidar_usuario(user_id: int):
+    cache_usuarios.invalidar_usuario(user_id)
+
+
+def id_do_token(token: str) -> int | None:
+    """Id do usuário de um token válido, sem ir ao banco; None se o token não vale."""
+    try:
+        user_id = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+        return int(user_id) if user_id is not None else None
+    except (JWTError, ValueError):
+        return None
+
+
 # Pegar o usuário atual pelo ID contido no token
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-) -> User:
+) -> UsuarioAutenticado:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Credenciais inválidas",
@@ -49,16 +164,32 @@ def get_current_user(
     )
 
     try:
-        # Decodificando o token
+        # Decodificando o token (valida assinatura e expiração)
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        user = db.query(User).filter(User.id == int(user_id)).first()
-        if user is None:
-            raise credentials_exception
-        return user
     except JWTError:
         raise credentials_exception
 
+    user_id = payload.get("sub")
+    if user_id is None:
+        raise credentials_exception
+
+    # Tokens antigos não têm jti: usa o próprio token como chave
+    chave = payload.get("jti") or token
+    usuario = cache_usuarios.obter(chave)
+    if usuario is not None:
+        return usuario
 
+    user = db.query(User).filter(User.id == int(user_id)).first()
+    if user is None:
+        raise credentials_exception
+
+    usuario = UsuarioAutenticado(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        is_admin=bool(user.is_admin),
+    )
+    # Não deixa o cache segurar o usuário depois do token expirar
+    expira_em = time.monotonic() + (payload["exp"] - time.time() if "exp" in payload else AUTH_CACHE_TTL_SEGUNDOS)
+    cache_usuarios.guardar(chave, usuario, expira_em)
+    return usuario
@@ -0,0 +1,193 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.orm import Session
+from db.models import Lancamento, SaldoSnapshot
+from api.auth import invalidar_usuario
+
+# Contas do livro-razão
+CONTA_MERCADO_PAGO = "externo:mercadopago"
+CONTA_BONUS = "externo:bonus"
+CONTA_TAXAS = "receita:taxas"
+
+# Quantos lançamentos novos uma conta precisa acumular pra ganhar snapshot novo
+SNAPSHOT_A_CADA = 20
+SNAPSHOT_INTERVALO_SEGUNDOS = 60
+
+
+class SaldoInsuficiente(Exception):
+    pass
+
+
+def conta_usuario(user_id: int) -> str:
+    return f"usuario:{user_id}"
+
+
+def conta_mesa(mesa_id: int) -> str:
+    return f"mesa:{mesa_id}"
+
+
+def conta_torneio(torneio_id: int) -> str:
+    return f"torneio:{torneio_id}"
+
+
+def lancar(db: Session, origem: str, destino: str, valor: int, tipo: str, referencia: str | None = None) -> str:
+    """
+    Move `valor` centavos de `origem` pra `destino` gravando o par de lançamentos.
+    Não faz commit: quem chama comita junto com o resto da operação.
+    """
+    if valor <= 0:
+        raise ValueError("Valor do lançamento deve ser positivo.")
+
+    lote = uuid.uuid4().hex
+    db.add_all([
+        Lancamento(lote=lote, conta=origem, valor=-valor, tipo=tipo, referencia=referencia),
+        Lancamento(lote=lote, conta=destino, valor=valor, tipo=tipo, referencia=referencia),
+    ])
+
+    # Usuários com saldo mexido perdem a entrada no cache de autenticação
+    for conta in (origem, destino):
+        if conta.startswith("usuario:"):
+            invalidar_usuario(int(conta.split(":", 1)[1]))
+    return lote
+
+
+def lancar_em_lote(db: Session, movimentos: list[tuple[str, str, int, str, str | None]]):
+    """
+    Vários `lancar` num único INSERT em lote: (origem, destino, valor, tipo, referencia).
+    Pra carga em massa (provisionar.py); no jogo use lancar. Não faz commit.
+    """
+    linhas = []
+    for origem, destino, valor, tipo, referencia in movimentos:
+        if valor <= 0:
+            raise ValueError("Valor do lançamento deve ser positivo.")
+        lote = uuid.uuid4().hex
+        linhas.append({"lote": lote, "conta": origem, "valor": -valor, "tipo": tipo, "referencia": referencia})
+        linhas.append({"lote": lote, "conta": destino, "valor": valor, "tipo": tipo, "referencia": referencia})
+    if linhas:
+        db.execute(insert(Lancamento), linhas)
+
+    for origem, destino, *_ in movimentos:
+        for conta in (origem, destino):
+            if conta.startswith("usuario:"):
+                invalidar_usuario(int(conta.split(":", 1)[1]))
+
+
+def saldo(db: Session, conta: str) -> int:
+    snapshot = (
+        db.query(SaldoSnapshot)
+        .filter(SaldoSnapshot.conta == conta)
+        .order_by(SaldoSnapshot.ultimo_lancamento_id.desc())
+        .first()
+    )
+    base = snapshot.saldo if snapshot else 0
+    desde = snapshot.ultimo_lancamento_id if snapshot else 0
+
+    cauda = (
+        db.query(func.coalesce(func.sum(Lancamento.valor), 0))
+        .filter(Lancamento.conta == conta, Lancamento.id > desde)
+        .scalar()
+    )
+    return base + cauda
+
+
+def saldo_usuario(db: Session, user_id: int) -> int:
+    return saldo(db, conta_usuario(user_id))
+
+
+def _saldo_em_sql(conta: str):
+    """Mesma conta de `saldo`, como expressão pra usar dentro de outro comando."""
+    ultimo_snapshot = (
+        select(SaldoSnapshot)
+        .where(SaldoSnapshot.conta == conta)
+        .order_by(SaldoSnapshot.ultimo_lancamento_id.desc())
+        .limit(1)
+        .subquery()
+    )
+    base = func.coalesce(select(ultimo_snapshot.c.saldo).scalar_subquery(), 0)
+    desde = func.coalesce(select(ultimo_snapshot.c.ultimo_lancamento_id).scalar_subquery(), 0)
+    cauda = (
+        select(func.coalesce(func.sum(Lancamento.valor), 0))
+        .where(Lancamento.conta == conta, Lancamento.id > desde)
+        .scalar_subquery()
+    )
+    return base + cauda
+
+
+def debitar_usuario(db: Session, user_id: int, destino: str, valor: int, tipo: str, referencia: str | None = None) -> str:
+    """
+    `lancar` saindo da conta do usuário, só se o saldo cobrir o valor.
+    A perna de saída é um INSERT ... SELECT ... WHERE saldo >= valor: a checagem
+    e a escrita são um comando só, feito com a trava de escrita do banco, então
+    dois débitos simultâneos da mesma conta não passam os dois com o mesmo saldo.
+    Não faz commit: a trava fica até quem chama comitar.
+    """
+    if valor <= 0:
+        raise ValueError("Valor do lançamento deve ser positivo.")
+    # Lançamentos pendentes desta sessão entram na conta do saldo
+    db.flush()
+
+    origem = conta_usuario(user_id)
+    lote = uuid.uuid4().hex
+    agora = datetime.utcnow()
+    colunas = ["lote", "conta", "valor", "tipo", "referencia", "created_at"]
+    saida = db.execute(
+        insert(Lancamento).from_select(
+            colunas,
+            select(literal(lote), literal(origem), literal(-valor), literal(tipo), literal(referencia), literal(agora))
+            .where(_saldo_em_sql(origem) >= valor),
+        )
+    )
+    if saida.rowcount == 0:
+        raise SaldoInsuficiente()
+    db.execute(insert(Lancamento), [
+        {"lote": lote, "conta": destino, "valor": valor, "tipo": tipo, "referencia": referencia, "created_at": agora},
+    ])
+
+    for conta in (origem, destino):
+        if conta.startswith("usuario:"):
+            invalidar_usuario(int(conta.split(":", 1)[1]))
+    return lote
+
+
+def gerar_snapshots(db: Session, minimo_lancamentos: int = SNAPSHOT_A_CADA) -> int:
+    """
+    Materializa o saldo das contas que acumularam pelo menos `minimo_lancamentos`
+    desde o último snapshot. Também é só insert: snapshots antigos ficam.
+    Retorna quantos snapshots foram gravados.
+    """
+    ultimos = (
+        db.query(
+            SaldoSnapshot.conta.label("conta"),
+            func.max(SaldoSnapshot.ultimo_lancamento_id).label("ultimo_id"),
+        )
+        .group_by(SaldoSnapshot.conta)
+        .subquery()
+    )
+
+    caudas = (
+        db.query(
+            Lancamento.conta,
+            func.sum(Lancamento.valor),
+            func.max(Lancamento.id),
+            ultimos.c.ultimo_id,
+        )
+        .outerjoin(ultimos, ultimos.c.conta == Lancamento.conta)
+        .filter(Lancamento.id > func.coalesce(ultimos.c.ultimo_id, 0))
+        .group_by(Lancamento.conta, ultimos.c.ultimo_id)
+        .having(func.count(Lancamento.id) >= minimo_lancamentos)
+        .all()
+    )
+
+    for conta, soma, ultimo_id, snapshot_anterior_id in caudas:
+        anterior = 0
+        if snapshot_anterior_id is not None:
+            anterior = (
+                db.query(SaldoSnapshot.saldo)
+                .filter_by(conta=conta, ultimo_lancamento_id=snapshot_anterior_id)
+                .scalar()
+            )
+        db.add(SaldoSnapshot(conta=conta, saldo=anterior + soma, ultimo_lancamento_id=ultimo_id))
+
+    db.commit()
+    return len(caudas)
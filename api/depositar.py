@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from db.database import get_db
-from db.models import User, Transaction
-from api.auth import get_current_user
-from api.mp import criar_cobranca_pix
+from db.models import PedidoPagamento
+from api.auth import get_current_user, UsuarioAutenticado
+from api.schemas import PedidoPagamentoOut
+from api.pedidos_pagamento import pedido_para_dict, avisar_despachante
+from db.dinheiro import reais_para_centavos
 from pydantic import BaseModel
 
 
@@ -15,37 +18,29 @@ class DepositoInput(BaseModel):
     email: str
 
 
-@router.post("/depositar")
-def depositar(
+def registrar_pedido_deposito(db: Session, user_id: int, valor: int, nome: str, email: str) -> dict:
+    pedido = PedidoPagamento(user_id=user_id, tipo="deposito", valor=valor, nome=nome, email=email)
+    db.add(pedido)
+    db.commit()
+    return pedido_para_dict(pedido)
+
+
+# Só grava o pedido e responde 202: a cobrança PIX é criada pelo despachante
+# (api/pedidos_pagamento.py) e o saldo entra quando o IPN confirmar o pagamento.
+# O QR code aparece em GET /pagamentos/{id}.
+@router.post("/depositar", status_code=202, response_model=PedidoPagamentoOut)
+async def depositar(
     deposito: DepositoInput,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: UsuarioAutenticado = Depends(get_current_user),
 ):
-    valor = deposito.valor
+    valor = reais_para_centavos(deposito.valor)
     nome = deposito.nome
     email = deposito.email
     
     if valor <= 0:
         raise HTTPException(status_code=400, detail="Valor de depósito inválido.")
 
-    pagamento = criar_cobranca_pix(valor, nome, email)
-
-    current_user.balance += valor
-    db.commit()
-
-    transacao = Transaction(
-        user_id=current_user.id,
-        tipo="deposit",
-        valor=valor,
-        saldo_restante=current_user.balance,
-    )
-    db.add(transacao)
-    db.commit()
-
-    return {
-        "msg": "Pagamento Pix gerado com sucesso",
-        "qr_code_base64": pagamento["point_of_interaction"]["transaction_data"]["qr_code_base64"],
-        "qr_code": pagamento["point_of_interaction"]["transaction_data"]["qr_code"],
-        "new_balance": current_user.balance
-    }
-
+    pedido = await run_in_threadpool(registrar_pedido_deposito, db, current_user.id, valor, nome, email)
+    avisar_despachante()
+    return pedido
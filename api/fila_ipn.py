@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from db.models import NotificacaoIPN, PedidoPagamento, User
+from db.dinheiro import reais_para_centavos, formatar_reais
+from db.tarefas import executar_com_sessao
+from api.carteira import lancar, conta_usuario, CONTA_MERCADO_PAGO
+from api.gateway import get_gateway, CircuitoAberto
+from api.pedidos_pagamento import concluir_deposito
+
+# Processamento das notificações do Mercado Pago fora do request: o webhook só
+# grava o payment_id em notificacoes_ipn e responde; o worker daqui consulta os
+# pagamentos em lote no gateway e credita tudo numa transação só.
+
+LOTE_IPN = int(os.getenv("PANO_IPN_LOTE", "50"))
+IPN_INTERVALO_SEGUNDOS = float(os.getenv("PANO_IPN_INTERVALO", "5"))
+IPN_JANELA_SEGUNDOS = 0.2  # espera depois do aviso pra juntar notificações que chegam em rajada
+IPN_MAX_TENTATIVAS = 5
+IPN_BACKOFF_SEGUNDOS = 5  # espera depois do 1º erro; dobra a cada tentativa
+
+STATUS_AGUARDANDO = ("pending", "in_process", "authorized")
+
+_aviso = asyncio.Event()
+
+
+def enfileirar_ipn(db: Session, payment_id: str):
+    """
+    Registra a notificação. Repetida é ignorada, a não ser que o pagamento
+    estivesse pendente: aí volta pra fila pra ser consultado de novo.
+    """
+    agora = datetime.utcnow()
+    stmt = insert(NotificacaoIPN).values(payment_id=payment_id, status="recebida", tentativas=0, recebida_em=agora)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["payment_id"],
+        set_={"status": "recebida", "recebida_em": agora, "proxima_tentativa_em": None},
+        where=NotificacaoIPN.status == "pendente",
+    )
+    db.execute(stmt)
+    db.commit()
+
+
+def avisar_fila():
+    _aviso.set()
+
+
+def proximos_da_fila(db: Session, limite: int = LOTE_IPN) -> list[str]:
+    return [
+        payment_id
+        for (payment_id,) in db.query(NotificacaoIPN.payment_id)
+        .filter(
+            NotificacaoIPN.status == "recebida",
+            or_(NotificacaoIPN.proxima_tentativa_em.is_(None), NotificacaoIPN.proxima_tentativa_em <= datetime.utcnow()),
+        )
+        .order_by(NotificacaoIPN.recebida_em)
+        .limit(limite)
+    ]
+
+
+def _marcar(db: Session, payment_id: str, de: tuple, **valores) -> bool:
+    # Transição condicional: só um worker consegue levar a linha de `de` pro novo status
+    return db.query(NotificacaoIPN).filter(
+        NotificacaoIPN.payment_id == payment_id, NotificacaoIPN.status.in_(de)
+    ).update(valores, synchronize_session=False) == 1
+
+
+def aplicar_resultados(db: Session, resultados: dict) -> dict:
+    """
+    Recebe {payment_id: dados do pagamento ou exceção} e grava tudo numa
+    transação: créditos no livro-razão e o novo status de cada notificação.
+    """
+    agora = datetime.utcnow()
+    emails = {
+        dados.get("payer", {}).get("email")
+        for dados in resultados.values()
+        if isinstance(dados, dict) and dados.get("status") == "approved"
+    }
+    usuarios = {u.email: u for u in db.query(User).filter(User.email.in_(emails))} if emails else {}
+    # Pagamento criado por um pedido nosso: o dono é o do pedido, não quem aparece como pagador
+    pedidos = {
+        p.payment_id: p
+        for p in db.query(PedidoPagamento).filter(PedidoPagamento.payment_id.in_(list(resultados)))
+    }
+
+    contagem = {"creditada": 0, "pendente": 0, "ignorada": 0, "erro": 0}
+    for payment_id, dados in resultados.items():
+        if isinstance(dados, CircuitoAberto):
+            continue  # gateway fora do ar: fica na fila sem gastar tentativa
+
+        if isinstance(dados, Exception):
+            notificacao = db.get(NotificacaoIPN, payment_id)
+            notificacao.tentativas = (notificacao.tentativas or 0) + 1
+            notificacao.resultado = str(dados)
+            if notificacao.tentativas >= IPN_MAX_TENTATIVAS:
+                notificacao.status = "erro"
+                notificacao.processada_em = agora
+            else:
+                atraso = IPN_BACKOFF_SEGUNDOS * 2 ** (notificacao.tentativas - 1)
+                notificacao.proxima_tentativa_em = agora + timedelta(seconds=atraso)
+            contagem["erro"] += 1
+            continue
+
+        status = dados.get("status")
+        if status in STATUS_AGUARDANDO:
+            _marcar(db, payment_id, ("recebida",), status="pendente", resultado=status)
+            contagem["pendente"] += 1
+            continue
+
+        if status != "approved":
+            _marcar(db, payment_id, ("recebida",), status="ignorada", resultado=status, processada_em=agora)
+            contagem["ignorada"] += 1
+            continue
+
+        pedido = pedidos.get(payment_id)
+        if pedido is not None and pedido.tipo != "deposito":
+            _marcar(db, payment_id, ("recebida",), status="ignorada", resultado="cobrança de saque", processada_em=agora)
+            contagem["ignorada"] += 1
+            continue
+
+        payer_email = dados.get("payer", {}).get("email")
+        user_id = pedido.user_id if pedido is not None else getattr(usuarios.get(payer_email), "id", None)
+        if user_id is None:
+            _marcar(
+                db, payment_id, ("recebida",), status="ignorada",
+                resultado=f"Usuário com email {payer_email} não encontrado.", processada_em=agora,
+            )
+            contagem["ignorada"] += 1
+            continue
+
+        valor = reais_para_centavos(dados.get("transaction_amount", 0))
+        if _marcar(
+            db, payment_id, ("recebida", "pendente"), status="creditada",
+            resultado=f"{formatar_reais(valor)} creditados para o usuário {user_id}", processada_em=agora,
+        ):
+            lancar(db, CONTA_MERCADO_PAGO, conta_usuario(user_id), valor, "ipn", referencia=f"mp:{payment_id}")
+            if pedido is not None:
+                concluir_deposito(db, pedido, valor)
+            contagem["creditada"] += 1
+
+    db.commit()
+    return contagem
+
+
+async def processar_lote(limite: int = LOTE_IPN) -> int:
+    """Retorna quantas notificações saíram da fila (resolvidas ou adiadas pelo backoff)."""
+    ids = await run_in_threadpool(executar_com_sessao, lambda db: proximos_da_fila(db, limite))
+    if not ids:
+        return 0
+
+    gateway = get_gateway()
+    respostas = await asyncio.gather(*(gateway.consultar_pagamento(p) for p in ids), return_exceptions=True)
+    contagem = await run_in_threadpool(executar_com_sessao, lambda db: aplicar_resultados(db, dict(zip(ids, respostas))))
+    logging.info(f"IPN: lote de {len(ids)} processado {contagem}")
+    return sum(contagem.values())
+
+
+# Acorda quando o webhook avisa (ou a cada `intervalo`, pra pegar o que outro
+# worker enfileirou) e esvazia a fila em lotes. Com o disjuntor do gateway aberto
+# nem consulta a fila; lote que não saiu inteiro (circuito abriu no meio) para o
+# esvaziamento até a próxima rodada.
+async def executar_fila_ipn(intervalo: float = IPN_INTERVALO_SEGUNDOS):
+    while True:
+        try:
+            await asyncio.wait_for(_aviso.wait(), intervalo)
+            await asyncio.sleep(IPN_JANELA_SEGUNDOS)
+        except asyncio.TimeoutError:
+            pass
+        _aviso.clear()
+        if get_gateway().disjuntor.estado == "aberto":
+            continue
+
+        try:
+            while await processar_lote() == LOTE_IPN:
+                pass
+        except Exception:
+            logging.exception("Erro processando a fila de IPN")
@@ -0,0 +1,189 @@
+import asyncio
+import os
+import random
+import time
+import uuid
+from functools import lru_cache
+
+# Cliente assíncrono da API de pagamentos do Mercado Pago. Uma única conexão
+# httpx com pool por processo, timeouts curtos, retentativa com backoff para
+# erros de rede/5xx/429 e um disjuntor (circuit breaker) que para de chamar o
+# provedor por um tempo depois de várias falhas seguidas.
+# MERCADO_PAGO_API_URL aponta pro gateway fake local (api/gateway_fake.py) em testes.
+
+MERCADO_PAGO_API_URL = os.getenv("MERCADO_PAGO_API_URL", "https://api.mercadopago.com")
+MERCADO_PAGO_ACCESS_TOKEN = os.getenv("MERCADO_PAGO_ACCESS_TOKEN", "TEST-475525b6-ad58-4631-a255-de10a0b318f3")
+
+GATEWAY_TIMEOUT_SEGUNDOS = float(os.getenv("PANO_GATEWAY_TIMEOUT", "5"))
+GATEWAY_TENTATIVAS = int(os.getenv("PANO_GATEWAY_TENTATIVAS", "3"))
+GATEWAY_CONEXOES = int(os.getenv("PANO_GATEWAY_CONEXOES", "20"))
+DISJUNTOR_FALHAS = int(os.getenv("PANO_GATEWAY_DISJUNTOR_FALHAS", "5"))
+DISJUNTOR_ABERTO_SEGUNDOS = float(os.getenv("PANO_GATEWAY_DISJUNTOR_SEGUNDOS", "30"))
+
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+
+
+class ErroGateway(Exception):
+    def __init__(self, mensagem: str, status_code: int | None = None, resposta=None):
+        super().__init__(mensagem)
+        self.status_code = status_code
+        self.resposta = resposta
+
+
+class CircuitoAberto(ErroGateway):
+    pass
+
+
+class Disjuntor:
+    """
+    Abre depois de `limite` falhas seguidas; após `tempo_aberto` deixa uma chamada
+    de teste passar e as outras continuam recusadas até ela terminar.
+    """
+
+    def __init__(self, limite: int, tempo_aberto: float):
+        self.limite = limite
+        self.tempo_aberto = tempo_aberto
+        self.falhas_seguidas = 0
+        self.aberto_ate = 0.0
+        self.testando = False  # chamada de teste do meio-aberto em andamento
+
+    @property
+    def estado(self) -> str:
+        if self.falhas_seguidas < self.limite:
+            return "fechado"
+        return "aberto" if time.monotonic() < self.aberto_ate else "meio_aberto"
+
+    def verificar(self) -> bool:
+        """Levanta CircuitoAberto ou deixa passar. True se esta chamada é a de teste (ver liberar_teste)."""
+        estado = self.estado
+        if estado == "aberto" or (estado == "meio_aberto" and self.testando):
+            raise CircuitoAberto("Gateway de pagamentos indisponível no momento.")
+        if estado == "meio_aberto":
+            self.testando = True
+            return True
+        return False
+
+    def liberar_teste(self):
+        # Chamada de teste terminou, de qualquer jeito (inclusive cancelada): o resultado
+        # já foi registrado, ou a próxima chamada testa de novo
+        self.testando = False
+
+    def registrar_sucesso(self):
+        self.falhas_seguidas = 0
+
+    def registrar_falha(self):
+        self.falhas_seguidas += 1
+        if self.falhas_seguidas >= self.limite:
+            self.aberto_ate = time.monotonic() + self.tempo_aberto
+
+
+class GatewayPagamentos:
+    def __init__(
+        self,
+        base_url: str = MERCADO_PAGO_API_URL,
+        access_token: str = MERCADO_PAGO_ACCESS_TOKEN,
+        timeout: float = GATEWAY_TIMEOUT_SEGUNDOS,
+        tentativas: int = GATEWAY_TENTATIVAS,
+    ):
+        self.base_url = base_url
+        self.access_token = access_token
+        self.timeout = timeout
+        self.tentativas = tentativas
+        self.disjuntor = Disjuntor(DISJUNTOR_FALHAS, DISJUNTOR_ABERTO_SEGUNDOS)
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.access_token}"},
+                timeout=httpx.Timeout(self.timeout, connect=min(2.0, self.timeout)),
+                limits=httpx.Limits(max_connections=GATEWAY_CONEXOES, max_keepalive_connections=GATEWAY_CONEXOES),
+            )
+        return self._client
+
+    async def _requisitar(self, metodo: str, caminho: str, **kwargs) -> dict:
+        teste = self.disjuntor.verificar()
+        try:
+            return await self._requisitar_com_tentativas(metodo, caminho, **kwargs)
+        finally:
+            if teste:
+                self.disjuntor.liberar_teste()
+
+    async def _requisitar_com_tentativas(self, metodo: str, caminho: str, **kwargs) -> dict:
+        import httpx
+
+        # Mesma chave em todas as tentativas: o provedor não cria cobrança duplicada
+        headers = kwargs.pop("headers", {})
+        if metodo == "POST":
+            headers.setdefault("X-Idempotency-Key", uuid.uuid4().hex)
+
+        ultimo_erro = None
+        for tentativa in range(self.tentativas):
+            if tentativa:
+                # Backoff exponencial com jitter: 0.2s, 0.4s, 0.8s... (+ até 100ms)
+                await asyncio.sleep(0.2 * 2 ** (tentativa - 1) + random.random() * 0.1)
+            try:
+                resposta = await self.client.request(metodo, caminho, headers=headers, **kwargs)
+            except httpx.TransportError as e:
+                ultimo_erro = ErroGateway(f"Falha de comunicação com o gateway: {e!r}")
+                continue
+
+            if resposta.status_code in STATUS_RETENTAVEIS:
+                ultimo_erro = ErroGateway(
+                    f"Gateway respondeu {resposta.status_code}", resposta.status_code, resposta.text
+                )
+                continue
+
+            self.disjuntor.registrar_sucesso()
+            if resposta.status_code >= 400:
+                # Erro do nosso lado (4xx): não adianta repetir
+                raise ErroGateway(
+                    f"Gateway recusou a requisição ({resposta.status_code})", resposta.status_code, resposta.text
+                )
+            return resposta.json()
+
+        self.disjuntor.registrar_falha()
+        raise ultimo_erro
+
+    async def criar_pix(
+        self,
+        valor_reais: float,
+        nome: str,
+        email: str,
+        referencia: str,
+        notification_url: str | None = None,
+        chave_idempotencia: str | None = None,
+    ) -> dict:
+        payment_data = {
+            "transaction_amount": round(valor_reais, 2),
+            "description": f"Depósito de {nome}",
+            "payment_method_id": "pix",
+            "payer": {
+                "email": email,
+                "first_name": nome,
+                "identification": {"type": "CPF", "number": "12345678909"},
+            },
+            "binary_mode": True,
+            "external_reference": referencia,
+        }
+        if notification_url:
+            payment_data["notification_url"] = notification_url
+        headers = {"X-Idempotency-Key": chave_idempotencia} if chave_idempotencia else {}
+        return await self._requisitar("POST", "/v1/payments", json=payment_data, headers=headers)
+
+    async def consultar_pagamento(self, payment_id: str) -> dict:
+        return await self._requisitar("GET", f"/v1/payments/{payment_id}")
+
+    async def fechar(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+@lru_cache(maxsize=1)
+def get_gateway() -> GatewayPagamentos:
+    return GatewayPagamentos()
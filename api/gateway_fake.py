@@ -0,0 +1,108 @@
+import asyncio
+import base64
+import itertools
+import os
+import random
+import time
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+
+# Gateway de pagamentos fake, com a mesma forma de resposta da API do Mercado Pago
+# nas rotas que usamos. Serve pra rodar o fluxo de pagamento inteiro offline e
+# fazer teste de carga sem bater no provedor.
+#uvicorn api.gateway_fake:app --port 8001
+#MERCADO_PAGO_API_URL=http://127.0.0.1:8001 uvicorn main:app
+#
+# FAKE_LATENCIA_MS: latência média de cada resposta (com jitter de ±50%)
+# FAKE_TAXA_ERRO: fração das requisições que respondem 503 (testa retentativa e disjuntor)
+# FAKE_APROVAR_APOS_S: segundos até um pagamento pendente virar "approved" na consulta
+
+LATENCIA_MS = float(os.getenv("FAKE_LATENCIA_MS", "50"))
+TAXA_ERRO = float(os.getenv("FAKE_TAXA_ERRO", "0"))
+APROVAR_APOS_S = float(os.getenv("FAKE_APROVAR_APOS_S", "2"))
+
+app = FastAPI(title="Gateway de pagamentos fake", default_response_class=ORJSONResponse)
+
+_pagamentos: dict[str, dict] = {}
+_por_chave: dict[str, str] = {}
+_ids = itertools.count(1_000_000)
+
+
+async def _simular_rede():
+    if LATENCIA_MS:
+        await asyncio.sleep(LATENCIA_MS * random.uniform(0.5, 1.5) / 1000)
+    if TAXA_ERRO and random.random() < TAXA_ERRO:
+        raise HTTPException(status_code=503, detail="Erro simulado")
+
+
+def _status_atual(pagamento: dict) -> str:
+    if pagamento["status"] == "pending" and time.time() - pagamento["_criado"] >= APROVAR_APOS_S:
+        pagamento["status"] = "approved"
+    return pagamento["status"]
+
+
+def _publico(pagamento: dict) -> dict:
+    _status_atual(pagamento)
+    return {k: v for k, v in pagamento.items() if not k.startswith("_")}
+
+
+@app.post("/v1/payments", status_code=201)
+async def criar_pagamento(request: Request, x_idempotency_key: str | None = Header(None)):
+    await _simular_rede()
+
+    # Mesma chave de idempotência devolve o mesmo pagamento, como no provedor
+    if x_idempotency_key and x_idempotency_key in _por_chave:
+        return _publico(_pagamentos[_por_chave[x_idempotency_key]])
+
+    dados = await request.json()
+    payment_id = str(next(_ids))
+    qr_code = f"00020126FAKEPIX{payment_id}5204000053039865802BR"
+    _pagamentos[payment_id] = {
+        "id": int(payment_id),
+        "status": "pending",
+        "transaction_amount": dados.get("transaction_amount"),
+        "payment_method_id": dados.get("payment_method_id"),
+        "external_reference": dados.get("external_reference"),
+        "payer": dados.get("payer", {}),
+        "point_of_interaction": {
+            "transaction_data": {
+                "qr_code": qr_code,
+                "qr_code_base64": base64.b64encode(qr_code.encode()).decode(),
+            }
+        },
+        "_criado": time.time(),
+        "_notification_url": dados.get("notification_url"),
+    }
+    if x_idempotency_key:
+        _por_chave[x_idempotency_key] = payment_id
+    return _publico(_pagamentos[payment_id])
+
+
+@app.get("/v1/payments/{payment_id}")
+async def consultar_pagamento(payment_id: str):
+    await _simular_rede()
+    pagamento = _pagamentos.get(payment_id)
+    if pagamento is None:
+        raise HTTPException(status_code=404, detail="Payment not found")
+    return _publico(pagamento)
+
+
+@app.post("/fake/aprovar/{payment_id}")
+async def aprovar(payment_id: str, notificar: bool = True):
+    """Aprova na hora e, se o pagamento tiver notification_url, dispara o IPN."""
+    pagamento = _pagamentos.get(payment_id)
+    if pagamento is None:
+        raise HTTPException(status_code=404, detail="Payment not found")
+    pagamento["status"] = "approved"
+
+    url = pagamento["_notification_url"]
+    if notificar and url:
+        import httpx
+
+        async with httpx.AsyncClient(timeout=5) as client:
+            try:
+                await client.post(url, params={"topic": "payment", "id": payment_id})
+            except httpx.HTTPError as e:
+                return {"status": "approved", "notificacao": f"falhou: {e!r}"}
+    return {"status": "approved", "notificacao": url if notificar else None}
@@ -1,16 +1,166 @@
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-from db.database import get_db
-from db.models import Transaction, User
-from api.auth import get_current_user
+from db.database import SessionLocal, get_db
+from db.models import Transaction
+from api.auth import get_current_user, UsuarioAutenticado
+from db.dinheiro import centavos_para_reais
+from api.schemas import HistoricoOut
 
 router = APIRouter(prefix="/historico", tags=["Transações"])
 
-@router.get("/")
-def historico(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    transacoes = db.query(Transaction).filter(Transaction.user_id == current_user.id).all()
-    
-    if not transacoes:
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+# Tamanho de cada página buscada pelo export (memória constante por página)
+LOTE_EXPORTACAO = 500
+
+CAMPOS = ["id", "tipo", "valor", "status", "saldo_restante", "created_at"]
+
+
+def codificar_cursor(transacao: Transaction) -> str:
+    bruto = f"{transacao.created_at.isoformat()}|{transacao.id}"
+    return base64.urlsafe_b64encode(bruto.encode()).decode()
+
+
+def decodificar_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        bruto = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, transacao_id = bruto.split("|")
+        return datetime.fromisoformat(created_at), int(transacao_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+
+
+def filtrar_transacoes(
+    db: Session,
+    user_id: int,
+    tipo: Optional[str] = None,
+    de: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    depois_de: Optional[tuple[datetime, int]] = None,
+):
+    """
+    Query ordenada do mais novo pro mais antigo em (created_at, id).
+    `depois_de` é a chave da última linha já entregue (keyset), então cada
+    página usa o índice (user_id, created_at, id) sem OFFSET.
+    """
+    query = db.query(Transaction).filter(Transaction.user_id == user_id)
+
+    if tipo:
+        query = query.filter(Transaction.tipo == tipo)
+    if de:
+        query = query.filter(Transaction.created_at >= de)
+    if ate:
+        query = query.filter(Transaction.created_at < ate)
+
+    if depois_de:
+        created_at, transacao_id = depois_de
+        query = query.filter(
+            or_(
+                Transaction.created_at < created_at,
+                and_(Transaction.created_at == created_at, Transaction.id < transacao_id),
+            )
+        )
+
+    return query.order_by(Transaction.created_at.desc(), Transaction.id.desc())
+
+
+def transacao_para_dict(transacao: Transaction) -> dict:
+    return {
+        "id": transacao.id,
+        "tipo": transacao.tipo,
+        "valor": centavos_para_reais(transacao.valor),
+        "status": transacao.status,
+        "saldo_restante": centavos_para_reais(transacao.saldo_restante),
+        "created_at": transacao.created_at.isoformat() if transacao.created_at else None,
+    }
+
+
+@router.get("/", response_model=HistoricoOut)
+def historico(
+    cursor: Optional[str] = None,
+    limite: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    tipo: Optional[str] = None,
+    de: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    current_user: UsuarioAutenticado = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    depois_de = decodificar_cursor(cursor) if cursor else None
+
+    # Busca uma linha a mais só pra saber se existe próxima página
+    transacoes = (
+        filtrar_transacoes(db, current_user.id, tipo, de, ate, depois_de)
+        .limit(limite + 1)
+        .all()
+    )
+
+    if not transacoes and not cursor:
         raise HTTPException(status_code=404, detail="Nenhuma transação encontrada.")
-    
-    return {"transacoes": transacoes}
+
+    tem_mais = len(transacoes) > limite
+    transacoes = transacoes[:limite]
+
+    return {
+        "transacoes": [transacao_para_dict(t) for t in transacoes],
+        "proximo_cursor": codificar_cursor(transacoes[-1]) if tem_mais else None,
+    }
+
+
+def gerar_exportacao(user_id: int, formato: str, tipo, de, ate):
+    # Sessão própria: o gerador roda depois que a dependência get_db já fechou a dela
+    db = SessionLocal()
+    try:
+        if formato == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=CAMPOS)
+            writer.writeheader()
+            yield buffer.getvalue()
+
+        depois_de = None
+        while True:
+            lote = (
+                filtrar_transacoes(db, user_id, tipo, de, ate, depois_de)
+                .limit(LOTE_EXPORTACAO)
+                .all()
+            )
+            if not lote:
+                break
+
+            if formato == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(transacao_para_dict(t) for t in lote)
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps(transacao_para_dict(t)) + "\n" for t in lote)
+
+            depois_de = (lote[-1].created_at, lote[-1].id)
+            # Solta os objetos já exportados da identity map
+            db.expunge_all()
+    finally:
+        db.close()
+
+
+@router.get("/exportar")
+def exportar_historico(
+    formato: str = Query("csv", pattern="^(csv|ndjson)$"),
+    tipo: Optional[str] = None,
+    de: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    current_user: UsuarioAutenticado = Depends(get_current_user),
+):
+    media_type = "text/csv" if formato == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        gerar_exportacao(current_user.id, formato, tipo, de, ate),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="historico.{formato}"'},
+    )
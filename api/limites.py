@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+from fastapi import Depends, HTTPException, Request
+from api.auth import get_current_user, id_do_token, UsuarioAutenticado
+from api.metricas import Contador, Coletor
+
+# Controle de admissão em memória com balde de fichas (token bucket), por cliente
+# e por mesa, com orçamentos separados pra leitura (polling) e ação (jogadas).
+# O cliente é checado antes da mesa: quem abusa esgota o próprio balde e é
+# recusado sem gastar as fichas da mesa, então os outros jogadores não sentem.
+# Cada worker tem os seus baldes; o limite efetivo é por worker.
+#
+# Na leitura, quem manda token válido é contado pelo id do usuário (vários
+# jogadores atrás do mesmo NAT não dividem balde); sem token, pelo IP. Atrás de
+# proxy, o IP vem do X-Forwarded-For, mas só se a conexão veio de um proxy listado
+# em PANO_PROXIES_CONFIAVEIS (IPs separados por vírgula): senão qualquer cliente
+# escolheria a própria chave mandando o cabeçalho.
+#
+# Formato "taxa:rajada" (fichas por segundo : tamanho do balde). PANO_LIMITES=0 desliga.
+
+LIMITES_ATIVOS = os.getenv("PANO_LIMITES", "1") != "0"
+PROXIES_CONFIAVEIS = {ip.strip() for ip in os.getenv("PANO_PROXIES_CONFIAVEIS", "").split(",") if ip.strip()}
+MAX_CHAVES = 100_000  # acima disso os baldes cheios (ociosos) são descartados
+
+
+def _ler_limite(nome: str, padrao: str) -> tuple[float, float]:
+    taxa, rajada = os.getenv(nome, padrao).split(":")
+    return float(taxa), float(rajada)
+
+
+class LimitadorDeTaxa:
+    def __init__(self, nome: str, taxa: float, rajada: float):
+        self.nome = nome
+        self.taxa = taxa
+        self.rajada = rajada
+        self._baldes: dict = {}  # chave -> [fichas, último acesso]
+        self._lock = threading.Lock()
+
+    def consumir(self, chave) -> float:
+        """Tira uma ficha do balde de `chave`. Retorna 0 se passou, senão os segundos até a próxima ficha."""
+        agora = time.monotonic()
+        with self._lock:
+            balde = self._baldes.get(chave)
+            if balde is None:
+                if len(self._baldes) >= MAX_CHAVES:
+                    self._podar(agora)
+                balde = self._baldes[chave] = [self.rajada, agora]
+
+            fichas = min(self.rajada, balde[0] + (agora - balde[1]) * self.taxa)
+            balde[1] = agora
+            if fichas >= 1:
+                balde[0] = fichas - 1
+                return 0.0
+            balde[0] = fichas
+            return (1 - fichas) / self.taxa
+
+    def _podar(self, agora: float):
+        # Balde parado há mais tempo que leva pra encher já está cheio: tanto faz existir
+        tempo_pra_encher = self.rajada / self.taxa
+        self._baldes = {k: v for k, v in self._baldes.items() if agora - v[1] < tempo_pra_encher}
+
+    def __len__(self):
+        return len(self._baldes)
+
+
+leitura_por_cliente = LimitadorDeTaxa("leitura_cliente", *_ler_limite("PANO_LIMITE_LEITURA_CLIENTE", "10:30"))
+leitura_por_mesa = LimitadorDeTaxa("leitura_mesa", *_ler_limite("PANO_LIMITE_LEITURA_MESA", "100:200"))
+acao_por_usuario = LimitadorDeTaxa("acao_usuario", *_ler_limite("PANO_LIMITE_ACAO_USUARIO", "5:20"))
+acao_por_mesa = LimitadorDeTaxa("acao_mesa", *_ler_limite("PANO_LIMITE_ACAO_MESA", "15:30"))
+
+rejeicoes = Contador("panopoker_limite_rejeicoes_total", "Requisições recusadas com 429", ("limite",))
+Coletor(
+    "panopoker_limite_baldes", "Baldes de fichas em memória",
+    lambda: {(l.nome,): len(l) for l in (leitura_por_cliente, leitura_por_mesa, acao_por_usuario, acao_por_mesa)},
+    rotulos=("limite",),
+)
+
+
+def _admitir(request: Request, por_cliente: LimitadorDeTaxa, chave_cliente, por_mesa: LimitadorDeTaxa):
+    if not LIMITES_ATIVOS:
+        return
+    checagens = [(por_cliente, chave_cliente)]
+    mesa_id = request.path_params.get("mesa_id")
+    if mesa_id is not None:
+        checagens.append((por_mesa, mesa_id))
+
+    for limitador, chave in checagens:
+        espera = limitador.consumir(chave)
+        if espera:
+            rejeicoes.inc(limitador.nome)
+            raise HTTPException(
+                status_code=429,
+                detail="Muitas requisições. Tente de novo em instantes.",
+                headers={"Retry-After": str(max(1, round(espera)))},
+            )
+
+
+def ip_do_cliente(request: Request) -> str:
+    ip = request.client.host if request.client else "desconhecido"
+    if ip not in PROXIES_CONFIAVEIS:
+        return ip
+    # Da direita pra esquerda: o primeiro endereço que não é um dos nossos proxies
+    # foi anotado por um proxy confiável; os da esquerda dele o cliente pode ter inventado
+    for anotado in reversed(request.headers.get("x-forwarded-for", "").split(",")):
+        anotado = anotado.strip()
+        if anotado and anotado not in PROXIES_CONFIAVEIS:
+            return anotado
+    return ip
+
+
+# async: rodam direto no event loop, sem ida ao threadpool, e o 429 sai antes
+# da rota tocar no banco
+async def limitar_leitura(request: Request):
+    """
+    Polling de estado: chave é o usuário do token, se vier um válido (só confere a
+    assinatura, sem banco), senão o IP. Nem todas as rotas de leitura exigem login.
+    """
+    esquema, _, token = request.headers.get("authorization", "").partition(" ")
+    user_id = id_do_token(token) if esquema.lower() == "bearer" and token else None
+    cliente = ("usuario", user_id) if user_id is not None else ip_do_cliente(request)
+    _admitir(request, leitura_por_cliente, cliente, leitura_por_mesa)
+
+
+async def limitar_acao(request: Request, current_user: UsuarioAutenticado = Depends(get_current_user)):
+    """Jogadas: chave é o usuário. get_current_user fica em cache no request e a rota reaproveita."""
+    _admitir(request, acao_por_usuario, current_user.id, acao_por_mesa)
@@ -0,0 +1,214 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Métricas do processo no formato texto do Prometheus, servidas em /metrics.
+# Cada thread incrementa a própria cópia (threading.local), sem lock no caminho
+# quente; a leitura em /metrics soma as cópias. Cada worker expõe as suas: quem
+# agrega entre workers é o Prometheus.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+BALDES_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BALDES_POTE = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)  # centavos
+
+_registro: list = []
+_lock = threading.Lock()
+
+
+class _Metrica:
+    tipo = "untyped"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        with _lock:
+            _registro.append(self)
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with _lock:
+                self._shards.append(shard)
+        return shard
+
+    def _rotulos_texto(self, valores: tuple, extra: str = "") -> str:
+        pares = [f'{k}="{v}"' for k, v in zip(self.rotulos, valores)]
+        if extra:
+            pares.append(extra)
+        return "{" + ",".join(pares) + "}" if pares else ""
+
+    def amostras(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, *rotulos, valor: float = 1):
+        shard = self._shard()
+        shard[rotulos] = shard.get(rotulos, 0) + valor
+
+    def _somado(self) -> dict:
+        total: dict = {}
+        for shard in list(self._shards):
+            for chave, valor in list(shard.items()):
+                total[chave] = total.get(chave, 0) + valor
+        return total
+
+    def amostras(self) -> list[str]:
+        return [f"{self.nome}{self._rotulos_texto(k)} {v}" for k, v in sorted(self._somado().items())]
+
+
+class Medidor(Contador):
+    """Valor que sobe e desce (ex: requisições em andamento)."""
+
+    tipo = "gauge"
+
+    def dec(self, *rotulos, valor: float = 1):
+        self.inc(*rotulos, valor=-valor)
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple = (), baldes: tuple = BALDES_LATENCIA):
+        super().__init__(nome, ajuda, rotulos)
+        self.baldes = baldes
+
+    def observar(self, valor: float, *rotulos):
+        shard = self._shard()
+        dados = shard.get(rotulos)
+        if dados is None:
+            # [contagem por balde..., +Inf, soma]
+            dados = shard[rotulos] = [0] * (len(self.baldes) + 2)
+        dados[bisect.bisect_left(self.baldes, valor)] += 1
+        dados[-1] += valor
+
+    @contextmanager
+    def medir(self, *rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, *rotulos)
+
+    def amostras(self) -> list[str]:
+        total: dict = {}
+        for shard in list(self._shards):
+            for chave, dados in list(shard.items()):
+                soma = total.setdefault(chave, [0] * len(dados))
+                for i, v in enumerate(dados):
+                    soma[i] += v
+
+        linhas = []
+        for chave, dados in sorted(total.items()):
+            acumulado = 0
+            for limite, contagem in zip(self.baldes + ("+Inf",), dados[:-1]):
+                acumulado += contagem
+                le = f'le="{limite}"'
+                linhas.append(f"{self.nome}_bucket{self._rotulos_texto(chave, le)} {acumulado}")
+            linhas.append(f"{self.nome}_sum{self._rotulos_texto(chave)} {dados[-1]}")
+            linhas.append(f"{self.nome}_count{self._rotulos_texto(chave)} {acumulado}")
+        return linhas
+
+
+class Coletor(_Metrica):
+    """Valor lido na hora do scrape. `funcao` devolve um número ou {rótulos: número}."""
+
+    def __init__(self, nome: str, ajuda: str, funcao, tipo: str = "gauge", rotulos: tuple = ()):
+        super().__init__(nome, ajuda, rotulos)
+        self.funcao = funcao
+        self.tipo = tipo
+
+    def amostras(self) -> list[str]:
+        valor = self.funcao()
+        if not isinstance(valor, dict):
+            valor = {(): valor}
+        return [f"{self.nome}{self._rotulos_texto(k)} {v}" for k, v in sorted(valor.items())]
+
+
+def gerar_texto() -> str:
+    linhas = []
+    for metrica in list(_registro):
+        try:
+            amostras = metrica.amostras()
+        except Exception as e:
+            linhas.append(f"# erro coletando {metrica.nome}: {e!r}")
+            continue
+        linhas.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+        linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+        linhas.extend(amostras)
+    return "\n".join(linhas) + "\n"
+
+
+# HTTP
+requisicoes_total = Contador("panopoker_http_requisicoes_total", "Requisições HTTP atendidas", ("metodo", "rota", "status"))
+requisicoes_duracao = Histograma("panopoker_http_duracao_segundos", "Latência das requisições HTTP", ("metodo", "rota"))
+requisicoes_em_andamento = Medidor("panopoker_http_em_andamento", "Requisições HTTP em andamento")
+
+# Banco
+consultas_total = Contador("panopoker_db_consultas_total", "Comandos SQL executados", ("tipo",))
+consultas_duracao = Histograma("panopoker_db_duracao_segundos", "Duração dos comandos SQL", ("tipo",))
+
+# Jogo
+maos_iniciadas = Contador("panopoker_maos_iniciadas_total", "Mãos iniciadas")
+maos_finalizadas = Contador("panopoker_maos_finalizadas_total", "Mãos finalizadas")
+showdowns = Contador("panopoker_showdowns_total", "Showdowns realizados")
+potes = Histograma("panopoker_pote_centavos", "Tamanho do pote das mãos finalizadas", baldes=BALDES_POTE)
+avaliador_duracao = Histograma("panopoker_avaliador_segundos", "Tempo pra decidir os vencedores de um showdown")
+
+
+class MiddlewareDeMetricas:
+    """Middleware ASGI puro: latência e contagem por rota (o template, não a URL)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                status[0] = mensagem["status"]
+            await send(mensagem)
+
+        requisicoes_em_andamento.inc()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracao = time.perf_counter() - inicio
+            requisicoes_em_andamento.dec()
+            rota = getattr(scope.get("route"), "path", "desconhecida")
+            requisicoes_duracao.observar(duracao, scope["method"], rota)
+            requisicoes_total.inc(scope["method"], rota, str(status[0]))
+
+
+def instrumentar_engine(engine):
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metricas_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        inicio = conn.info["metricas_inicio"].pop()
+        tipo = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OUTRO"
+        consultas_total.inc(tipo)
+        consultas_duracao.observar(time.perf_counter() - inicio, tipo)
+
+    @event.listens_for(engine, "handle_error")
+    def _erro(contexto):
+        conn = contexto.connection
+        if conn is not None and conn.info.get("metricas_inicio"):
+            conn.info["metricas_inicio"].pop()
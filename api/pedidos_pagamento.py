@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from db.database import get_db
+from db.models import PedidoPagamento, Transaction
+from db.dinheiro import centavos_para_reais
+from db.tarefas import executar_com_sessao
+from api.auth import get_current_user, UsuarioAutenticado
+from api.carteira import lancar, saldo_usuario, conta_usuario, CONTA_MERCADO_PAGO, CONTA_TAXAS
+from api.gateway import ErroGateway, CircuitoAberto, get_gateway
+from api.mp import criar_cobranca_pix
+from api.schemas import PedidoPagamentoOut
+
+# Despachante do outbox de pagamentos. /depositar e /saque só gravam o pedido
+# (junto com o débito, no caso do saque) e respondem; daqui os pedidos seguem
+# pro gateway em lote. O cliente acompanha por GET /pagamentos/{id}.
+#
+# Saque em andamento fica retido em CONTA_SAQUES_EM_TRANSITO: se o gateway
+# aceitar, vai pro Mercado Pago; se falhar de vez, valor e taxa voltam pro usuário.
+
+CONTA_SAQUES_EM_TRANSITO = "transito:saques"
+
+LOTE_PEDIDOS = int(os.getenv("PANO_PEDIDOS_LOTE", "20"))
+PEDIDOS_INTERVALO_SEGUNDOS = float(os.getenv("PANO_PEDIDOS_INTERVALO", "2"))
+PEDIDO_MAX_TENTATIVAS = 5
+PEDIDO_BACKOFF_SEGUNDOS = 2  # espera depois do 1º erro; dobra a cada tentativa
+ENVIANDO_EXPIRA_SEGUNDOS = 60  # pedido 'enviando' há mais que isso: worker caiu no meio, reenvia
+
+router = APIRouter(tags=["Pagamentos"])
+
+_aviso = asyncio.Event()
+
+
+def avisar_despachante():
+    _aviso.set()
+
+
+def pedido_para_dict(pedido: PedidoPagamento) -> dict:
+    return {
+        "id": pedido.id,
+        "tipo": pedido.tipo,
+        "status": pedido.status,
+        "valor": centavos_para_reais(pedido.valor),
+        "taxa": centavos_para_reais(pedido.taxa or 0),
+        "qr_code": pedido.qr_code,
+        "qr_code_base64": pedido.qr_code_base64,
+        "erro": pedido.erro,
+        "created_at": pedido.created_at.isoformat() if pedido.created_at else None,
+    }
+
+
+@router.get("/pagamentos/{pedido_id}", response_model=PedidoPagamentoOut)
+def consultar_pedido(
+    pedido_id: int,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user),
+):
+    pedido = db.get(PedidoPagamento, pedido_id)
+    if pedido is None or pedido.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Pedido não encontrado")
+    return pedido_para_dict(pedido)
+
+
+def reservar_pedidos(db: Session, limite: int = LOTE_PEDIDOS) -> list[dict]:
+    """Passa até `limite` pedidos pra 'enviando'. A troca é condicional, então dois workers não pegam o mesmo."""
+    agora = datetime.utcnow()
+    expirado = agora - timedelta(seconds=ENVIANDO_EXPIRA_SEGUNDOS)
+    candidatos = (
+        db.query(PedidoPagamento)
+        .filter(or_(
+            and_(
+                PedidoPagamento.status == "pendente",
+                or_(PedidoPagamento.proxima_tentativa_em.is_(None), PedidoPagamento.proxima_tentativa_em <= agora),
+            ),
+            and_(PedidoPagamento.status == "enviando", PedidoPagamento.atualizado_em < expirado),
+        ))
+        .order_by(PedidoPagamento.id)
+        .limit(limite)
+        .all()
+    )
+
+    reservados = []
+    for pedido in candidatos:
+        trocou = db.query(PedidoPagamento).filter(
+            PedidoPagamento.id == pedido.id,
+            PedidoPagamento.status == pedido.status,
+            PedidoPagamento.atualizado_em == pedido.atualizado_em,
+        ).update(
+            {"status": "enviando", "atualizado_em": agora, "tentativas": (pedido.tentativas or 0) + 1},
+            synchronize_session=False,
+        )
+        if trocou:
+            reservados.append({
+                "id": pedido.id,
+                "valor": centavos_para_reais(pedido.valor),
+                "nome": pedido.nome or "",
+                "email": pedido.email or "",
+            })
+    db.commit()
+    return reservados
+
+
+def _falhar(db: Session, pedido: PedidoPagamento, erro: str):
+    pedido.status = "falhou"
+    pedido.erro = erro
+    if pedido.tipo == "saque":
+        # Estorno: o que ficou retido e a taxa voltam pro usuário
+        lancar(db, CONTA_SAQUES_EM_TRANSITO, conta_usuario(pedido.user_id), pedido.valor, "estorno_saque", f"pedido:{pedido.id}")
+        if pedido.taxa:
+            lancar(db, CONTA_TAXAS, conta_usuario(pedido.user_id), pedido.taxa, "estorno_taxa_saque", f"pedido:{pedido.id}")
+        transacao = db.get(Transaction, pedido.transacao_id) if pedido.transacao_id else None
+        if transacao is not None:
+            transacao.status = "failed"
+
+
+def aplicar_envios(db: Session, resultados: dict) -> dict:
+    """Recebe {pedido_id: resposta do gateway ou exceção} e grava tudo numa transação."""
+    agora = datetime.utcnow()
+    pedidos = {p.id: p for p in db.query(PedidoPagamento).filter(PedidoPagamento.id.in_(list(resultados)))}
+
+    contagem = {"enviados": 0, "adiados": 0, "reenfileirados": 0, "falharam": 0}
+    for pedido_id, resposta in resultados.items():
+        pedido = pedidos.get(pedido_id)
+        if pedido is None or pedido.status != "enviando":
+            continue
+        pedido.atualizado_em = agora
+
+        if isinstance(resposta, CircuitoAberto):
+            # Gateway fora do ar: volta pra fila sem gastar tentativa
+            pedido.status = "pendente"
+            pedido.tentativas -= 1
+            contagem["reenfileirados"] += 1
+            continue
+
+        if isinstance(resposta, Exception):
+            definitivo = isinstance(resposta, ErroGateway) and resposta.status_code is not None and resposta.status_code < 500 and resposta.status_code != 429
+            if definitivo or pedido.tentativas >= PEDIDO_MAX_TENTATIVAS:
+                _falhar(db, pedido, str(resposta))
+                contagem["falharam"] += 1
+            else:
+                pedido.status = "pendente"
+                pedido.erro = str(resposta)
+                pedido.proxima_tentativa_em = agora + timedelta(seconds=PEDIDO_BACKOFF_SEGUNDOS * 2 ** (pedido.tentativas - 1))
+                contagem["adiados"] += 1
+            continue
+
+        pedido.payment_id = str(resposta["id"])
+        pedido.qr_code = resposta["qr_code"]
+        pedido.qr_code_base64 = resposta["qr_code_base64"]
+        pedido.erro = None
+        if pedido.tipo == "deposito":
+            # O crédito vem quando o IPN confirmar o pagamento (api/fila_ipn.py)
+            pedido.status = "aguardando_pagamento"
+        else:
+            pedido.status = "concluido"
+            lancar(db, CONTA_SAQUES_EM_TRANSITO, CONTA_MERCADO_PAGO, pedido.valor, "saque", f"mp:{pedido.payment_id}")
+            transacao = db.get(Transaction, pedido.transacao_id) if pedido.transacao_id else None
+            if transacao is not None:
+                transacao.status = "completed"
+        contagem["enviados"] += 1
+
+    db.commit()
+    return contagem
+
+
+def concluir_deposito(db: Session, pedido: PedidoPagamento, valor: int):
+    """Chamado pela fila de IPN na mesma transação do crédito. Não faz commit."""
+    pedido.status = "concluido"
+    pedido.atualizado_em = datetime.utcnow()
+    db.flush()
+    transacao = Transaction(
+        user_id=pedido.user_id,
+        tipo="deposit",
+        valor=valor,
+        saldo_restante=saldo_usuario(db, pedido.user_id),
+    )
+    db.add(transacao)
+    db.flush()
+    pedido.transacao_id = transacao.id
+
+
+async def despachar_lote(limite: int = LOTE_PEDIDOS) -> int:
+    """Retorna quantos pedidos saíram da fila: enviados, falhados ou adiados pelo backoff."""
+    reservados = await run_in_threadpool(executar_com_sessao, lambda db: reservar_pedidos(db, limite))
+    if not reservados:
+        return 0
+
+    # Chave de idempotência fixa por pedido: reenviar depois de uma queda não cria cobrança duplicada
+    respostas = await asyncio.gather(
+        *(criar_cobranca_pix(p["valor"], p["nome"], p["email"], chave_idempotencia=f"pedido-{p['id']}") for p in reservados),
+        return_exceptions=True,
+    )
+    resultados = {p["id"]: r for p, r in zip(reservados, respostas)}
+    contagem = await run_in_threadpool(executar_com_sessao, lambda db: aplicar_envios(db, resultados))
+    logging.info(f"Pedidos de pagamento: lote de {len(reservados)} despachado {contagem}")
+    # Reenfileirado pelo disjuntor continua na fila: não conta, senão o laço gira sem sair do lugar
+    return len(reservados) - contagem["reenfileirados"]
+
+
+async def executar_despachante(intervalo: float = PEDIDOS_INTERVALO_SEGUNDOS):
+    while True:
+        try:
+            await asyncio.wait_for(_aviso.wait(), intervalo)
+        except asyncio.TimeoutError:
+            pass
+        _aviso.clear()
+        if get_gateway().disjuntor.estado == "aberto":
+            continue  # nada sai enquanto o gateway estiver fora; a rodada seguinte tenta de novo
+
+        try:
+            while await despachar_lote() == LOTE_PEDIDOS:
+                pass
+        except Exception:
+            logging.exception("Erro despachando pedidos de pagamento")
@@ -0,0 +1,181 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+# Perfil de SQL por requisição, ligado só quando PANO_PERFIL_SQL estiver setado:
+#   PANO_PERFIL_SQL=1        conta e cronometra as consultas de cada request,
+#                            aponta N+1 e acumula um relatório por rota (GET /admin/perfil_sql)
+#   PANO_PERFIL_SQL=estrito  além disso, a consulta que estourar o orçamento da
+#                            rota derruba a requisição com 500 (pra benchmark/CI)
+# Desligado, nenhum listener é registrado e o middleware não entra na pilha.
+
+MODO = os.getenv("PANO_PERFIL_SQL", "").strip().lower()
+ATIVO = MODO not in ("", "0", "false", "nao")
+ESTRITO = MODO == "estrito"
+
+# Mesmo SQL (parâmetros diferentes) repetido tantas vezes num request = suspeita de N+1
+LIMIAR_N_MAIS_1 = int(os.getenv("PANO_PERFIL_SQL_LIMIAR", "3"))
+
+# Consultas permitidas por request, por template de rota. Rotas fora da lista usam o padrão.
+ORCAMENTO_PADRAO = int(os.getenv("PANO_PERFIL_SQL_ORCAMENTO", "25"))
+ORCAMENTO_CONSULTAS = {
+    "/lobby/mesas": 2,
+    "/lobby/disponiveis": 2,
+    "/mesas/{mesa_id}/vez": 1,
+    "/mesas/{mesa_id}/jogadores": 1,
+    "/mesas/{mesa_id}/cartas_comunitarias": 1,
+    "/mesas/{mesa_id}/estado": 3,
+    "/mesas/{mesa_id}/dicas": 2,
+    "/analise/equidade": 1,
+    "/balance": 3,
+    "/historico/": 3,
+    # Ações: ~6 consultas no caso comum; o teto cobre a que fecha a mão (showdown + nova rodada)
+    "/mesas/{mesa_id}/call": 40,
+    "/mesas/{mesa_id}/check": 40,
+    "/mesas/{mesa_id}/raise": 40,
+    "/mesas/{mesa_id}/allin": 40,
+    "/mesas/{mesa_id}/fold": 40,
+    "/mesas/{mesa_id}/entrar": 30,
+    "/mesas/{mesa_id}/sair": 15,
+}
+
+
+class OrcamentoDeConsultasExcedido(Exception):
+    pass
+
+
+class PerfilDaRequisicao:
+    def __init__(self, scope):
+        self.scope = scope
+        self.consultas: list[tuple[str, object, float]] = []
+        self._inicio: list[float] = []
+        self.estourou = False
+
+    @property
+    def rota(self) -> str:
+        return getattr(self.scope.get("route"), "path", "desconhecida")
+
+    def orcamento(self) -> int:
+        return ORCAMENTO_CONSULTAS.get(self.rota, ORCAMENTO_PADRAO)
+
+    def suspeitas_n_mais_1(self) -> dict[str, int]:
+        por_sql = Counter(sql for sql, _, _ in self.consultas)
+        return {sql: n for sql, n in por_sql.items() if n >= LIMIAR_N_MAIS_1}
+
+    def duplicadas(self) -> int:
+        """Consultas idênticas (mesmo SQL e mesmos parâmetros) repetidas no request."""
+        por_chave = Counter((sql, repr(params)) for sql, params, _ in self.consultas)
+        return sum(n - 1 for n in por_chave.values() if n > 1)
+
+
+_perfil_atual: contextvars.ContextVar[PerfilDaRequisicao | None] = contextvars.ContextVar("perfil_sql", default=None)
+
+
+class RelatorioPorRota:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rotas: dict[str, dict] = {}
+
+    def registrar(self, perfil: PerfilDaRequisicao):
+        total_ms = sum(d for _, _, d in perfil.consultas) * 1000
+        suspeitas = perfil.suspeitas_n_mais_1()
+        with self._lock:
+            r = self._rotas.setdefault(perfil.rota, {
+                "requisicoes": 0, "consultas": 0, "max_consultas": 0, "tempo_sql_ms": 0.0,
+                "duplicadas": 0, "acima_do_orcamento": 0, "orcamento": perfil.orcamento(), "n_mais_1": {},
+            })
+            r["requisicoes"] += 1
+            r["consultas"] += len(perfil.consultas)
+            r["max_consultas"] = max(r["max_consultas"], len(perfil.consultas))
+            r["tempo_sql_ms"] += total_ms
+            r["duplicadas"] += perfil.duplicadas()
+            if perfil.estourou or len(perfil.consultas) > perfil.orcamento():
+                r["acima_do_orcamento"] += 1
+            for sql, n in suspeitas.items():
+                r["n_mais_1"][sql] = max(r["n_mais_1"].get(sql, 0), n)
+
+    def gerar(self) -> dict:
+        with self._lock:
+            return {
+                rota: {
+                    **dados,
+                    "media_consultas": round(dados["consultas"] / dados["requisicoes"], 2),
+                    "tempo_sql_ms": round(dados["tempo_sql_ms"], 2),
+                    "n_mais_1": dict(dados["n_mais_1"]),
+                }
+                for rota, dados in sorted(self._rotas.items())
+            }
+
+    def limpar(self):
+        with self._lock:
+            self._rotas.clear()
+
+
+relatorio = RelatorioPorRota()
+
+
+class MiddlewareDePerfilSQL:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        perfil = PerfilDaRequisicao(scope)
+        token = _perfil_atual.set(perfil)
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                mensagem.setdefault("headers", [])
+                mensagem["headers"] = list(mensagem["headers"]) + [
+                    (b"x-consultas-sql", str(len(perfil.consultas)).encode()),
+                ]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _perfil_atual.reset(token)
+            relatorio.registrar(perfil)
+            suspeitas = perfil.suspeitas_n_mais_1()
+            if suspeitas:
+                logging.warning(
+                    f"Possível N+1 em {scope['method']} {perfil.rota}: "
+                    + "; ".join(f"{n}x {sql[:120]}" for sql, n in suspeitas.items())
+                )
+
+
+def instrumentar_engine(engine):
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        perfil = _perfil_atual.get()
+        if perfil is None:
+            return
+        if ESTRITO and len(perfil.consultas) >= perfil.orcamento():
+            perfil.estourou = True
+            raise OrcamentoDeConsultasExcedido(
+                f"{perfil.rota} passou do orçamento de {perfil.orcamento()} consultas: {statement[:200]}"
+            )
+        perfil._inicio.append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        perfil = _perfil_atual.get()
+        if perfil is None or not perfil._inicio:
+            return
+        perfil.consultas.append((statement, parameters, time.perf_counter() - perfil._inicio.pop()))
+
+
+def instalar(app, engine):
+    """Chamado no main.py; não faz nada se o perfil estiver desligado."""
+    if not ATIVO:
+        return
+    instrumentar_engine(engine)
+    app.add_middleware(MiddlewareDePerfilSQL)
+    logging.warning(f"Perfil de SQL ligado ({'estrito' if ESTRITO else 'relatório'})")
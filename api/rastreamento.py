@@ -0,0 +1,255 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+import httpx
+import orjson
+from starlette.concurrency import run_in_threadpool
+from db.database import BASE_DIR
+
+# Rastreamento (spans) do ciclo de vida das mãos: iniciar_partida, blinds, cada
+# ação, verificar_proxima_etapa, showdown e nova rodada. Ligado por amostragem:
+#   PANO_TRACE_AMOSTRAGEM=0.01   fração das operações rastreadas (padrão 0: desligado)
+#   PANO_TRACE_DESTINO           arquivo JSON lines (padrão data/traces/spans.jsonl)
+#                                ou URL http(s) de um coletor, que recebe POST com os lotes
+# A decisão é tomada no span raiz (a ação, ou iniciar_partida) e vale pra todos os
+# filhos. Sem amostragem o custo é um teste de flag por função decorada; fora da
+# amostra, um contextvar por operação.
+#
+# Cada span leva mesa_id, número da mão, duração, tempo e quantidade de SQL
+# (consultas e commits) e o restante como CPU. Os spans de uma operação vão juntos
+# pra fila quando ela termina; uma tarefa do lifespan exporta em lotes.
+
+TAXA = float(os.getenv("PANO_TRACE_AMOSTRAGEM", "0") or 0)
+ATIVO = TAXA > 0
+DESTINO = os.getenv("PANO_TRACE_DESTINO") or os.path.join(BASE_DIR, "data", "traces", "spans.jsonl")
+
+LOTE_SPANS = 500
+EXPORTACAO_INTERVALO_SEGUNDOS = 5
+# Coletor fora do ar não pode comer a memória: acima disso os spans mais antigos são descartados
+MAX_SPANS_PENDENTES = 50_000
+
+
+class Span:
+    __slots__ = ("nome", "id", "pai", "mesa_id", "mao", "inicio", "inicio_perf", "duracao", "sql", "consultas")
+
+    def __init__(self, nome: str, pai: "Span | None", mesa_id: int | None, mao: int | None):
+        self.nome = nome
+        self.id = random.getrandbits(63)
+        self.pai = pai
+        self.mesa_id = mesa_id if mesa_id is not None else (pai.mesa_id if pai else None)
+        self.mao = mao
+        self.inicio = time.time()
+        self.inicio_perf = time.perf_counter()
+        self.duracao = 0.0
+        self.sql = 0.0
+        self.consultas = 0
+
+
+class Rastro:
+    """Os spans de uma operação amostrada; `pilha` são os abertos, o último é o atual."""
+
+    __slots__ = ("id", "spans", "pilha", "inicio_sql", "inicio_commit")
+
+    def __init__(self):
+        self.id = random.getrandbits(63)
+        self.spans: list[Span] = []
+        self.pilha: list[Span] = []
+        self.inicio_sql: list[float] = []
+        self.inicio_commit: float | None = None
+
+
+# Marca de operação fora da amostra: os filhos não sorteiam de novo
+_NAO_AMOSTRADO = object()
+_rastro_atual: contextvars.ContextVar = contextvars.ContextVar("rastro", default=None)
+
+_pendentes: deque[dict] = deque(maxlen=MAX_SPANS_PENDENTES)
+_lock_exportacao = threading.Lock()
+
+
+def _abrir(rastro: Rastro, nome: str, mesa_id: int | None, inicia_mao: bool) -> Span:
+    pai = rastro.pilha[-1] if rastro.pilha else None
+    # Quem começa mão nova só descobre o número dela lá dentro (marcar_mao)
+    mao = None if inicia_mao or pai is None else pai.mao
+    span = Span(nome, pai, mesa_id, mao)
+    rastro.pilha.append(span)
+    rastro.spans.append(span)
+    return span
+
+
+def _fechar(rastro: Rastro, span: Span):
+    span.duracao = time.perf_counter() - span.inicio_perf
+    rastro.pilha.pop()
+    if not rastro.pilha:
+        _publicar(rastro)
+
+
+def _publicar(rastro: Rastro):
+    linhas = []
+    for span in rastro.spans:
+        # Filho que fechou antes de a mão ter número herda o do pai
+        mao, pai = span.mao, span.pai
+        while mao is None and pai is not None:
+            mao, pai = pai.mao, pai.pai
+        linhas.append({
+            "trace": f"{rastro.id:016x}",
+            "span": f"{span.id:016x}",
+            "pai": f"{span.pai.id:016x}" if span.pai else None,
+            "nome": span.nome,
+            "mesa_id": span.mesa_id,
+            "mao": mao,
+            "inicio": round(span.inicio, 6),
+            "duracao_ms": round(span.duracao * 1000, 3),
+            "sql_ms": round(span.sql * 1000, 3),
+            "cpu_ms": round((span.duracao - span.sql) * 1000, 3),
+            "consultas": span.consultas,
+        })
+    _pendentes.extend(linhas)
+
+
+def rastreado(nome: str, mesa=None, inicia_mao: bool = False):
+    """
+    Decorador que abre um span em volta da função. `mesa(*args, **kwargs)` devolve
+    o mesa_id a partir dos argumentos; sem ela o span herda o do pai.
+    `inicia_mao`: a função começa uma mão nova (o número vem de marcar_mao).
+    """
+    def decorador(func):
+        if not ATIVO:
+            return func
+
+        @functools.wraps(func)
+        def envolvida(*args, **kwargs):
+            rastro = _rastro_atual.get()
+            if rastro is _NAO_AMOSTRADO:
+                return func(*args, **kwargs)
+
+            token = None
+            if rastro is None:
+                if random.random() >= TAXA:
+                    token = _rastro_atual.set(_NAO_AMOSTRADO)
+                    try:
+                        return func(*args, **kwargs)
+                    finally:
+                        _rastro_atual.reset(token)
+                rastro = Rastro()
+                token = _rastro_atual.set(rastro)
+
+            span = _abrir(rastro, nome, mesa(*args, **kwargs) if mesa else None, inicia_mao)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _fechar(rastro, span)
+                if token is not None:
+                    _rastro_atual.reset(token)
+
+        return envolvida
+
+    return decorador
+
+
+def marcar_mao(numero: int):
+    """Número da mão pros spans abertos que ainda não têm (chamado pelo histórico de mãos)."""
+    if not ATIVO:
+        return
+    rastro = _rastro_atual.get()
+    if rastro is None or rastro is _NAO_AMOSTRADO:
+        return
+    for span in rastro.pilha:
+        if span.mao is None:
+            span.mao = numero
+
+
+def _somar_sql(rastro: Rastro, duracao: float):
+    # Tempo inclusivo: a consulta conta pro span atual e pra todos os que o contêm
+    for span in rastro.pilha:
+        span.sql += duracao
+        span.consultas += 1
+
+
+def _rastro_amostrado() -> Rastro | None:
+    rastro = _rastro_atual.get()
+    return None if rastro is None or rastro is _NAO_AMOSTRADO or not rastro.pilha else rastro
+
+
+def instrumentar_engine(engine):
+    from sqlalchemy import event
+    from db.database import SessionLocal
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        rastro = _rastro_amostrado()
+        if rastro is not None:
+            rastro.inicio_sql.append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        rastro = _rastro_amostrado()
+        if rastro is not None and rastro.inicio_sql:
+            _somar_sql(rastro, time.perf_counter() - rastro.inicio_sql.pop())
+
+    @event.listens_for(engine, "handle_error")
+    def _erro(contexto):
+        rastro = _rastro_amostrado()
+        if rastro is not None and rastro.inicio_sql:
+            rastro.inicio_sql.pop()
+
+    # O COMMIT não passa pelo cursor, e no SQLite é onde está o fsync: o engine
+    # avisa antes e a sessão depois
+    @event.listens_for(engine, "commit")
+    def _antes_do_commit(conn):
+        rastro = _rastro_amostrado()
+        if rastro is not None:
+            rastro.inicio_commit = time.perf_counter()
+
+    @event.listens_for(SessionLocal, "after_commit")
+    def _depois_do_commit(session):
+        rastro = _rastro_amostrado()
+        if rastro is not None and rastro.inicio_commit is not None:
+            _somar_sql(rastro, time.perf_counter() - rastro.inicio_commit)
+            rastro.inicio_commit = None
+
+
+def exportar_spans() -> int:
+    """Esvazia a fila em lotes de LOTE_SPANS pro arquivo ou coletor. Retorna quantos saíram."""
+    exportados = 0
+    with _lock_exportacao:
+        while _pendentes:
+            lote = [_pendentes.popleft() for _ in range(min(LOTE_SPANS, len(_pendentes)))]
+            try:
+                if DESTINO.startswith(("http://", "https://")):
+                    resposta = httpx.post(
+                        DESTINO, content=orjson.dumps({"spans": lote}),
+                        headers={"Content-Type": "application/json"}, timeout=5,
+                    )
+                    resposta.raise_for_status()
+                else:
+                    os.makedirs(os.path.dirname(DESTINO), exist_ok=True)
+                    with open(DESTINO, "ab") as arquivo:
+                        arquivo.write(b"".join(orjson.dumps(linha) + b"\n" for linha in lote))
+            except Exception:
+                # Rastreamento nunca derruba o servidor: o lote volta pro começo da fila e a
+                # próxima rodada tenta de novo (com a fila cheia, os spans mais novos é que saem)
+                _pendentes.extendleft(reversed(lote))
+                logging.exception(f"Erro exportando {len(lote)} spans para {DESTINO}")
+                return exportados
+            exportados += len(lote)
+    return exportados
+
+
+async def executar_exportador(intervalo: float = EXPORTACAO_INTERVALO_SEGUNDOS):
+    while True:
+        await asyncio.sleep(intervalo)
+        await run_in_threadpool(exportar_spans)
+
+
+def instalar(engine):
+    """Chamado no main.py; não faz nada se a amostragem estiver desligada."""
+    if not ATIVO:
+        return
+    instrumentar_engine(engine)
+    logging.warning(f"Rastreamento de mãos ligado (amostragem {TAXA:g}, destino {DESTINO})")
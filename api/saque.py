@@ -1,70 +1,76 @@
 from fastapi import APIRouter, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordBearer
 from db.database import get_db
-from db.models import User, Transaction
-from api.auth import get_current_user
-from api.schemas import SaqueInput
-from api.mp import criar_cobranca_pix
+from db.models import Transaction, PedidoPagamento
+from api.auth import get_current_user, UsuarioAutenticado
+from api.schemas import SaqueInput, PedidoPagamentoOut
+from api.pedidos_pagamento import pedido_para_dict, avisar_despachante, CONTA_SAQUES_EM_TRANSITO
+from db.dinheiro import reais_para_centavos, centavos_para_reais, formatar_reais
+from api.carteira import lancar, saldo_usuario, debitar_usuario, SaldoInsuficiente, CONTA_TAXAS
 
 router = APIRouter(tags=["Saque"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
-@router.post("/saque")
-def sacar(
-    saque_input: SaqueInput,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
-    valor = saque_input.valor
-    taxa_saque = 0.25
-    valor_minimo = 10.0
-    valor_maximo = 1000.0
-
-    if valor < valor_minimo:
-        raise HTTPException(status_code=400, detail=f"Valor mínimo para saque é R${valor_minimo}")
-    if valor > valor_maximo:
-        raise HTTPException(status_code=400, detail=f"Valor máximo por saque é R${valor_maximo}")
-
-    valor_total = valor + taxa_saque
-
-    if current_user.balance < valor_total:
+def registrar_saque(db: Session, current_user: UsuarioAutenticado, valor: int, taxa: int) -> dict:
+    """Débito, taxa, transação e pedido no outbox num commit só."""
+    try:
+        debitar_usuario(db, current_user.id, CONTA_SAQUES_EM_TRANSITO, valor + taxa, "saque")
+    except SaldoInsuficiente:
         raise HTTPException(
             status_code=400,
-            detail=f"Saldo insuficiente. É necessário R${valor_total:.2f} (valor + taxa de R${taxa_saque:.2f})"
+            detail=f"Saldo insuficiente. É necessário {formatar_reais(valor + taxa)} (valor + taxa de {formatar_reais(taxa)})"
         )
-
-    try:
-        pagamento = criar_cobranca_pix(valor, current_user.username, current_user.email)
-        print("Resposta completa do Mercado Pago:", pagamento)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao criar cobrança no Mercado Pago: {str(e)}")
-
-    if 'point_of_interaction' not in pagamento:
-        raise HTTPException(status_code=500, detail="Erro ao criar cobrança no Mercado Pago. 'point_of_interaction' não encontrado.")
-    
-    try:
-        qr_code = pagamento["point_of_interaction"]["transaction_data"]["qr_code"]
-    except KeyError:
-        raise HTTPException(status_code=500, detail="Erro ao acessar QR Code. Dados de transação incompletos.")
-
-    current_user.balance -= valor_total
-    db.commit()
+    # A taxa sai do trânsito pra receita já aqui; se o saque falhar, o despachante estorna
+    lancar(db, CONTA_SAQUES_EM_TRANSITO, CONTA_TAXAS, taxa, "taxa_saque")
+    db.flush()
+    novo_saldo = saldo_usuario(db, current_user.id)
 
     transacao = Transaction(
         user_id=current_user.id,
         tipo="saque",
         valor=valor,
-        saldo_restante=current_user.balance
+        status="pending",
+        saldo_restante=novo_saldo
     )
     db.add(transacao)
+    db.flush()
+
+    pedido = PedidoPagamento(
+        user_id=current_user.id,
+        tipo="saque",
+        valor=valor,
+        taxa=taxa,
+        nome=current_user.username,
+        email=current_user.email,
+        transacao_id=transacao.id,
+    )
+    db.add(pedido)
     db.commit()
+    return {**pedido_para_dict(pedido), "new_balance": centavos_para_reais(novo_saldo)}
+
+
+# Debita na hora e responde 202; o envio ao gateway é do despachante
+# (api/pedidos_pagamento.py). O andamento fica em GET /pagamentos/{id}.
+@router.post("/saque", status_code=202, response_model=PedidoPagamentoOut)
+async def sacar(
+    saque_input: SaqueInput,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user),
+):
+    # Valores em centavos
+    valor = reais_para_centavos(saque_input.valor)
+    taxa_saque = 25
+    valor_minimo = 1000
+    valor_maximo = 100000
+
+    if valor < valor_minimo:
+        raise HTTPException(status_code=400, detail=f"Valor mínimo para saque é {formatar_reais(valor_minimo)}")
+    if valor > valor_maximo:
+        raise HTTPException(status_code=400, detail=f"Valor máximo por saque é {formatar_reais(valor_maximo)}")
 
-    return {
-        "msg": f"Saque de R${valor:.2f} realizado com sucesso!",
-        "taxa": taxa_saque,
-        "total_descontado": valor_total,
-        "new_balance": current_user.balance,
-        "qr_code": qr_code
-    }
+    pedido = await run_in_threadpool(registrar_saque, db, current_user, valor, taxa_saque)
+    avisar_despachante()
+    return pedido
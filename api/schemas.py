@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
 class UserCreate(BaseModel):
@@ -27,4 +27,224 @@ class Mesa(MesaBase):
     jogadores: int
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class MesaConfigInput(BaseModel):
+    # Valores em reais; só os campos enviados são alterados
+    nome: Optional[str] = None
+    limite_jogadores: Optional[int] = None
+    tipo_jogo: Optional[str] = None
+    valor_minimo: Optional[float] = None
+    valor_minimo_aposta: Optional[float] = None
+    small_blind: Optional[float] = None
+    big_blind: Optional[float] = None
+
+
+# Modelos de resposta (valores em reais)
+class MensagemOut(BaseModel):
+    msg: str
+
+
+class SaldoOut(BaseModel):
+    balance: float
+
+
+class VezOut(BaseModel):
+    jogador_da_vez: Optional[int]
+
+
+class JogadorNaMesaOut(BaseModel):
+    id: int
+    username: str
+    stack: float
+    saldo_restante: Optional[float]
+
+
+class CartasComunitariasOut(BaseModel):
+    flop: List[str]
+    turn: Optional[str]
+    river: Optional[str]
+
+
+class MaoDoJogadorOut(BaseModel):
+    user_id: str
+    cartas: List[str]
+
+
+class EntrarMesaOut(BaseModel):
+    # Os demais campos só vêm quando a entrada dá início à partida
+    msg: str
+    small_blind: Optional[int] = None
+    big_blind: Optional[int] = None
+    jogador_da_vez: Optional[int] = None
+    aposta_atual_mesa: Optional[float] = None
+    estado_da_rodada: Optional[str] = None
+    maos: Optional[List[MaoDoJogadorOut]] = None
+    flop: Optional[List[str]] = None
+    turn: Optional[str] = None
+    river: Optional[str] = None
+
+
+class EstadoMesaAssentoOut(BaseModel):
+    # Nos deltas só vêm os campos que mudaram; assento novo vem completo
+    username: Optional[str] = None
+    stack: Optional[float] = None
+    aposta: Optional[float] = None
+    foldado: Optional[bool] = None
+
+
+class EstadoMesaCamposOut(BaseModel):
+    status: Optional[str] = None
+    rodada: Optional[str] = None
+    jogador_da_vez: Optional[int] = None
+    small_blind: Optional[int] = None
+    big_blind: Optional[int] = None
+    aposta_atual: Optional[float] = None
+    pote: Optional[float] = None
+    flop: Optional[List[str]] = None
+    turn: Optional[str] = None
+    river: Optional[str] = None
+
+
+class EstadoMesaOut(BaseModel):
+    versao: Optional[int] = None  # None: estado lido no meio de escritas, não serve de base pra delta
+    completo: bool
+    base: Optional[int] = None  # versão de partida do delta
+    mesa: Optional[EstadoMesaCamposOut] = None
+    assentos: Optional[Dict[str, EstadoMesaAssentoOut]] = None  # por user_id
+    saiu: Optional[List[str]] = None
+
+
+class DicaOut(BaseModel):
+    rodada: str
+    categoria: str  # nome em RANKING (game/avaliador_maos.py)
+    outs: List[str]
+    cartas_restantes: int
+    probabilidade_melhora: Optional[float]  # na próxima carta; None no pre-flop e no river
+    melhora_para: Dict[str, int]  # categoria -> quantos outs levam a ela
+
+
+class EquidadeInput(BaseModel):
+    faixa_a: str  # ex: "QQ+, AKs, AQo, T9s:0.5"
+    faixa_b: str
+    mesa: List[str] = []  # 0, 3, 4 ou 5 cartas, ex: ["A♠", "10♦", "2♣"]
+
+
+class TexturaMesaOut(BaseModel):
+    categorias: Dict[str, float]  # da mesa sozinha nos runouts
+    flush_possivel: float
+    pareada: float
+
+
+class EquidadeOut(BaseModel):
+    equidade_a: float
+    equidade_b: float
+    empate: float
+    combinacoes_a: float  # combinações ponderadas que a mesa não bloqueia
+    combinacoes_b: float
+    runouts: int
+    exato: bool  # False: amostra fixa de runouts (pre-flop)
+    categorias_a: Dict[str, float]
+    categorias_b: Dict[str, float]
+    textura: TexturaMesaOut
+
+
+class EstadoRodadaOut(BaseModel):
+    estado_atual: str
+
+
+class MaoShowdownOut(BaseModel):
+    jogador_id: int
+    mao: List[str]
+    mao_rank: Optional[int]
+
+
+class ShowdownOut(BaseModel):
+    msg: Optional[str] = None  # só em caso de erro
+    vencedores: List[int] = []
+    ganhos: Dict[int, float] = {}
+    cartas_comunitarias: List[str] = []
+    maos: List[MaoShowdownOut] = []
+
+
+class MesaDisponivelOut(BaseModel):
+    id: int
+    status: str
+    limite_jogadores: int
+    jogadores_atuais: int
+    tipo_jogo: str
+    valor_minimo_aposta: float
+
+
+class TransacaoOut(BaseModel):
+    id: int
+    tipo: str
+    valor: float
+    status: Optional[str]
+    saldo_restante: Optional[float]
+    created_at: Optional[str]
+
+
+class HistoricoOut(BaseModel):
+    transacoes: List[TransacaoOut]
+    proximo_cursor: Optional[str]
+
+
+class PedidoPagamentoOut(BaseModel):
+    id: int
+    tipo: str
+    status: str
+    valor: float
+    taxa: float
+    qr_code: Optional[str] = None
+    qr_code_base64: Optional[str] = None
+    erro: Optional[str] = None
+    created_at: Optional[str] = None
+    new_balance: Optional[float] = None  # saldo logo depois do pedido (saque já debita)
+
+
+class FaixaDeStakeOut(BaseModel):
+    stake: float  # big blind em reais
+    mesas: int
+    assentos_livres: int
+
+
+class NivelDeBlindsInput(BaseModel):
+    small_blind: float
+    big_blind: float
+    duracao_minutos: int
+
+
+class TorneioInput(BaseModel):
+    # buy_in em reais; stack e blinds em fichas, na mesma escala dos stacks das mesas
+    nome: str
+    buy_in: float
+    stack_inicial: float
+    jogadores_por_mesa: int = 9
+    niveis: List[NivelDeBlindsInput]
+
+
+class TorneioOut(BaseModel):
+    id: int
+    nome: str
+    status: str
+    buy_in: float
+    stack_inicial: float
+    inscritos: int
+    restantes: int
+    nivel: int
+    small_blind: float
+    big_blind: float
+    proximo_nivel_em: Optional[int] = None  # segundos; None no último nível
+    mesas: Dict[str, int]  # mesa_id -> jogadores
+
+
+class EstatisticasJogadorOut(BaseModel):
+    user_id: int
+    maos: int
+    vpip: float  # % das mãos
+    pfr: float  # % das mãos
+    fator_agressao: Optional[float] = None  # (raises + all-ins) / calls
+    folds: int
+    ganho: float  # reais recebidos de potes, só mesas de cash
+    resultado: float  # ganho menos o que colocou no pote
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from api.auth import contexto_senhas
+from api.metricas import Coletor
+
+# bcrypt é caro de propósito. Hash e verificação rodam num pool próprio e
+# limitado, fora do threadpool que atende as rotas de jogo. Quando a fila
+# enche, o request é recusado na hora com 503 em vez de esperar.
+
+SENHAS_WORKERS = int(os.getenv("PANO_SENHAS_WORKERS", str(min(4, os.cpu_count() or 1))))
+SENHAS_FILA_MAXIMA = int(os.getenv("PANO_SENHAS_FILA_MAXIMA", "64"))
+
+
+class PoolDeSenhas:
+    def __init__(self, workers: int, fila_maxima: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="senhas")
+        self.workers = workers
+        self.fila_maxima = fila_maxima
+        self._lock = threading.Lock()
+        self.pendentes = 0  # na fila + executando
+        self.executando = 0
+        self.rejeitadas = 0
+        self.concluidas = 0
+        self.segundos_total = 0.0
+
+    def _admitir(self):
+        with self._lock:
+            if self.pendentes >= self.fila_maxima:
+                self.rejeitadas += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Servidor ocupado, tente novamente em instantes.",
+                    headers={"Retry-After": "1"},
+                )
+            self.pendentes += 1
+
+    def _executar(self, func, *args):
+        with self._lock:
+            self.executando += 1
+        inicio = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.executando -= 1
+                self.pendentes -= 1
+                self.concluidas += 1
+                self.segundos_total += time.perf_counter() - inicio
+
+    def _liberar_se_cancelado(self, futuro):
+        # Cancelado ainda na fila (cliente desconectou): _executar nunca roda, a vaga sai aqui
+        if futuro.cancelled():
+            with self._lock:
+                self.pendentes -= 1
+
+    async def rodar(self, func, *args):
+        self._admitir()
+        try:
+            futuro = self._executor.submit(self._executar, func, *args)
+        except BaseException:
+            with self._lock:
+                self.pendentes -= 1
+            raise
+        futuro.add_done_callback(self._liberar_se_cancelado)
+        return await asyncio.wrap_future(futuro)
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "fila_maxima": self.fila_maxima,
+                "em_fila": self.pendentes - self.executando,
+                "executando": self.executando,
+                "rejeitadas": self.rejeitadas,
+                "concluidas": self.concluidas,
+                "segundos_total": round(self.segundos_total, 3),
+            }
+
+
+pool_senhas = PoolDeSenhas(SENHAS_WORKERS, SENHAS_FILA_MAXIMA)
+
+Coletor("panopoker_senhas_em_fila", "Hashes de senha aguardando o pool", lambda: pool_senhas.estatisticas()["em_fila"])
+Coletor("panopoker_senhas_executando", "Hashes de senha rodando agora", lambda: pool_senhas.estatisticas()["executando"])
+Coletor("panopoker_senhas_concluidas_total", "Hashes de senha concluídos", lambda: pool_senhas.estatisticas()["concluidas"], "counter")
+Coletor("panopoker_senhas_rejeitadas_total", "Hashes de senha recusados com 503", lambda: pool_senhas.estatisticas()["rejeitadas"], "counter")
+Coletor("panopoker_senhas_segundos_total", "Tempo total gasto com hash de senha", lambda: pool_senhas.estatisticas()["segundos_total"], "counter")
+
+
+async def hash_senha(senha: str) -> str:
+    return await pool_senhas.rodar(lambda: contexto_senhas().hash(senha))
+
+
+async def verificar_senha(senha: str, senha_hash: str) -> tuple[bool, str | None]:
+    """Retorna (senha_ok, novo_hash). novo_hash vem preenchido quando o hash precisa ser refeito."""
+    return await pool_senhas.rodar(lambda: contexto_senhas().verify_and_update(senha, senha_hash))
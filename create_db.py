@@ -5,4 +5,9 @@ print("Criando o banco de dados...")
 
 Base.metadata.create_all(bind=engine)
 
+# create_all não cria índices novos em tabelas que já existiam
+for tabela in Base.metadata.sorted_tables:
+    for indice in tabela.indexes:
+        indice.create(bind=engine, checkfirst=True)
+
 print("Banco criado com sucesso!")
\ No newline at end of file
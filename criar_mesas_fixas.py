@@ -16,10 +16,10 @@ if db.query(Mesa).count() == 0:
             status=MesaStatus.aberta,
             limite_jogadores=6,
             tipo_jogo="Texas Hold'em",
-            valor_minimo=0.30,  # Adicionando o valor mínimo da mesa
-            valor_minimo_aposta=0.30,
-            small_blind=0.01,
-            big_blind=0.02,
+            valor_minimo=30,  # Adicionando o valor mínimo da mesa (centavos)
+            valor_minimo_aposta=30,
+            small_blind=1,
+            big_blind=2,
         ),
         Mesa(
             id=2,
@@ -27,10 +27,10 @@ if db.query(Mesa).count() == 0:
             status=MesaStatus.aberta,
             limite_jogadores=6,
             tipo_jogo="Texas Hold'em",
-            valor_minimo=2.00,  # Adicionando o valor mínimo da mesa
-            valor_minimo_aposta=2.00,
-            small_blind=0.05,
-            big_blind=0.10,
+            valor_minimo=200,  # Adicionando o valor mínimo da mesa (centavos)
+            valor_minimo_aposta=200,
+            small_blind=5,
+            big_blind=10,
         ),
         Mesa(
             id=3,
@@ -38,10 +38,10 @@ if db.query(Mesa).count() == 0:
             status=MesaStatus.aberta,
             limite_jogadores=6,
             tipo_jogo="Texas Hold'em",
-            valor_minimo=10.00,  # Adicionando o valor mínimo da mesa
-            valor_minimo_aposta=10.00,
-            small_blind=0.25,
-            big_blind=0.50,
+            valor_minimo=1000,  # Adicionando o valor mínimo da mesa (centavos)
+            valor_minimo_aposta=1000,
+            small_blind=25,
+            big_blind=50,
         ),
     ]
 
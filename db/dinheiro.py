@@ -0,0 +1,21 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+# Todo dinheiro (saldo, stack, apostas, blinds, transações) é guardado e
+# calculado em centavos inteiros. Reais só aparecem na borda da API.
+
+
+def reais_para_centavos(valor) -> int:
+    """Converte um valor em reais (float, str ou Decimal) para centavos, arredondando meio centavo pra cima."""
+    return int((Decimal(str(valor)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def centavos_para_reais(centavos: int | None) -> float | None:
+    if centavos is None:
+        return None
+    return centavos / 100
+
+
+def formatar_reais(centavos: int) -> str:
+    sinal = "-" if centavos < 0 else ""
+    inteiro, resto = divmod(abs(centavos), 100)
+    return f"{sinal}R${inteiro}.{resto:02d}"
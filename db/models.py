@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum, Boolean, Text, JSON
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Boolean, Text, JSON, Index
 from .database import Base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -12,7 +12,6 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     email = Column(String, unique=True, index=True)
     password = Column(String)
-    balance = Column(Float, default=0.0)
     is_admin = Column(Boolean, default=False)
     transactions = relationship("Transaction", back_populates="user")
     jogadores_na_mesa = relationship("JogadorNaMesa", back_populates="user")
@@ -25,14 +24,54 @@ class Transaction(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    valor = Column(Float, nullable=False)
+    valor = Column(Integer, nullable=False)  # centavos
     tipo = Column(String, nullable=False)  # 'deposit' ou 'withdraw'
     status = Column(String, default="completed")
     created_at = Column(DateTime, default=datetime.utcnow)
-    saldo_restante = Column(Float)
+    saldo_restante = Column(Integer)
 
     user = relationship("User", back_populates="transactions")
 
+    # Paginação keyset do histórico: (user_id, created_at, id)
+    __table_args__ = (
+        Index("ix_transactions_user_created", "user_id", "created_at", "id"),
+    )
+
+
+# Livro-razão da carteira: partidas dobradas, só inserts.
+# Cada movimento grava duas linhas com o mesmo `lote`: -valor na conta de origem
+# e +valor na de destino, então a soma de tudo é sempre zero.
+class Lancamento(Base):
+    __tablename__ = "lancamentos"
+
+    id = Column(Integer, primary_key=True, index=True)
+    lote = Column(String, nullable=False)
+    conta = Column(String, nullable=False)  # 'usuario:1', 'mesa:2', 'externo:mercadopago'...
+    valor = Column(Integer, nullable=False)  # centavos, positivo = entrada na conta
+    tipo = Column(String, nullable=False)
+    referencia = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_lancamentos_conta_id", "conta", "id"),
+    )
+
+
+# Saldo materializado de uma conta até `ultimo_lancamento_id`.
+# Saldo atual = último snapshot + soma dos lançamentos depois dele.
+class SaldoSnapshot(Base):
+    __tablename__ = "saldos_snapshot"
+
+    id = Column(Integer, primary_key=True, index=True)
+    conta = Column(String, nullable=False)
+    saldo = Column(Integer, nullable=False)  # centavos
+    ultimo_lancamento_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_saldos_snapshot_conta_ultimo", "conta", "ultimo_lancamento_id"),
+    )
+
 
 # ENUM para status da mesa
 class MesaStatus(str, enum.Enum):
@@ -49,13 +88,14 @@ class Mesa(Base):
     status = Column(Enum(MesaStatus), default=MesaStatus.aberta)
     limite_jogadores = Column(Integer, default=6)
     tipo_jogo = Column(String, default="Texas Hold'em")
-    valor_minimo_aposta = Column(Float)
-    valor_minimo = Column(Float)
-    aposta_atual = Column(Float, default=0.0)
+    # Valores em centavos
+    valor_minimo_aposta = Column(Integer)
+    valor_minimo = Column(Integer)
+    aposta_atual = Column(Integer, default=0)
     small_blind_pos = Column(Integer, nullable=True)
     big_blind_pos = Column(Integer, nullable=True)
-    small_blind = Column(Float, nullable=False)
-    big_blind = Column(Float, nullable=False)
+    small_blind = Column(Integer, nullable=False)
+    big_blind = Column(Integer, nullable=False)
     side_pots = relationship("SidePot", back_populates="mesa")
     jogadores = relationship("JogadorNaMesa", back_populates="mesa")
     flop = Column(JSON, nullable=True)
@@ -65,6 +105,9 @@ class Mesa(Base):
     mostrar_turn = Column(Boolean, default=False)
     mostrar_river = Column(Boolean, default=False)
     jogador_da_vez_id = Column(Integer, nullable=True)
+    torneio_id = Column(Integer, ForeignKey("torneios.id"), nullable=True, index=True)  # None = mesa de cash
+    # Sobe a cada transação que mexe na mesa, nos assentos ou nos side pots (game/estado_mesa.py)
+    versao = Column(Integer, nullable=False, default=0)
 
 
 
@@ -77,10 +120,11 @@ class JogadorNaMesa(Base):
     id = Column(Integer, primary_key=True, index=True)
     mesa_id = Column(Integer, ForeignKey("mesas.id"))
     user_id = Column(Integer, ForeignKey("users.id"))
-    stack_inicial = Column(Float)  # Aqui está o campo stack_inicial
-    saldo_restante = Column(Float)
-    aposta_atual = Column(Float, default=0.0)
-    stack = Column(Float, default=0.0)
+    # Valores em centavos
+    stack_inicial = Column(Integer)  # Aqui está o campo stack_inicial
+    saldo_restante = Column(Integer)
+    aposta_atual = Column(Integer, default=0)
+    stack = Column(Integer, default=0)
     mesa = relationship("Mesa", back_populates="jogadores")
     user = relationship("User", back_populates="jogadores_na_mesa")
     foldado = Column(Boolean, default=False)
@@ -98,8 +142,152 @@ class SidePot(Base):
     id = Column(Integer, primary_key=True, index=True)
     mesa_id = Column(Integer, ForeignKey("mesas.id"))
     jogador_id = Column(Integer, ForeignKey("jogadores_na_mesa.id"))  # Corrigido para 'jogadores_na_mesa.id'
-    valor = Column(Float)
+    valor = Column(Integer)  # centavos
 
     mesa = relationship("Mesa", back_populates="side_pots")
     jogador = relationship("JogadorNaMesa", back_populates="side_pots")
 
+
+
+# Histórico de mãos: uma linha por mão jogada numa mesa
+class Mao(Base):
+    __tablename__ = "maos"
+
+    id = Column(Integer, primary_key=True, index=True)
+    mesa_id = Column(Integer, ForeignKey("mesas.id"), nullable=False)
+    numero = Column(Integer, nullable=False)  # sequência da mão dentro da mesa
+    iniciada_em = Column(DateTime, default=datetime.utcnow)
+    finalizada_em = Column(DateTime, nullable=True)
+    jogadores = Column(JSON)  # [{user_id, stack_inicial, cartas}]
+    cartas_comunitarias = Column(JSON, nullable=True)
+    pote = Column(Integer, nullable=True)  # centavos
+    vencedores = Column(JSON, nullable=True)
+    ganhos = Column(JSON, nullable=True)  # {user_id: centavos}
+    stacks_finais = Column(JSON, nullable=True)  # {user_id: centavos}
+    arquivada = Column(Boolean, default=False)
+    semente = Column(Integer, nullable=True)  # embaralhamento da mão (game/baralho.py)
+    inicio = Column(String, nullable=True)  # "iniciar_partida" ou "nova_rodada": por onde a mão começou
+
+    acoes = relationship("AcaoMao", back_populates="mao")
+
+    __table_args__ = (
+        Index("ix_maos_mesa_id_id", "mesa_id", "id"),
+        Index("ix_maos_finalizada_arquivada", "arquivada", "finalizada_em"),
+    )
+
+
+class AcaoMao(Base):
+    __tablename__ = "acoes_mao"
+
+    id = Column(Integer, primary_key=True, index=True)
+    mao_id = Column(Integer, ForeignKey("maos.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    acao = Column(String, nullable=False)  # small_blind, big_blind, call, check, raise, allin, fold
+    valor = Column(Integer, default=0)  # centavos colocados no pote nessa ação
+    rodada = Column(String)  # pre-flop, flop, turn, river
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    mao = relationship("Mao", back_populates="acoes")
+
+
+# Fila idempotente de notificações do Mercado Pago: uma linha por pagamento.
+# Notificação repetida não cria linha nova; o crédito só acontece na transição
+# pra 'creditada', que é feita uma vez só.
+class NotificacaoIPN(Base):
+    __tablename__ = "notificacoes_ipn"
+
+    payment_id = Column(String, primary_key=True)
+    status = Column(String, nullable=False, default="recebida")  # recebida, pendente, creditada, ignorada, erro
+    tentativas = Column(Integer, default=0)
+    resultado = Column(Text, nullable=True)
+    recebida_em = Column(DateTime, default=datetime.utcnow)
+    processada_em = Column(DateTime, nullable=True)
+    proxima_tentativa_em = Column(DateTime, nullable=True)  # backoff depois de erro na consulta
+
+    __table_args__ = (
+        Index("ix_notificacoes_ipn_status_recebida", "status", "recebida_em"),
+    )
+
+
+# Outbox de depósitos e saques: o request grava o pedido na mesma transação do
+# movimento na carteira e o despachante (api/pedidos_pagamento.py) fala com o
+# gateway depois. status: pendente, enviando, aguardando_pagamento, concluido, falhou
+class PedidoPagamento(Base):
+    __tablename__ = "pedidos_pagamento"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    tipo = Column(String, nullable=False)  # 'deposito' ou 'saque'
+    valor = Column(Integer, nullable=False)  # centavos
+    taxa = Column(Integer, default=0)  # centavos
+    nome = Column(String)
+    email = Column(String)
+    status = Column(String, nullable=False, default="pendente")
+    tentativas = Column(Integer, default=0)
+    payment_id = Column(String, nullable=True, index=True)
+    qr_code = Column(Text, nullable=True)
+    qr_code_base64 = Column(Text, nullable=True)
+    erro = Column(Text, nullable=True)
+    transacao_id = Column(Integer, ForeignKey("transactions.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    atualizado_em = Column(DateTime, default=datetime.utcnow)
+    proxima_tentativa_em = Column(DateTime, nullable=True)  # backoff depois de erro no envio
+
+    __table_args__ = (
+        Index("ix_pedidos_pagamento_status_id", "status", "id"),
+        Index("ix_pedidos_pagamento_user_id", "user_id", "id"),
+    )
+
+
+
+# Torneios multi-mesa (game/torneios.py). As fichas do torneio vivem em
+# jogadores_na_mesa.stack como numa mesa de cash, mas não são dinheiro: o buy-in
+# vai pra conta torneio:{id} na inscrição e sai de lá na premiação.
+# status: inscricoes, em_andamento, finalizado
+class Torneio(Base):
+    __tablename__ = "torneios"
+
+    id = Column(Integer, primary_key=True, index=True)
+    nome = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="inscricoes")
+    buy_in = Column(Integer, nullable=False)  # centavos
+    stack_inicial = Column(Integer, nullable=False)  # fichas, na mesma escala de stack
+    jogadores_por_mesa = Column(Integer, default=9)
+    niveis = Column(JSON, nullable=False)  # [{small_blind, big_blind, duracao_segundos}]
+    created_at = Column(DateTime, default=datetime.utcnow)
+    iniciado_em = Column(DateTime, nullable=True)
+    finalizado_em = Column(DateTime, nullable=True)
+
+
+class InscricaoTorneio(Base):
+    __tablename__ = "inscricoes_torneio"
+
+    id = Column(Integer, primary_key=True, index=True)
+    torneio_id = Column(Integer, ForeignKey("torneios.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    posicao_final = Column(Integer, nullable=True)  # None enquanto estiver vivo
+    premio = Column(Integer, default=0)  # centavos
+    eliminado_em = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_inscricoes_torneio_torneio_user", "torneio_id", "user_id", unique=True),
+    )
+
+
+# Estatísticas acumuladas por jogador (game/estatisticas.py). Contadores somados
+# em memória a cada ação e descarregados aqui periodicamente; nunca recalculados
+# a partir do histórico, a não ser pela reconstrução manual.
+class EstatisticaJogador(Base):
+    __tablename__ = "estatisticas_jogador"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    maos = Column(Integer, default=0)  # mãos recebidas
+    vpip = Column(Integer, default=0)  # mãos em que pôs dinheiro voluntariamente no pré-flop
+    pfr = Column(Integer, default=0)  # mãos em que aumentou no pré-flop
+    agressivas = Column(Integer, default=0)  # raises e all-ins, em qualquer rodada
+    calls = Column(Integer, default=0)
+    folds = Column(Integer, default=0)
+    investido = Column(Integer, default=0)  # centavos colocados no pote (só mesas de cash)
+    ganho = Column(Integer, default=0)  # centavos recebidos de potes (só mesas de cash)
+    atualizado_em = Column(DateTime, default=datetime.utcnow)
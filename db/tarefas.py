@@ -0,0 +1,23 @@
+import asyncio
+import logging
+from starlette.concurrency import run_in_threadpool
+from db.database import SessionLocal
+
+
+def executar_com_sessao(func):
+    db = SessionLocal()
+    try:
+        return func(db)
+    finally:
+        db.close()
+
+
+# Roda `func(db)` a cada `intervalo` segundos numa thread, com sessão própria.
+# Erros são logados e a tarefa continua no próximo ciclo.
+async def executar_periodicamente(func, intervalo: float):
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            await run_in_threadpool(executar_com_sessao, func)
+        except Exception:
+            logging.exception(f"Erro na tarefa periódica {func.__name__}")
@@ -1,25 +1,32 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from db.database import get_db
-from db.models import Mesa, JogadorNaMesa, SidePot, User
+from db.models import Mesa, JogadorNaMesa, SidePot
 from game.partida import ControladorDePartida, get_jogadores_da_mesa
-from api.auth import get_current_user
+from api.auth import get_current_user, UsuarioAutenticado
+from db.dinheiro import reais_para_centavos, formatar_reais
+from game.historico_maos import registrar_acao
+from api.schemas import MensagemOut
+from api.limites import limitar_acao
+from api.rastreamento import rastreado
 
-router = APIRouter(prefix="/mesas", tags=["Ações de Jogo"])
+router = APIRouter(prefix="/mesas", tags=["Ações de Jogo"], dependencies=[Depends(limitar_acao)])
 
 
-def get_jogador(db: Session, mesa_id: int, user_id: int) -> JogadorNaMesa:
-    jogador = db.query(JogadorNaMesa).filter_by(mesa_id=mesa_id, user_id=user_id).first()
-    if not jogador:
-        raise HTTPException(status_code=404, detail="Jogador não encontrado na mesa.")
-    return jogador
+def _mesa_da_rota(*_, mesa_id: int, **__) -> int:
+    return mesa_id
 
 
-def get_mesa(db: Session, mesa_id: int) -> Mesa:
+def carregar_mesa(db: Session, mesa_id: int, user_id: int) -> tuple[Mesa, list[JogadorNaMesa], JogadorNaMesa]:
+    """Mesa e jogadores numa ida ao banco cada; o controlador reaproveita a mesma lista."""
     mesa = db.query(Mesa).filter_by(id=mesa_id).first()
     if not mesa:
         raise HTTPException(status_code=404, detail="Mesa não encontrada.")
-    return mesa
+    jogadores = get_jogadores_da_mesa(mesa_id, db)
+    jogador = next((j for j in jogadores if j.user_id == user_id), None)
+    if not jogador:
+        raise HTTPException(status_code=404, detail="Jogador não encontrado na mesa.")
+    return mesa, jogadores, jogador
 
 
 def verificar_vez(jogador: JogadorNaMesa, mesa: Mesa):
@@ -27,10 +34,10 @@ def verificar_vez(jogador: JogadorNaMesa, mesa: Mesa):
         raise HTTPException(status_code=403, detail="Não é sua vez de jogar.")
 
 
-@router.post("/{mesa_id}/call")
-def call(mesa_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    mesa = get_mesa(db, mesa_id)
-    jogador = get_jogador(db, mesa_id, current_user.id)
+@router.post("/{mesa_id}/call", response_model=MensagemOut)
+@rastreado("acao_call", mesa=_mesa_da_rota)
+def call(mesa_id: int, db: Session = Depends(get_db), current_user: UsuarioAutenticado = Depends(get_current_user)):
+    mesa, jogadores, jogador = carregar_mesa(db, mesa_id, current_user.id)
     verificar_vez(jogador, mesa)
 
     valor_para_pagar = mesa.aposta_atual - jogador.aposta_atual
@@ -38,39 +45,39 @@ def call(mesa_id: int, db: Session = Depends(get_db), current_user: User = Depen
         raise HTTPException(status_code=400, detail="Nenhuma aposta para pagar.")
 
     if jogador.stack < valor_para_pagar:
-        valor_real = jogador.stack
-        jogador.aposta_atual += valor_real
+        valor_pago = jogador.stack
+        jogador.aposta_atual += valor_pago
         jogador.stack = 0
         jogador.saldo_restante = 0
     else:
+        valor_pago = valor_para_pagar
         jogador.stack -= valor_para_pagar
         jogador.aposta_atual += valor_para_pagar
         jogador.saldo_restante = jogador.stack
 
+    registrar_acao(db, mesa, current_user.id, "call", valor_pago)
     jogador.rodada_ja_agiu = True
-    db.commit()
 
-    jogadores = get_jogadores_da_mesa(mesa_id, db)
+    # Sem commit aqui: a ação vai pro banco junto com a mudança de vez, no controlador
     controlador = ControladorDePartida(mesa, jogadores, db)
     controlador.verificar_proxima_etapa()
     controlador.avancar_vez()
 
-    return {"msg": f"Call de R${valor_para_pagar:.2f}"}
+    return {"msg": f"Call de {formatar_reais(valor_para_pagar)}"}
 
 
-@router.post("/{mesa_id}/check")
-def check(mesa_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    mesa = get_mesa(db, mesa_id)
-    jogador = get_jogador(db, mesa_id, current_user.id)
+@router.post("/{mesa_id}/check", response_model=MensagemOut)
+@rastreado("acao_check", mesa=_mesa_da_rota)
+def check(mesa_id: int, db: Session = Depends(get_db), current_user: UsuarioAutenticado = Depends(get_current_user)):
+    mesa, jogadores, jogador = carregar_mesa(db, mesa_id, current_user.id)
     verificar_vez(jogador, mesa)
 
     if jogador.aposta_atual != mesa.aposta_atual:
         raise HTTPException(status_code=400, detail="Você não pode dar check. Há uma aposta maior que a sua.")
     
+    registrar_acao(db, mesa, current_user.id, "check", 0)
     jogador.rodada_ja_agiu = True
-    db.commit()
 
-    jogadores = get_jogadores_da_mesa(mesa_id, db)
     controlador = ControladorDePartida(mesa, jogadores, db)
     controlador.verificar_proxima_etapa()
     controlador.avancar_vez()
@@ -78,13 +85,13 @@ def check(mesa_id: int, db: Session = Depends(get_db), current_user: User = Depe
     return {"msg": "Check realizado com sucesso!"}
 
 
-@router.post("/{mesa_id}/raise")
-def raise_aposta(mesa_id: int, valor: float, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    mesa = get_mesa(db, mesa_id)
-    jogador = get_jogador(db, mesa_id, current_user.id)
+@router.post("/{mesa_id}/raise", response_model=MensagemOut)
+@rastreado("acao_raise", mesa=_mesa_da_rota)
+def raise_aposta(mesa_id: int, valor: float, db: Session = Depends(get_db), current_user: UsuarioAutenticado = Depends(get_current_user)):
+    mesa, jogadores, jogador = carregar_mesa(db, mesa_id, current_user.id)
     verificar_vez(jogador, mesa)
 
-    valor_total = mesa.aposta_atual + valor
+    valor_total = mesa.aposta_atual + reais_para_centavos(valor)
     if jogador.stack < (valor_total - jogador.aposta_atual):
         raise HTTPException(status_code=400, detail="Stack insuficiente para raise.")
 
@@ -94,21 +101,20 @@ def raise_aposta(mesa_id: int, valor: float, db: Session = Depends(get_db), curr
     jogador.saldo_restante = jogador.stack
     mesa.aposta_atual = valor_total
 
+    registrar_acao(db, mesa, current_user.id, "raise", valor_a_contribuir)
     jogador.rodada_ja_agiu = True
-    db.commit()
 
-    jogadores = get_jogadores_da_mesa(mesa_id, db)
     controlador = ControladorDePartida(mesa, jogadores, db)
     controlador.verificar_proxima_etapa()
     controlador.avancar_vez()
 
-    return {"msg": f"Raise para R${valor_total:.2f}"}
+    return {"msg": f"Raise para {formatar_reais(valor_total)}"}
 
 
-@router.post("/{mesa_id}/allin")
-def allin(mesa_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    mesa = get_mesa(db, mesa_id)
-    jogador = get_jogador(db, mesa_id, current_user.id)
+@router.post("/{mesa_id}/allin", response_model=MensagemOut)
+@rastreado("acao_allin", mesa=_mesa_da_rota)
+def allin(mesa_id: int, db: Session = Depends(get_db), current_user: UsuarioAutenticado = Depends(get_current_user)):
+    mesa, jogadores, jogador = carregar_mesa(db, mesa_id, current_user.id)
     verificar_vez(jogador, mesa)
 
     if jogador.stack <= 0:
@@ -127,29 +133,27 @@ def allin(mesa_id: int, db: Session = Depends(get_db), current_user: User = Depe
         side_pot = SidePot(mesa_id=mesa.id, jogador_id=jogador.id, valor=side_pot_valor)
         db.add(side_pot)
 
+    registrar_acao(db, mesa, current_user.id, "allin", valor_allin)
     jogador.rodada_ja_agiu = True
-    db.commit()
 
-    jogadores = get_jogadores_da_mesa(mesa_id, db)
     controlador = ControladorDePartida(mesa, jogadores, db)
     controlador.verificar_proxima_etapa()
     controlador.avancar_vez()
 
-    return {"msg": f"All-in com R${valor_allin:.2f}"}
+    return {"msg": f"All-in com {formatar_reais(valor_allin)}"}
 
 
-@router.post("/{mesa_id}/fold")
-def fold(mesa_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    mesa = get_mesa(db, mesa_id)
-    jogador = get_jogador(db, mesa_id, current_user.id)
+@router.post("/{mesa_id}/fold", response_model=MensagemOut)
+@rastreado("acao_fold", mesa=_mesa_da_rota)
+def fold(mesa_id: int, db: Session = Depends(get_db), current_user: UsuarioAutenticado = Depends(get_current_user)):
+    mesa, jogadores, jogador = carregar_mesa(db, mesa_id, current_user.id)
     verificar_vez(jogador, mesa)
 
     jogador.foldado = True
 
+    registrar_acao(db, mesa, current_user.id, "fold", 0)
     jogador.rodada_ja_agiu = True
-    db.commit()
 
-    jogadores = get_jogadores_da_mesa(mesa_id, db)
     controlador = ControladorDePartida(mesa, jogadores, db)
     controlador.verificar_proxima_etapa()
     controlador.avancar_vez()
@@ -0,0 +1,239 @@
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import groupby
+from sqlalchemy.orm import Session
+from db.database import BASE_DIR
+from db.models import Mao, AcaoMao
+
+# Arquivo frio do histórico de mãos: mãos finalizadas saem do SQLite pra
+# arquivos Parquet (colunares, zstd) particionados por data, no formato hive:
+#   data/arquivo/maos/data=2025-04-20/parte-<primeiro_id>-<ultimo_id>.parquet
+#   data/arquivo/acoes/data=2025-04-20/parte-<primeiro_id>-<ultimo_id>.parquet
+# Depois de arquivadas e passada a retenção, as linhas são apagadas do banco.
+# A tarefa roda em todos os workers, mas só um arquiva por vez (trava em arquivo):
+# dois lendo o mesmo lote escreveriam as mesmas mãos em partes diferentes.
+#python -m game.arquivo_maos --mesa 2 --de 2025-04-01
+
+ARQUIVO_DIR = os.path.join(BASE_DIR, "data", "arquivo")
+RETENCAO_DIAS = int(os.getenv("PANO_RETENCAO_MAOS_DIAS", "30"))
+LOTE_ARQUIVAMENTO = 5000
+ARQUIVAMENTO_INTERVALO_SEGUNDOS = 300
+
+
+def _schemas():
+    import pyarrow as pa
+
+    maos = pa.schema([
+        ("id", pa.int64()),
+        ("mesa_id", pa.int64()),
+        ("numero", pa.int64()),
+        ("iniciada_em", pa.timestamp("ms")),
+        ("finalizada_em", pa.timestamp("ms")),
+        ("pote", pa.int64()),
+        ("vencedores", pa.list_(pa.int64())),
+        ("cartas_comunitarias", pa.list_(pa.string())),
+        ("jogadores", pa.string()),  # JSON
+        ("ganhos", pa.string()),  # JSON
+        ("stacks_finais", pa.string()),  # JSON
+    ])
+    acoes = pa.schema([
+        ("id", pa.int64()),
+        ("mao_id", pa.int64()),
+        ("mesa_id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("acao", pa.string()),
+        ("valor", pa.int64()),
+        ("rodada", pa.string()),
+        ("created_at", pa.timestamp("ms")),
+    ])
+    return maos, acoes
+
+
+def _escrever_particao(tabela, nome: str, data: str, primeiro_id: int, ultimo_id: int):
+    import pyarrow.parquet as pq
+
+    pasta = os.path.join(ARQUIVO_DIR, nome, f"data={data}")
+    os.makedirs(pasta, exist_ok=True)
+    destino = os.path.join(pasta, f"parte-{primeiro_id}-{ultimo_id}.parquet")
+    temporario = destino + ".tmp"
+    pq.write_table(tabela, temporario, compression="zstd")
+    # Troca atômica: leitores nunca veem arquivo pela metade
+    os.replace(temporario, destino)
+
+
+def arquivar_maos(db: Session, lote: int = LOTE_ARQUIVAMENTO) -> int:
+    """Escreve um lote de mãos finalizadas ainda não arquivadas. Retorna quantas foram."""
+    import pyarrow as pa
+
+    maos = (
+        db.query(Mao)
+        .filter(Mao.arquivada.is_(False), Mao.finalizada_em.isnot(None))
+        .order_by(Mao.id)
+        .limit(lote)
+        .all()
+    )
+    if not maos:
+        return 0
+
+    acoes = (
+        db.query(AcaoMao)
+        .filter(AcaoMao.mao_id.in_([m.id for m in maos]))
+        # Por mão primeiro: mesas simultâneas intercalam ações e o groupby só junta vizinhas
+        .order_by(AcaoMao.mao_id, AcaoMao.id)
+        .all()
+    )
+    acoes_por_mao = {
+        mao_id: list(grupo) for mao_id, grupo in groupby(acoes, key=lambda a: a.mao_id)
+    }
+
+    schema_maos, schema_acoes = _schemas()
+    por_data = lambda m: m.finalizada_em.date().isoformat()
+
+    for data, grupo in groupby(sorted(maos, key=lambda m: (por_data(m), m.id)), key=por_data):
+        grupo = list(grupo)
+        tabela_maos = pa.table({
+            "id": [m.id for m in grupo],
+            "mesa_id": [m.mesa_id for m in grupo],
+            "numero": [m.numero for m in grupo],
+            "iniciada_em": [m.iniciada_em for m in grupo],
+            "finalizada_em": [m.finalizada_em for m in grupo],
+            "pote": [m.pote for m in grupo],
+            "vencedores": [m.vencedores or [] for m in grupo],
+            "cartas_comunitarias": [m.cartas_comunitarias or [] for m in grupo],
+            "jogadores": [json.dumps(m.jogadores) for m in grupo],
+            "ganhos": [json.dumps(m.ganhos) for m in grupo],
+            "stacks_finais": [json.dumps(m.stacks_finais) for m in grupo],
+        }, schema=schema_maos)
+
+        acoes_do_grupo = [(m, a) for m in grupo for a in acoes_por_mao.get(m.id, [])]
+        tabela_acoes = pa.table({
+            "id": [a.id for _, a in acoes_do_grupo],
+            "mao_id": [a.mao_id for _, a in acoes_do_grupo],
+            "mesa_id": [m.mesa_id for m, _ in acoes_do_grupo],
+            "user_id": [a.user_id for _, a in acoes_do_grupo],
+            "acao": [a.acao for _, a in acoes_do_grupo],
+            "valor": [a.valor for _, a in acoes_do_grupo],
+            "rodada": [a.rodada for _, a in acoes_do_grupo],
+            "created_at": [a.created_at for _, a in acoes_do_grupo],
+        }, schema=schema_acoes)
+
+        primeiro_id, ultimo_id = grupo[0].id, grupo[-1].id
+        _escrever_particao(tabela_maos, "maos", data, primeiro_id, ultimo_id)
+        _escrever_particao(tabela_acoes, "acoes", data, primeiro_id, ultimo_id)
+
+    db.query(Mao).filter(Mao.id.in_([m.id for m in maos])).update(
+        {Mao.arquivada: True}, synchronize_session=False
+    )
+    db.commit()
+    return len(maos)
+
+
+def podar_maos(db: Session, retencao_dias: int = RETENCAO_DIAS) -> int:
+    """Apaga do banco as mãos já arquivadas que passaram da retenção."""
+    limite = datetime.utcnow() - timedelta(days=retencao_dias)
+    antigas = (
+        db.query(Mao.id)
+        .filter(Mao.arquivada.is_(True), Mao.finalizada_em < limite)
+        .subquery()
+    )
+    db.query(AcaoMao).filter(AcaoMao.mao_id.in_(antigas.select())).delete(synchronize_session=False)
+    apagadas = (
+        db.query(Mao)
+        .filter(Mao.arquivada.is_(True), Mao.finalizada_em < limite)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return apagadas
+
+
+@contextmanager
+def _trava_de_arquivamento():
+    """Entrega True se conseguiu a trava; False se outro processo já está arquivando."""
+    os.makedirs(ARQUIVO_DIR, exist_ok=True)
+    with open(os.path.join(ARQUIVO_DIR, ".trava"), "w") as trava:
+        try:
+            fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(trava, fcntl.LOCK_UN)
+
+
+def arquivar_e_podar(db: Session):
+    with _trava_de_arquivamento() as travou:
+        if not travou:
+            return  # outro worker está no meio; este tenta no próximo ciclo
+        # Esvazia o backlog em lotes antes de podar
+        while arquivar_maos(db) == LOTE_ARQUIVAMENTO:
+            pass
+        apagadas = podar_maos(db)
+    if apagadas:
+        print(f"🗄️ {apagadas} mãos antigas removidas do banco (já arquivadas).")
+
+
+def ler_arquivo(nome: str = "maos", de: str | None = None, ate: str | None = None, filtro=None, colunas=None):
+    """
+    Lê o arquivo com o leitor vetorizado do pyarrow, descartando partições
+    fora de [de, ate] sem abrir os arquivos. `filtro` é uma expressão
+    pyarrow.dataset (ex: ds.field("mesa_id") == 2). Retorna uma pyarrow.Table.
+    """
+    import pyarrow.dataset as ds
+
+    pasta = os.path.join(ARQUIVO_DIR, nome)
+    if not os.path.isdir(pasta):
+        return None
+
+    dataset = ds.dataset(pasta, format="parquet", partitioning="hive")
+    expressao = filtro
+    if de:
+        expressao = (ds.field("data") >= de) if expressao is None else expressao & (ds.field("data") >= de)
+    if ate:
+        expressao = (ds.field("data") <= ate) if expressao is None else expressao & (ds.field("data") <= ate)
+    return dataset.to_table(columns=colunas, filter=expressao)
+
+
+def ler_arquivo_em_lotes(nome: str = "maos", colunas=None, tamanho_lote: int = 65_536):
+    """
+    Como ler_arquivo, mas sem montar a tabela inteira: gera RecordBatches em ordem
+    (arquivo por arquivo, linhas na ordem em que foram escritas).
+    """
+    import pyarrow.dataset as ds
+
+    pasta = os.path.join(ARQUIVO_DIR, nome)
+    if not os.path.isdir(pasta):
+        return
+    dataset = ds.dataset(pasta, format="parquet", partitioning="hive")
+    yield from dataset.to_batches(columns=colunas, batch_size=tamanho_lote)
+
+
+if __name__ == "__main__":
+    import argparse
+    import pyarrow.dataset as ds
+
+    parser = argparse.ArgumentParser(description="Consulta o arquivo de mãos")
+    parser.add_argument("--tabela", default="maos", choices=["maos", "acoes"])
+    parser.add_argument("--mesa", type=int)
+    parser.add_argument("--usuario", type=int, help="só vale pra --tabela acoes")
+    parser.add_argument("--de")
+    parser.add_argument("--ate")
+    args = parser.parse_args()
+
+    filtro = None
+    if args.mesa:
+        filtro = ds.field("mesa_id") == args.mesa
+    if args.usuario:
+        por_usuario = ds.field("user_id") == args.usuario
+        filtro = por_usuario if filtro is None else filtro & por_usuario
+
+    tabela = ler_arquivo(args.tabela, args.de, args.ate, filtro)
+    if tabela is None:
+        print("Arquivo vazio.")
+    else:
+        print(f"{tabela.num_rows} linhas")
+        print(tabela.slice(0, 20).to_pylist())
@@ -0,0 +1,180 @@
+import heapq
+import threading
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from db.models import Mesa, JogadorNaMesa, MesaStatus
+from game.config_mesas import ConfigMesa, obter_config, config_da_mesa
+
+# Índice em memória dos assentos livres, por faixa de stake (big blind em centavos).
+# Cada faixa é um heap de (-ocupação, mesa_id): o topo é a mesa mais cheia que
+# ainda tem vaga, pra fechar mesas e começar partidas antes de espalhar gente.
+# Mudanças de ocupação empurram uma entrada nova e as velhas são descartadas
+# quando chegam ao topo, então reservar e liberar custam O(log n).
+#
+# O banco continua sendo a verdade: entrar_na_mesa confere lotação de novo. O
+# índice é por worker e é recarregado do banco periodicamente pra corrigir desvios.
+
+ASSENTOS_INTERVALO_SEGUNDOS = 30
+
+
+def contar_jogadores_por_mesa(db: Session) -> dict[int, int]:
+    # Uma consulta agrupada em vez de um COUNT por mesa
+    return dict(
+        db.query(JogadorNaMesa.mesa_id, func.count(JogadorNaMesa.id))
+        .group_by(JogadorNaMesa.mesa_id)
+        .all()
+    )
+
+
+class IndiceDeAssentos:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._abrindo_mesa = threading.Lock()
+        self._heaps: dict[int, list] = {}
+        self._ocupacao: dict[int, int] = {}
+        self._limite: dict[int, int] = {}
+        self._faixa: dict[int, int] = {}
+
+    def carregar(self, configs: list[ConfigMesa], ocupacao: dict[int, int]):
+        with self._lock:
+            self._heaps = {}
+            self._ocupacao = {}
+            self._limite = {}
+            self._faixa = {}
+            for config in configs:
+                self._registrar(config, ocupacao.get(config.id, 0))
+
+    def _registrar(self, config: ConfigMesa, ocupacao: int):
+        self._ocupacao[config.id] = ocupacao
+        self._limite[config.id] = config.limite_jogadores
+        self._faixa[config.id] = config.big_blind
+        self._heaps.setdefault(config.big_blind, [])
+        self._empurrar(config.id)
+
+    def _empurrar(self, mesa_id: int):
+        if self._ocupacao[mesa_id] < self._limite[mesa_id]:
+            heap = self._heaps[self._faixa[mesa_id]]
+            heapq.heappush(heap, (-self._ocupacao[mesa_id], mesa_id))
+            # Muita entrada velha acumulada: refaz o heap só com as atuais
+            if len(heap) > 4 * len(self._limite) + 64:
+                self._refazer(self._faixa[mesa_id])
+
+    def _refazer(self, faixa: int):
+        heap = [
+            (-ocupacao, mesa_id)
+            for mesa_id, ocupacao in self._ocupacao.items()
+            if self._faixa[mesa_id] == faixa and ocupacao < self._limite[mesa_id]
+        ]
+        heapq.heapify(heap)
+        self._heaps[faixa] = heap
+
+    def adicionar_mesa(self, config: ConfigMesa, ocupacao: int = 0):
+        with self._lock:
+            self._registrar(config, ocupacao)
+
+    def reservar(self, big_blind: int) -> int | None:
+        """Reserva um assento na mesa mais cheia com vaga da faixa. None se a faixa estiver lotada."""
+        with self._lock:
+            heap = self._heaps.get(big_blind)
+            while heap:
+                negativo, mesa_id = heapq.heappop(heap)
+                ocupacao = self._ocupacao.get(mesa_id)
+                if ocupacao is None or -negativo != ocupacao or self._faixa[mesa_id] != big_blind:
+                    continue  # entrada velha
+                if ocupacao >= self._limite[mesa_id]:
+                    continue
+                self._ocupacao[mesa_id] = ocupacao + 1
+                self._empurrar(mesa_id)
+                return mesa_id
+            return None
+
+    def ocupar(self, mesa_id: int):
+        with self._lock:
+            if mesa_id in self._ocupacao:
+                self._ocupacao[mesa_id] += 1
+                self._empurrar(mesa_id)
+
+    def liberar(self, mesa_id: int):
+        with self._lock:
+            if mesa_id in self._ocupacao:
+                self._ocupacao[mesa_id] = max(0, self._ocupacao[mesa_id] - 1)
+                self._empurrar(mesa_id)
+
+    def marcar_cheia(self, mesa_id: int):
+        """O banco disse que a mesa lotou (outro worker sentou gente): sai do heap até a próxima recarga."""
+        with self._lock:
+            if mesa_id in self._ocupacao:
+                self._ocupacao[mesa_id] = self._limite[mesa_id]
+
+    def faixas(self) -> dict[int, dict]:
+        with self._lock:
+            resumo: dict[int, dict] = {}
+            for mesa_id, faixa in self._faixa.items():
+                r = resumo.setdefault(faixa, {"mesas": 0, "assentos_livres": 0})
+                r["mesas"] += 1
+                r["assentos_livres"] += self._limite[mesa_id] - self._ocupacao[mesa_id]
+            return resumo
+
+    def tem_faixa(self, big_blind: int) -> bool:
+        return big_blind in self._heaps
+
+
+indice_assentos = IndiceDeAssentos()
+
+
+def carregar_indice_assentos(db: Session):
+    # Direto do banco, não do cache de configs: mesas abertas por outro worker entram na recarga
+    mesas = (
+        db.query(Mesa)
+        .filter(Mesa.status != MesaStatus.encerrada, Mesa.torneio_id.is_(None))
+        .order_by(Mesa.id)
+        .all()
+    )
+    indice_assentos.carregar([config_da_mesa(mesa) for mesa in mesas], contar_jogadores_por_mesa(db))
+
+
+def _mesas_de_cash_da_faixa(db: Session, big_blind: int):
+    return db.query(Mesa).filter(Mesa.big_blind == big_blind, Mesa.torneio_id.is_(None))
+
+
+def abrir_mesa_da_faixa(db: Session, big_blind: int) -> ConfigMesa | None:
+    """Cria uma mesa nova copiando a mesa de menor id da faixa (o modelo)."""
+    modelo = _mesas_de_cash_da_faixa(db, big_blind).order_by(Mesa.id).first()
+    if modelo is None:
+        return None
+
+    mesa = Mesa(
+        nome=modelo.nome,
+        status=MesaStatus.aberta,
+        limite_jogadores=modelo.limite_jogadores,
+        tipo_jogo=modelo.tipo_jogo,
+        valor_minimo=modelo.valor_minimo,
+        valor_minimo_aposta=modelo.valor_minimo_aposta,
+        small_blind=modelo.small_blind,
+        big_blind=modelo.big_blind,
+    )
+    db.add(mesa)
+    db.flush()
+    # Número pela posição do id na faixa, contado com a trava de escrita do flush:
+    # dois workers abrindo mesa ao mesmo tempo não repetem o nome
+    numero = _mesas_de_cash_da_faixa(db, big_blind).filter(Mesa.id <= mesa.id).count()
+    mesa.nome = f"{modelo.nome} {numero}"
+    db.commit()
+
+    config = obter_config(db, mesa.id)
+    indice_assentos.adicionar_mesa(config)
+    print(f"🆕 Mesa {mesa.nome} aberta para a faixa {big_blind}.")
+    return config
+
+
+def reservar_ou_abrir(db: Session, big_blind: int) -> int | None:
+    mesa_id = indice_assentos.reservar(big_blind)
+    if mesa_id is not None:
+        return mesa_id
+
+    # Faixa lotada: um request abre a mesa nova, os concorrentes esperam e reservam nela
+    with indice_assentos._abrindo_mesa:
+        mesa_id = indice_assentos.reservar(big_blind)
+        if mesa_id is None and abrir_mesa_da_faixa(db, big_blind):
+            mesa_id = indice_assentos.reservar(big_blind)
+    return mesa_id
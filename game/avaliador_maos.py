@@ -20,7 +20,7 @@ RANKING = {
 }
 
 def valor_para_num(carta):
-    return VALORES.index(carta[0])
+    return VALORES.index(carta[:-1])  # "10♣" tem três caracteres: o naipe é sempre o último
 
 def ordenar_mao(mao):
     return sorted(mao, key=lambda c: valor_para_num(c), reverse=True)
@@ -47,7 +47,7 @@ def avaliar_mao(mao):
             continue  # ignora carta inválida
         valores.append(VALORES.index(valor))
         
-    naipes = [c[1] for c in mao]
+    naipes = [c[-1] for c in mao]
     valor_count = Counter(valores)
     naipe_count = Counter(naipes)
 
@@ -55,7 +55,7 @@ def avaliar_mao(mao):
     flush = None
     for naipe, count in naipe_count.items():
         if count >= 5:
-            flush = [c for c in mao if c[1] == naipe]
+            flush = [c for c in mao if c[-1] == naipe]
             break
 
     # Straight
@@ -63,9 +63,9 @@ def avaliar_mao(mao):
 
     # Straight Flush / Royal Flush
     if flush:
-        flush_vals = [VALORES.index(c[0]) for c in flush]
+        flush_vals = [valor_para_num(c) for c in flush]
         if is_sequencia(flush_vals):
-            if max(flush_vals) == 12:
+            if set(range(8, 13)).issubset(flush_vals):  # 10 a A do mesmo naipe, não só um A no flush
                 return (RANKING["royal_flush"], ordenar_mao(flush)[:5])
             else:
                 return (RANKING["straight_flush"], ordenar_mao(flush)[:5])
@@ -87,7 +87,7 @@ def avaliar_mao(mao):
 
     # Flush
     if flush:
-        return (RANKING["flush"], [VALORES.index(c[0]) for c in ordenar_mao(flush)[:5]])
+        return (RANKING["flush"], [valor_para_num(c) for c in ordenar_mao(flush)[:5]])
 
     # Straight
     if straight:
@@ -111,3 +111,86 @@ def avaliar_mao(mao):
 
     # Carta alta
     return (RANKING["high_card"], sorted(valores, reverse=True)[:5])
+
+
+# Avaliação rápida só da categoria (sem desempate), pra dicas e análises que
+# avaliam a mesma mão com dezenas de cartas diferentes. Trabalha com a melhor
+# mão dentro de 2 a 7 cartas de uma vez, sem passar pelas combinações de 5.
+# Valor e naipe vêm de uma tabela pronta ("10♣" tem três caracteres).
+CARTAS = {f"{v}{n}": (i, NAIPES.index(n)) for i, v in enumerate(VALORES) for n in NAIPES}
+CATEGORIAS = {valor: nome for nome, valor in RANKING.items()}
+_SEQUENCIAS = [0b11111 << i for i in range(8, -1, -1)] + [(1 << 12) | 0b1111]  # A-2-3-4-5 por último
+_ROYAL = 0b11111 << 8
+
+
+def _tem_sequencia(bits: int) -> bool:
+    for sequencia in _SEQUENCIAS:
+        if bits & sequencia == sequencia:
+            return True
+    return False
+
+
+def _contar(cartas) -> tuple[list[int], list[int], int]:
+    contagem = [0] * 13
+    por_naipe = [0, 0, 0, 0]
+    bits = 0
+    for carta in cartas:
+        valor, naipe = CARTAS[carta]
+        contagem[valor] += 1
+        por_naipe[naipe] |= 1 << valor
+        bits |= 1 << valor
+    return contagem, por_naipe, bits
+
+
+def _categoria(contagem: list[int], por_naipe: list[int], bits: int) -> int:
+    flush = False
+    for mascara in por_naipe:
+        if mascara.bit_count() >= 5:
+            if mascara & _ROYAL == _ROYAL:
+                return RANKING["royal_flush"]
+            if _tem_sequencia(mascara):
+                return RANKING["straight_flush"]
+            flush = True
+
+    maior = segundo = 0
+    for n in contagem:
+        if n > maior:
+            maior, segundo = n, maior
+        elif n > segundo:
+            segundo = n
+
+    if maior == 4:
+        return RANKING["four_of_a_kind"]
+    if maior == 3 and segundo >= 2:
+        return RANKING["full_house"]
+    if flush:
+        return RANKING["flush"]
+    if _tem_sequencia(bits):
+        return RANKING["straight"]
+    if maior == 3:
+        return RANKING["three_of_a_kind"]
+    if maior == 2 and segundo == 2:
+        return RANKING["two_pair"]
+    if maior == 2:
+        return RANKING["one_pair"]
+    return RANKING["high_card"]
+
+
+def categoria_da_mao(cartas) -> int:
+    """Categoria (valor de RANKING) da melhor mão de 5 dentro das cartas dadas."""
+    return _categoria(*_contar(cartas))
+
+
+def categorias_com_cada_carta(cartas, candidatas) -> dict[str, int]:
+    """Categoria de `cartas` + cada candidata, contando as cartas fixas uma vez só."""
+    contagem, por_naipe, bits = _contar(cartas)
+    resultado = {}
+    for carta in candidatas:
+        valor, naipe = CARTAS[carta]
+        naipe_antes = por_naipe[naipe]
+        contagem[valor] += 1
+        por_naipe[naipe] = naipe_antes | (1 << valor)
+        resultado[carta] = _categoria(contagem, por_naipe, bits | (1 << valor))
+        contagem[valor] -= 1
+        por_naipe[naipe] = naipe_antes
+    return resultado
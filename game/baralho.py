@@ -1,4 +1,5 @@
 import random
+import secrets
 
 # Definindo os naipes e valores
 naipes = ['♠', '♥', '♦', '♣']
@@ -9,11 +10,21 @@ def criar_baralho():
     baralho = [f"{valor}{naipe}" for naipe in naipes for valor in valores]
     return baralho
 
-# Embaralhar o baralho
-def embaralhar(baralho):
-    random.shuffle(baralho)
+# Embaralhar o baralho. Com semente a ordem é reproduzível: a semente da mão fica
+# gravada em maos.semente e o baralho inteiro pode ser refeito a partir dela
+def embaralhar(baralho, semente: int | None = None):
+    if semente is None:
+        random.shuffle(baralho)
+    else:
+        random.Random(semente).shuffle(baralho)
     return baralho
 
+def nova_semente() -> int:
+    return secrets.randbits(63)  # cabe num INTEGER do SQLite
+
+def baralho_da_semente(semente: int):
+    return embaralhar(criar_baralho(), semente)
+
 # Distribuir 2 cartas para cada jogador
 def distribuir_cartas(jogadores_ids, baralho):
     mao_jogadores = {}
@@ -0,0 +1,81 @@
+import threading
+from dataclasses import dataclass
+from sqlalchemy.orm import Session
+from db.models import Mesa
+
+# Configuração fixa das mesas (blinds, buy-in, limite, tipo de jogo), que não muda
+# durante a vida da mesa. Carregada na inicialização e lida da memória pelos
+# caminhos de jogo. Quem alterar uma mesa no banco chama invalidar_config(), mas
+# isso só limpa o cache do próprio worker: os outros recarregam tudo do banco a
+# cada CONFIG_INTERVALO_SEGUNDOS.
+
+CONFIG_INTERVALO_SEGUNDOS = 30
+
+
+@dataclass(frozen=True)
+class ConfigMesa:
+    id: int
+    nome: str
+    limite_jogadores: int
+    tipo_jogo: str
+    valor_minimo: int  # centavos
+    valor_minimo_aposta: int  # centavos (buy-in)
+    small_blind: int  # centavos
+    big_blind: int  # centavos
+    torneio_id: int | None = None  # mesas de torneio ficam fora do lobby e do quick-seat
+
+
+_configs: dict[int, ConfigMesa] = {}
+_lock = threading.Lock()
+
+
+def config_da_mesa(mesa: Mesa) -> ConfigMesa:
+    return ConfigMesa(
+        id=mesa.id,
+        nome=mesa.nome,
+        limite_jogadores=mesa.limite_jogadores,
+        tipo_jogo=mesa.tipo_jogo,
+        valor_minimo=mesa.valor_minimo,
+        valor_minimo_aposta=mesa.valor_minimo_aposta,
+        small_blind=mesa.small_blind,
+        big_blind=mesa.big_blind,
+        torneio_id=mesa.torneio_id,
+    )
+
+
+def carregar_configs(db: Session):
+    configs = {mesa.id: config_da_mesa(mesa) for mesa in db.query(Mesa).all()}
+    with _lock:
+        mudou = configs != _configs
+        _configs.clear()
+        _configs.update(configs)
+    # A recarga periódica só avisa quando alguma coisa mudou
+    if mudou:
+        print(f"⚙️ Configuração de {len(configs)} mesas carregada.")
+
+
+def obter_config(db: Session, mesa_id: int) -> ConfigMesa | None:
+    """Lê da memória; se a mesa ainda não estiver no cache, busca no banco uma vez."""
+    config = _configs.get(mesa_id)
+    if config is not None:
+        return config
+
+    mesa = db.query(Mesa).filter(Mesa.id == mesa_id).first()
+    if mesa is None:
+        return None
+    config = config_da_mesa(mesa)
+    with _lock:
+        _configs[mesa_id] = config
+    return config
+
+
+def listar_configs() -> list[ConfigMesa]:
+    return sorted(_configs.values(), key=lambda c: c.id)
+
+
+def invalidar_config(mesa_id: int | None = None):
+    with _lock:
+        if mesa_id is None:
+            _configs.clear()
+        else:
+            _configs.pop(mesa_id, None)
@@ -0,0 +1,113 @@
+import json
+import threading
+from collections import OrderedDict
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from db.database import get_db
+from db.models import Mesa, JogadorNaMesa
+from api.auth import get_current_user, UsuarioAutenticado
+from api.schemas import DicaOut
+from api.limites import limitar_leitura
+from game.avaliador_maos import categoria_da_mao, categorias_com_cada_carta, CARTAS, CATEGORIAS
+
+# Dicas ao vivo pro jogador: categoria da mão feita, outs e chance de melhorar
+# na próxima carta. Calculadas de uma vez pra todos os assentos quando a mesa
+# muda de rodada e guardadas por (mesa_id, mão, rodada); a mão é identificada
+# pelas cartas comunitárias sorteadas no início dela. A chave sai sempre da
+# mesa lida do banco, então vale pra qualquer worker.
+#
+# Out é a carta que sobe a categoria do jogador acima do que ela era e acima
+# do que a própria mesa faria com essa carta (par na mesa não conta como out).
+# As cartas dos adversários são desconhecidas, então contam como restantes.
+
+CACHE_DICAS_TAMANHO = 4096
+
+router = APIRouter(prefix="/mesas", tags=["Dicas"])
+
+_cache: OrderedDict[tuple, dict[int, dict]] = OrderedDict()
+_lock = threading.Lock()
+
+
+def cartas_visiveis(mesa: Mesa) -> list[str]:
+    # Mesma regra de /mesas/{id}/cartas_comunitarias
+    rodada = mesa.estado_da_rodada
+    visiveis = list(mesa.flop or []) if rodada in ("flop", "turn", "river") else []
+    if rodada in ("turn", "river") and mesa.mostrar_turn and mesa.turn:
+        visiveis.append(mesa.turn)
+    if rodada == "river" and mesa.mostrar_river and mesa.river:
+        visiveis.append(mesa.river)
+    return visiveis
+
+
+def calcular_dica(cartas: list[str], mesa_visivel: list[str], categorias_da_mesa: dict[str, int] | None) -> dict:
+    """
+    Dica de um jogador. `categorias_da_mesa` é a categoria só da mesa com cada
+    carta restante, compartilhada entre os assentos; None quando não há próxima
+    carta avulsa (pre-flop: vem o flop inteiro; river: acabou).
+    """
+    atual = categoria_da_mao(cartas + mesa_visivel)
+    dica = {
+        "categoria": CATEGORIAS[atual],
+        "outs": [],
+        "cartas_restantes": 0,
+        "probabilidade_melhora": None,
+        "melhora_para": {},
+    }
+    if categorias_da_mesa is None:
+        return dica
+
+    vistas = set(cartas)
+    restantes = [c for c in categorias_da_mesa if c not in vistas]
+    melhora_para: dict[str, int] = {}
+    for carta, nova in categorias_com_cada_carta(cartas + mesa_visivel, restantes).items():
+        if nova > atual and nova > categorias_da_mesa[carta]:
+            dica["outs"].append(carta)
+            melhora_para[CATEGORIAS[nova]] = melhora_para.get(CATEGORIAS[nova], 0) + 1
+
+    dica["cartas_restantes"] = len(restantes)
+    dica["probabilidade_melhora"] = round(len(dica["outs"]) / len(restantes), 4) if restantes else 0.0
+    dica["melhora_para"] = melhora_para
+    return dica
+
+
+def calcular_dicas_da_mesa(mesa: Mesa, jogadores: list[JogadorNaMesa]) -> dict[int, dict]:
+    visivel = cartas_visiveis(mesa)
+    categorias_da_mesa = None
+    if mesa.estado_da_rodada in ("flop", "turn"):
+        restantes = [c for c in CARTAS if c not in visivel]
+        categorias_da_mesa = categorias_com_cada_carta(visivel, restantes)
+
+    dicas = {}
+    for jogador in jogadores:
+        cartas = json.loads(jogador.cartas) if jogador.cartas else []
+        if len(cartas) == 2:
+            dicas[jogador.user_id] = {"rodada": mesa.estado_da_rodada, **calcular_dica(cartas, visivel, categorias_da_mesa)}
+    return dicas
+
+
+def dicas_da_mesa(db: Session, mesa_id: int) -> dict[int, dict]:
+    mesa = db.query(Mesa).filter(Mesa.id == mesa_id).first()
+    if not mesa:
+        raise HTTPException(status_code=404, detail="Mesa não encontrada.")
+    chave = (mesa_id, tuple(mesa.flop or []) + (mesa.turn, mesa.river), mesa.estado_da_rodada)
+
+    with _lock:
+        dicas = _cache.get(chave)
+    if dicas is None:
+        jogadores = db.query(JogadorNaMesa).filter_by(mesa_id=mesa_id).all()
+        dicas = calcular_dicas_da_mesa(mesa, jogadores)
+
+    with _lock:
+        _cache[chave] = dicas
+        _cache.move_to_end(chave)
+        while len(_cache) > CACHE_DICAS_TAMANHO:
+            _cache.popitem(last=False)
+    return dicas
+
+
+@router.get("/{mesa_id}/dicas", response_model=DicaOut, dependencies=[Depends(limitar_leitura)])
+def minhas_dicas(mesa_id: int, db: Session = Depends(get_db), current_user: UsuarioAutenticado = Depends(get_current_user)):
+    dica = dicas_da_mesa(db, mesa_id).get(current_user.id)
+    if dica is None:
+        raise HTTPException(status_code=404, detail="Você não tem cartas nesta mesa.")
+    return dica
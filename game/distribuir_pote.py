@@ -1,11 +1,11 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from game.avaliador_maos import avaliar_mao
 
 
 def criar_side_pots(jogadores: List[Dict]) -> List[Dict]:
     """
-    Recebe jogadores com 'id' e 'aposta' (total que cada um apostou).
-    Retorna uma lista de side pots: [{valor: float, participantes: [ids]}]
+    Recebe jogadores com 'id' e 'aposta' (total que cada um apostou, em centavos).
+    Retorna uma lista de side pots: [{valor: int, participantes: [ids]}]
     """
     apostas = sorted(set(j['aposta'] for j in jogadores if j['aposta'] > 0))
     side_pots = []
@@ -19,22 +19,33 @@ def criar_side_pots(jogadores: List[Dict]) -> List[Dict]:
 
     return side_pots
 
-def distribuir_pote(jogadores: List[Dict], vencedores: List[int]) -> Dict[int, float]:
+def distribuir_pote(
+    jogadores: List[Dict],
+    vencedores: List[int],
+    ordem: Optional[List[int]] = None,
+) -> Dict[int, int]:
     """
-    jogadores -> [{'id': 1, 'aposta': 10}, ...]
+    jogadores -> [{'id': 1, 'aposta': 1000}, ...]  (centavos)
     vencedores -> [1, 3]  (IDs dos vencedores do showdown)
+    ordem -> IDs a partir do primeiro jogador à esquerda do botão.
+             Em divisão não exata, os centavos que sobram (odd chips) vão um a um
+             pros vencedores nessa ordem. Sem ordem, vale a ordem de `vencedores`.
 
-    Retorna um dicionário com os ganhos por jogador: {1: 15.0, 3: 15.0}
+    Retorna um dicionário com os ganhos por jogador em centavos: {1: 1500, 3: 1500}
     """
     ganhos = {j['id']: 0 for j in jogadores}
     side_pots = criar_side_pots(jogadores)
+    posicao = {jogador_id: i for i, jogador_id in enumerate(ordem or vencedores)}
 
     for pot in side_pots:
         # Vencedores que têm direito a esse pote (estão no pote e venceram)
         vencedores_do_pot = [v for v in vencedores if v in pot['participantes']]
         if vencedores_do_pot:
-            valor_por_vencedor = pot['valor'] / len(vencedores_do_pot)
+            valor_por_vencedor, sobra = divmod(pot['valor'], len(vencedores_do_pot))
             for v in vencedores_do_pot:
                 ganhos[v] += valor_por_vencedor
+            vencedores_do_pot.sort(key=lambda v: posicao.get(v, len(posicao)))
+            for v in vencedores_do_pot[:sobra]:
+                ganhos[v] += 1
 
     return ganhos
@@ -0,0 +1,390 @@
+import re
+import threading
+from collections import OrderedDict
+from itertools import combinations, permutations
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException
+from api.auth import get_current_user, UsuarioAutenticado
+from api.schemas import EquidadeInput, EquidadeOut
+from api.limites import limitar_acao
+from game.avaliador_maos import VALORES, NAIPES, CARTAS, CATEGORIAS, RANKING
+
+# Análises pro coaching: equidade de uma faixa de mãos contra outra numa mesa
+# (0, 3, 4 ou 5 cartas) e a distribuição das categorias de RANKING em todos os
+# runouts. São milhões de avaliações por consulta, então tudo roda em lote no
+# NumPy: cartas são inteiros 0..51 (valor * 4 + naipe), a avaliação sai de
+# contagens por valor/naipe e tabelas de 8192 máscaras de valores, e o bloqueio
+# de cartas (combinação que usa carta da mesa, do runout ou da outra mão) é
+# feito com máscaras de bits, sem laço em Python por mão.
+#
+# Faixas na notação de sempre: "QQ+, AKs, AQo, KJ, A2s+, T9s:0.5" (peso depois
+# dos dois pontos). Como faixas assim não distinguem naipes, o resultado só
+# depende da mesa a menos de troca de naipes: o cache é por mesa canônica.
+# Pre-flop (2,6 milhões de runouts) usa uma amostra fixa de runouts.
+#
+# O custo de uma consulta é limitado: cada combinação de B entra uma vez por runout
+# numa lista ordenada por força (com somas acumuladas dos pesos) e cada combinação
+# de A acha vitórias/empates com busca binária, sem montar A x B. Avaliações novas
+# por consulta ficam em LIMITE_AVALIACOES: no pior caso (flop, faixas completas) é
+# a mesa inteira; pre-flop, faixas largas usam menos runouts da amostra.
+
+LIMITE_RUNOUTS = 20_000
+LIMITE_AVALIACOES = 1_600_000
+LOTE_AVALIACAO = 65_536
+# Elementos por bloco na comparação faixa x faixa (limita a memória)
+BLOCO_COMPARACAO = 1_000_000
+CACHE_PONTUACOES_TAMANHO = 8
+CACHE_RESULTADOS_TAMANHO = 256
+
+router = APIRouter(prefix="/analise", tags=["Análise"])
+
+NOMES = [f"{v}{n}" for v in VALORES for n in NAIPES]
+INDICE = {nome: i for i, nome in enumerate(NOMES)}
+COMBOS = np.array(list(combinations(range(52), 2)), dtype=np.int16)  # 1326 mãos iniciais
+MASCARA_COMBO = (np.uint64(1) << COMBOS[:, 0].astype(np.uint64)) | (np.uint64(1) << COMBOS[:, 1].astype(np.uint64))
+_POTENCIAS = (1 << np.arange(13)).astype(np.int32)
+
+
+def _tabelas() -> tuple[np.ndarray, np.ndarray]:
+    """Pra cada máscara de 13 bits: os 5 maiores valores presentes (0 de enchimento) e o topo da sequência (-1 se não há)."""
+    mascaras = np.arange(8192)
+    bits = (mascaras[:, None] >> np.arange(13)) & 1
+    ordem = np.argsort(-(bits * (np.arange(13) + 1)), axis=1, kind="stable")[:, :5]
+    presentes = np.take_along_axis(bits, ordem, axis=1)
+    topo = np.where(presentes == 1, ordem, 0).astype(np.int32)
+
+    sequencia = np.full(8192, -1, dtype=np.int32)
+    roda = (1 << 12) | 0b1111  # A-2-3-4-5, topo no 5
+    sequencia[(mascaras & roda) == roda] = 3
+    for alta in range(4, 13):
+        s = 0b11111 << (alta - 4)
+        sequencia[(mascaras & s) == s] = alta
+    return topo, sequencia
+
+
+TOPO, SEQUENCIA = _tabelas()
+
+
+def _compor(categoria, *valores) -> np.ndarray:
+    pontos = categoria.astype(np.int32) << 20
+    for deslocamento, valor in zip((16, 12, 8, 4, 0), valores):
+        pontos = pontos | (valor.astype(np.int32) << deslocamento)
+    return pontos
+
+
+def _pontuar_lote(cartas: np.ndarray) -> np.ndarray:
+    n = len(cartas)
+    valores = (cartas >> 2).astype(np.int64)
+    naipes = (cartas & 3).astype(np.int64)
+    linhas = np.arange(n)[:, None]
+    contagem = np.bincount((linhas * 13 + valores).ravel(), minlength=n * 13).reshape(n, 13)
+    por_naipe = np.bincount((linhas * 4 + naipes).ravel(), minlength=n * 4).reshape(n, 4)
+
+    bits = (contagem > 0).astype(np.int32) @ _POTENCIAS
+    quadras = (contagem == 4).astype(np.int32) @ _POTENCIAS
+    trincas = (contagem == 3).astype(np.int32) @ _POTENCIAS
+    pares = (contagem == 2).astype(np.int32) @ _POTENCIAS
+    n_pares = (contagem == 2).sum(axis=1)
+
+    tem_flush = por_naipe.max(axis=1) >= 5
+    naipe_flush = por_naipe.argmax(axis=1)
+    # OR e não soma: linhas bloqueadas (carta repetida) ainda precisam de índice válido
+    bits_flush = np.bitwise_or.reduce(np.where(tem_flush[:, None] & (naipes == naipe_flush[:, None]), 1 << valores, 0), axis=1)
+    seq_flush = SEQUENCIA[bits_flush]
+    seq = SEQUENCIA[bits]
+
+    um = lambda mascara: TOPO[mascara][:, 0]  # noqa: E731
+    q = um(quadras)
+    t = um(trincas)
+    resto_full = (trincas & ~(1 << t)) | pares
+    p = TOPO[pares]
+    p1, p2 = p[:, 0], p[:, 1]
+    kick_q = um(bits & ~(1 << q))
+    kick_t = TOPO[bits & ~(1 << t)]
+    kick_2p = um(bits & ~(1 << p1) & ~(1 << p2))
+    kick_1p = TOPO[bits & ~(1 << p1)]
+    flush = TOPO[bits_flush]
+    alta = TOPO[bits]
+
+    condicoes = [
+        seq_flush >= 0,
+        quadras > 0,
+        (trincas > 0) & (resto_full > 0),
+        tem_flush,
+        seq >= 0,
+        trincas > 0,
+        n_pares >= 2,
+        n_pares == 1,
+    ]
+
+    def cat(nome):
+        return np.full(n, RANKING[nome], dtype=np.int32)
+
+    escolhas = [
+        _compor(np.where(seq_flush == 12, RANKING["royal_flush"], RANKING["straight_flush"]), seq_flush),
+        _compor(cat("four_of_a_kind"), q, kick_q),
+        _compor(cat("full_house"), t, um(resto_full)),
+        _compor(cat("flush"), *flush.T),
+        _compor(cat("straight"), seq),
+        _compor(cat("three_of_a_kind"), t, kick_t[:, 0], kick_t[:, 1]),
+        _compor(cat("two_pair"), p1, p2, kick_2p),
+        _compor(cat("one_pair"), p1, kick_1p[:, 0], kick_1p[:, 1], kick_1p[:, 2]),
+    ]
+    return np.select(condicoes, escolhas, default=_compor(cat("high_card"), *alta.T))
+
+
+def pontuar(cartas: np.ndarray) -> np.ndarray:
+    """
+    Força de cada linha de `cartas` (N x k, k até 7, índices 0..51) como inteiro
+    comparável: categoria de RANKING nos bits altos, desempates embaixo.
+    """
+    if len(cartas) <= LOTE_AVALIACAO:
+        return _pontuar_lote(cartas)
+    return np.concatenate([_pontuar_lote(cartas[i:i + LOTE_AVALIACAO]) for i in range(0, len(cartas), LOTE_AVALIACAO)])
+
+
+_TOKEN_FAIXA = re.compile(r"^([2-9TJQKA])([2-9TJQKA])([SO]?)(\+?)(?::([0-9]*\.?[0-9]+))?$")
+_VALOR_FAIXA = {v: i for i, v in enumerate("23456789TJQKA")}
+
+
+def pesos_da_faixa(faixa: str) -> np.ndarray:
+    """Peso (0..1) de cada uma das 1326 combinações. Levanta ValueError em notação inválida."""
+    pesos = np.zeros(len(COMBOS))
+    v1, v2 = COMBOS[:, 0] >> 2, COMBOS[:, 1] >> 2
+    alto, baixo = np.maximum(v1, v2), np.minimum(v1, v2)
+    mesmo_naipe = (COMBOS[:, 0] & 3) == (COMBOS[:, 1] & 3)
+
+    for token in (t.strip().upper().replace("10", "T") for t in faixa.split(",")):
+        if not token:
+            continue
+        m = _TOKEN_FAIXA.match(token)
+        if m is None:
+            raise ValueError(f"Mão inválida na faixa: {token}")
+        a, b = sorted((_VALOR_FAIXA[m.group(1)], _VALOR_FAIXA[m.group(2)]), reverse=True)
+        tipo, mais, peso = m.group(3), m.group(4), float(m.group(5) or 1)
+        if a == b:
+            if tipo:
+                raise ValueError(f"Par não tem 's' nem 'o': {token}")
+            selecao = (alto == baixo) & ((alto >= a) if mais else (alto == a))
+        else:
+            baixos = (baixo >= b) & (baixo < a) if mais else (baixo == b)
+            selecao = (alto == a) & baixos
+            if tipo == "S":
+                selecao &= mesmo_naipe
+            elif tipo == "O":
+                selecao &= ~mesmo_naipe
+        pesos[selecao] = min(max(peso, 0.0), 1.0)
+    return pesos
+
+
+def mesa_canonica(cartas: list[str]) -> tuple[int, ...]:
+    """A menor das 24 trocas de naipe da mesa, com as cartas ordenadas."""
+    indices = [INDICE[c] for c in cartas]
+    return min(
+        tuple(sorted(((i >> 2) << 2 | troca[i & 3] for i in indices), reverse=True))
+        for troca in permutations(range(4))
+    )
+
+
+def _runouts(mesa: tuple[int, ...]) -> tuple[np.ndarray, bool]:
+    """Mesas completas (R x 5) a partir da mesa dada e se são todos os runouts ou uma amostra."""
+    restantes = np.array([c for c in range(52) if c not in mesa], dtype=np.int16)
+    faltam = 5 - len(mesa)
+    total = 1
+    for i in range(faltam):
+        total = total * (len(restantes) - i) // (i + 1)
+
+    if total <= LIMITE_RUNOUTS:
+        complementos = np.array(list(combinations(restantes, faltam)), dtype=np.int16).reshape(total, faltam)
+        exato = True
+    else:
+        # Amostra fixa: a mesma consulta dá sempre o mesmo resultado (e o cache continua valendo)
+        sorteio = np.random.default_rng(0).random((LIMITE_RUNOUTS, len(restantes))).argsort(axis=1)[:, :faltam]
+        complementos = restantes[sorteio]
+        exato = False
+    base = np.broadcast_to(np.array(mesa, dtype=np.int16), (len(complementos), len(mesa)))
+    return np.concatenate([base, complementos], axis=1), exato
+
+
+def _mascara_das_mesas(mesas: np.ndarray) -> np.ndarray:
+    mascara = np.zeros(len(mesas), dtype=np.uint64)
+    for coluna in mesas.T:
+        mascara |= np.uint64(1) << coluna.astype(np.uint64)
+    return mascara
+
+
+_pontuacoes: OrderedDict[tuple, tuple[np.ndarray, np.ndarray, bool]] = OrderedDict()
+_resultados: OrderedDict[tuple, dict] = OrderedDict()
+_lock = threading.Lock()
+
+
+def _guardar(cache: OrderedDict, chave, valor, tamanho: int):
+    with _lock:
+        cache[chave] = valor
+        cache.move_to_end(chave)
+        while len(cache) > tamanho:
+            cache.popitem(last=False)
+
+
+def _avaliar_combos(completas: np.ndarray, combos: np.ndarray) -> np.ndarray:
+    n = len(combos)
+    cartas_combos = COMBOS[combos]
+    pontos = np.empty((len(completas), n), dtype=np.int32)
+    bloco = max(1, LOTE_AVALIACAO // max(1, n))
+    for i in range(0, len(completas), bloco):
+        parte = completas[i:i + bloco]
+        cartas = np.concatenate([
+            np.broadcast_to(parte[:, None, :], (len(parte), n, 5)),
+            np.broadcast_to(cartas_combos[None, :, :], (len(parte), n, 2)),
+        ], axis=2).reshape(len(parte) * n, 7)
+        pontos[i:i + bloco] = _pontuar_lote(cartas).reshape(len(parte), n)
+    pontos[(_mascara_das_mesas(completas)[:, None] & MASCARA_COMBO[combos][None, :]) != 0] = -1
+    return pontos
+
+
+def pontuacoes_da_mesa(mesa: tuple[int, ...], combos: np.ndarray) -> tuple[np.ndarray, np.ndarray, bool]:
+    """
+    (mesas completas R x 5, pontos R x len(combos) com -1 onde a combinação
+    usa carta da mesa, se os runouts são exatos). Com todos os runouts, os
+    pontos ficam em cache pela mesa canônica, coluna por coluna (-2 = ainda não
+    avaliada): consultas seguintes na mesma mesa só avaliam combinações novas.
+    """
+    with _lock:
+        item = _pontuacoes.get(mesa)
+    if item is None:
+        completas, exato = _runouts(mesa)
+        pontos = np.full((len(completas), len(COMBOS)), -2, dtype=np.int32) if exato else None
+        item = (completas, pontos, exato)
+        _guardar(_pontuacoes, mesa, item, CACHE_PONTUACOES_TAMANHO)
+
+    completas, pontos, exato = item
+    if not exato:
+        # Amostra: as primeiras linhas da amostra fixa, quantas couberem no limite de avaliações
+        completas = completas[:max(1, LIMITE_AVALIACOES // max(1, len(combos)))]
+        return completas, _avaliar_combos(completas, combos), exato
+
+    faltando = combos[pontos[0, combos] == -2]
+    if len(faltando):
+        # Duas consultas ao mesmo tempo podem avaliar a mesma coluna: o resultado é o mesmo
+        pontos[:, faltando] = _avaliar_combos(completas, faltando)
+    return completas, pontos[:, combos], exato
+
+
+def _distribuicao(pontos: np.ndarray, pesos: np.ndarray) -> dict[str, float]:
+    validas = pontos >= 0
+    categorias = pontos[validas] >> 20
+    contagem = np.bincount(categorias, weights=np.broadcast_to(pesos, pontos.shape)[validas], minlength=11)
+    total = contagem.sum()
+    return {CATEGORIAS[c]: round(float(contagem[c] / total), 6) for c in range(1, 11) if contagem[c] > 0} if total else {}
+
+
+def textura_da_mesa(completas: np.ndarray) -> dict:
+    """Como a mesa sozinha termina nos runouts: categorias, flush possível (3+ do naipe) e mesa pareada."""
+    pontos = pontuar(completas)
+    naipes = completas & 3
+    flush_possivel = (np.stack([(naipes == n).sum(axis=1) for n in range(4)], axis=1).max(axis=1) >= 3).mean()
+    valores = np.sort(completas >> 2, axis=1)
+    pareada = (valores[:, 1:] == valores[:, :-1]).any(axis=1).mean()
+    return {
+        "categorias": _distribuicao(pontos[:, None], np.ones(1)),
+        "flush_possivel": round(float(flush_possivel), 6),
+        "pareada": round(float(pareada), 6),
+    }
+
+
+_BITS_COMBO = 11  # índice da combinação (< 2048) nos bits baixos da chave
+_BITS_PONTOS = 24  # pontos de pontuar() < 11 << 20
+_TODAS = 52  # grupo com todas as combinações, além de um grupo por carta
+
+
+def _comparar(pontos_a: np.ndarray, pontos_b: np.ndarray, ia: np.ndarray, ib: np.ndarray,
+              pesos_a: np.ndarray, pesos_b: np.ndarray) -> tuple[float, float, float]:
+    """
+    Peso total de vitórias, empates e confrontos de A contra B somando todos os runouts.
+
+    Por runout, cada combinação válida de B entra em três grupos (as suas duas cartas
+    e o de todas), ordenada pelos pontos, com a soma acumulada dos pesos. Pra uma
+    combinação de A, o que vence/empata/existe em B é o grupo de todas menos os
+    grupos das suas duas cartas (quem divide carta não é confronto possível); a mesma
+    combinação em B sai nos dois grupos e volta uma vez, como empate.
+    """
+    wa, wb, proprio = pesos_a[ia], pesos_b[ib], pesos_b[ia]
+    grupos_a = np.concatenate([COMBOS[ia].astype(np.int64), np.full((len(ia), 1), _TODAS)], axis=1)
+    grupos_b = np.concatenate([COMBOS[ib].astype(np.int64), np.full((len(ib), 1), _TODAS)], axis=1)
+    sinais = np.array([-1.0, -1.0, 1.0])
+    deslocamento = _BITS_PONTOS + _BITS_COMBO
+
+    vitorias = empates = total = 0.0
+    bloco = max(1, BLOCO_COMPARACAO // (3 * max(len(ia), len(ib), 1)))
+    for i in range(0, len(pontos_a), bloco):
+        pa, pb = pontos_a[i:i + bloco].astype(np.int64), pontos_b[i:i + bloco].astype(np.int64)
+        linhas = np.arange(len(pa))[:, None, None] * (_TODAS + 1)
+
+        chaves = ((linhas + grupos_b) << deslocamento) | (pb[:, :, None] << _BITS_COMBO) | np.arange(len(ib))[:, None]
+        chaves = np.sort(chaves[np.broadcast_to(pb[:, :, None] >= 0, chaves.shape)])
+        acumulado = np.concatenate([[0.0], np.cumsum(wb[chaves & ((1 << _BITS_COMBO) - 1)])])
+
+        # Onde começa cada grupo (runout x carta) e, dentro do grupo, os pontos de cada mão de A
+        inicios = np.searchsorted(chaves, np.arange(len(pa) * (_TODAS + 1) + 1) << deslocamento)
+        grupo = linhas + grupos_a
+        base = grupo << deslocamento
+        abaixo = np.searchsorted(chaves, base | (pa[:, :, None] << _BITS_COMBO))
+        ate = np.searchsorted(chaves, base | ((pa[:, :, None] + 1) << _BITS_COMBO))
+        comeco, fim = acumulado[inicios[grupo]], acumulado[inicios[grupo + 1]]
+
+        peso = np.where(pa >= 0, wa, 0.0)
+        vitorias += float(((acumulado[abaixo] - comeco) @ sinais * peso).sum())
+        empates += float((((acumulado[ate] - acumulado[abaixo]) @ sinais + proprio) * peso).sum())
+        total += float((((fim - comeco) @ sinais + proprio) * peso).sum())
+    return vitorias, empates, total
+
+
+def equidade(faixa_a: str, faixa_b: str, cartas_mesa: list[str]) -> dict:
+    mesa = mesa_canonica(cartas_mesa)
+    pesos_a, pesos_b = pesos_da_faixa(faixa_a), pesos_da_faixa(faixa_b)
+    chave = (mesa, pesos_a.tobytes(), pesos_b.tobytes())
+    with _lock:
+        pronto = _resultados.get(chave)
+    if pronto is not None:
+        return pronto
+
+    ia, ib = np.flatnonzero(pesos_a), np.flatnonzero(pesos_b)
+    uniao = np.union1d(ia, ib)
+    completas, pontos, exato = pontuacoes_da_mesa(mesa, uniao)
+    pontos_a = pontos[:, np.searchsorted(uniao, ia)]
+    pontos_b = pontos[:, np.searchsorted(uniao, ib)]
+
+    vitorias, empates, total = _comparar(pontos_a, pontos_b, ia, ib, pesos_a, pesos_b)
+
+    if total == 0:
+        raise ValueError("As faixas não têm combinações possíveis nessa mesa.")
+
+    equidade_a = (vitorias + empates / 2) / total
+    validas_mesa = (MASCARA_COMBO & _mascara_das_mesas(np.array([mesa], dtype=np.int16))[0]) == 0
+    resultado = {
+        "equidade_a": round(equidade_a, 6),
+        "equidade_b": round(1 - equidade_a, 6),
+        "empate": round(empates / total, 6),
+        "combinacoes_a": round(float(pesos_a[validas_mesa].sum()), 2),
+        "combinacoes_b": round(float(pesos_b[validas_mesa].sum()), 2),
+        "runouts": len(completas),
+        "exato": exato,
+        "categorias_a": _distribuicao(pontos_a, pesos_a[ia]),
+        "categorias_b": _distribuicao(pontos_b, pesos_b[ib]),
+        "textura": textura_da_mesa(completas),
+    }
+    _guardar(_resultados, chave, resultado, CACHE_RESULTADOS_TAMANHO)
+    return resultado
+
+
+@router.post("/equidade", response_model=EquidadeOut, dependencies=[Depends(limitar_acao)])
+def calcular_equidade(dados: EquidadeInput, current_user: UsuarioAutenticado = Depends(get_current_user)):
+    if len(dados.mesa) not in (0, 3, 4, 5):
+        raise HTTPException(status_code=400, detail="A mesa tem 0, 3, 4 ou 5 cartas.")
+    invalidas = [c for c in dados.mesa if c not in CARTAS]
+    if invalidas or len(set(dados.mesa)) != len(dados.mesa):
+        raise HTTPException(status_code=400, detail=f"Cartas da mesa inválidas ou repetidas: {invalidas or dados.mesa}")
+    try:
+        return equidade(dados.faixa_a, dados.faixa_b, dados.mesa)
+    except ValueError as erro:
+        raise HTTPException(status_code=400, detail=str(erro))
@@ -0,0 +1,201 @@
+import threading
+from collections import OrderedDict
+import orjson
+from sqlalchemy import event, update
+from db.database import SessionLocal
+from db.models import Mesa, JogadorNaMesa, SidePot
+
+# Versão do estado de cada mesa (coluna mesas.versao), incrementada na mesma
+# transação que mexe na mesa, nos jogadores sentados ou nos side pots: vale pra
+# todos os workers, e um rollback desfaz a mudança e a versão juntos. Os payloads
+# de leitura mais consultados (jogadores, vez, cartas) são serializados uma vez
+# por versão e os mesmos bytes são reaproveitados até a próxima mudança.
+#
+# O estado combinado da mesa (GET /mesas/{id}/estado) é versionado: cada versão
+# que algum cliente recebeu fica guardada (as últimas HISTORICO_DE_ESTADOS por
+# mesa) e quem informa a última versão que tem recebe só o delta até a atual:
+# assentos que mudaram, pote, rodada, vez, cartas reveladas. Versão fora do
+# histórico (cliente muito atrasado, reinício do servidor) recebe o estado
+# completo. Como o delta é a diferença entre dois estados guardados, ele vale
+# mesmo que várias versões tenham passado sem ninguém ler. O histórico é de cada
+# processo, mas as versões vêm do banco: um estado guardado sob uma versão é o
+# estado daquela versão em qualquer worker, e sobrevive a reinícios.
+
+_payloads: dict[tuple[int, str], tuple[int, bytes]] = {}
+_lock = threading.Lock()
+
+HISTORICO_DE_ESTADOS = 32
+
+
+def versao_da_mesa(db, mesa_id: int) -> int | None:
+    """Versão gravada no banco; None se a mesa não existe."""
+    return db.query(Mesa.versao).filter(Mesa.id == mesa_id).scalar()
+
+
+def _gerar_na_versao(db, mesa_id: int, antes: int | None, gerar) -> tuple[int | None, object]:
+    """
+    Roda `gerar()` e devolve (versão, resultado) com a versão a que o resultado
+    corresponde. As leituras não ficam numa transação só: se um commit entrou
+    entre elas, tenta de novo; se continuar mudando, a versão volta None e o
+    resultado não deve ser guardado.
+    """
+    for _ in range(3):
+        dados = gerar()
+        depois = versao_da_mesa(db, mesa_id)
+        if depois == antes:
+            return antes, dados
+        antes = depois
+    return None, dados
+
+
+def payload_em_cache(db, mesa_id: int, chave: str, gerar) -> bytes:
+    """Bytes JSON de `gerar()` para a versão atual da mesa, gerados só uma vez por versão."""
+    versao_atual = versao_da_mesa(db, mesa_id)
+    item = _payloads.get((mesa_id, chave))
+    if versao_atual is not None and item is not None and item[0] == versao_atual:
+        return item[1]
+
+    versao_gerada, dados = _gerar_na_versao(db, mesa_id, versao_atual, gerar)
+    conteudo = orjson.dumps(dados)
+    if versao_gerada is not None:
+        _payloads[(mesa_id, chave)] = (versao_gerada, conteudo)
+    return conteudo
+
+
+class HistoricoDeEstados:
+    """Últimos estados entregues de uma mesa, por versão, e as respostas já serializadas (por versão e base)."""
+
+    def __init__(self):
+        self.estados: OrderedDict[int, dict] = OrderedDict()
+        self.respostas: dict[tuple[int, int | None], bytes] = {}
+        self.lock = threading.Lock()
+
+    def guardar(self, versao_estado: int, estado: dict):
+        self.estados[versao_estado] = estado
+        while len(self.estados) > HISTORICO_DE_ESTADOS:
+            self.estados.popitem(last=False)
+        # Respostas serializadas são pedidas quase sempre pra versão mais nova: as antigas saem
+        self.respostas = {}
+
+
+_historicos: dict[int, HistoricoDeEstados] = {}
+
+
+def diferenca_de_estado(antigo: dict, novo: dict) -> dict:
+    """
+    Delta entre dois estados no formato {"mesa": {...}, "assentos": {user_id: {...}}}:
+    só os campos da mesa que mudaram, só os campos alterados de cada assento
+    (assento novo vai inteiro, com o nome) e a lista de quem saiu.
+    """
+    delta = {}
+    mesa = {campo: valor for campo, valor in novo["mesa"].items() if antigo["mesa"].get(campo) != valor}
+    if mesa:
+        delta["mesa"] = mesa
+
+    assentos = {}
+    for user_id, assento in novo["assentos"].items():
+        anterior = antigo["assentos"].get(user_id)
+        if anterior is None:
+            assentos[user_id] = assento
+            continue
+        mudou = {campo: valor for campo, valor in assento.items() if anterior.get(campo) != valor}
+        if mudou:
+            assentos[user_id] = mudou
+    if assentos:
+        delta["assentos"] = assentos
+
+    saiu = [user_id for user_id in antigo["assentos"] if user_id not in novo["assentos"]]
+    if saiu:
+        delta["saiu"] = saiu
+    return delta
+
+
+def estado_versionado(db, mesa_id: int, desde: int | None, gerar) -> bytes:
+    """
+    Bytes JSON do estado da mesa pra um cliente que já tem a versão `desde`:
+    o delta até a versão atual, ou o estado completo se `desde` não estiver no
+    histórico. `gerar()` monta o estado completo e roda uma vez por versão.
+    """
+    versao_atual = versao_da_mesa(db, mesa_id)
+    with _lock:
+        historico = _historicos.setdefault(mesa_id, HistoricoDeEstados())
+
+    with historico.lock:
+        atual = historico.estados.get(versao_atual) if versao_atual is not None else None
+        if atual is None:
+            versao_atual, atual = _gerar_na_versao(db, mesa_id, versao_atual, gerar)
+            if versao_atual is None:
+                # Mesa mudando mais rápido do que dá pra ler: vai o estado completo, sem versão
+                return orjson.dumps({"versao": None, "completo": True, **atual})
+            historico.guardar(versao_atual, atual)
+
+        base = desde if desde in historico.estados else None
+        conteudo = historico.respostas.get((versao_atual, base))
+        if conteudo is None:
+            if base is None:
+                resposta = {"versao": versao_atual, "completo": True, **atual}
+            else:
+                resposta = {
+                    "versao": versao_atual, "base": base, "completo": False,
+                    **diferenca_de_estado(historico.estados[base], atual),
+                }
+            conteudo = orjson.dumps(resposta)
+            historico.respostas[(versao_atual, base)] = conteudo
+    return conteudo
+
+
+def _mesa_do_objeto(obj) -> int | None:
+    if isinstance(obj, Mesa):
+        return obj.id
+    if isinstance(obj, (JogadorNaMesa, SidePot)):
+        return obj.mesa_id
+    return None
+
+
+def _subir_versoes(session, mesa_ids: set[int]):
+    """Incrementa mesas.versao uma vez por transação em cada mesa alterada."""
+    versionadas = session.info.setdefault("mesas_versionadas", set())
+    novas = mesa_ids - versionadas
+    if not novas:
+        return
+    # UPDATE direto na tabela: não passa pelo flush nem mexe nos objetos da sessão
+    session.connection().execute(
+        update(Mesa.__table__).where(Mesa.__table__.c.id.in_(novas)).values(versao=Mesa.__table__.c.versao + 1)
+    )
+    versionadas.update(novas)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _coletar_mesas_alteradas(session, flush_context):
+    alteradas = session.info.setdefault("mesas_alteradas", set())
+    for obj in list(session.new) + list(session.deleted):
+        mesa_id = _mesa_do_objeto(obj)
+        if mesa_id is not None:
+            alteradas.add(mesa_id)
+    for obj in session.dirty:
+        mesa_id = _mesa_do_objeto(obj)
+        if mesa_id is not None and session.is_modified(obj, include_collections=False):
+            alteradas.add(mesa_id)
+
+
+@event.listens_for(SessionLocal, "after_flush_postexec")
+def _versionar_mesas_alteradas(session, flush_context):
+    _subir_versoes(session, session.info.get("mesas_alteradas", set()))
+
+
+def marcar_alterada(session, mesa_id: int):
+    """Pra escritas em lote (query.update, UPDATE por executemany), que não passam pelo after_flush por objeto."""
+    session.info.setdefault("mesas_alteradas", set()).add(mesa_id)
+    _subir_versoes(session, {mesa_id})
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publicar_versoes(session):
+    session.info.pop("mesas_versionadas", None)
+    session.info.pop("mesas_alteradas", None)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar_alteracoes(session):
+    session.info.pop("mesas_alteradas", None)
+    session.info.pop("mesas_versionadas", None)
@@ -0,0 +1,314 @@
+import json
+import threading
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from db.database import get_db, SessionLocal
+from db.models import EstatisticaJogador, JogadorNaMesa, Mao, AcaoMao, Mesa
+from db.dinheiro import centavos_para_reais
+from api.schemas import EstatisticasJogadorOut
+from api.limites import limitar_leitura
+
+# Estatísticas de jogador (VPIP, PFR, agressão, ganhos) mantidas de forma incremental:
+# cada ação registrada no histórico (game/historico_maos.py) soma nos contadores em
+# memória deste worker quando a transação dela comita (ação desfeita por rollback
+# não conta), e uma tarefa de fundo descarrega os deltas na tabela
+# estatisticas_jogador com um upsert aditivo. A leitura é a linha do jogador mais o
+# delta ainda não descarregado, sem varrer histórico.
+#
+# A reconstrução (python -m game.estatisticas --reconstruir) refaz tudo numa passada
+# pelo arquivo Parquet e pelas mãos ainda não arquivadas, com a mesma contabilização.
+#python -m game.estatisticas --reconstruir
+
+ESTATISTICAS_INTERVALO_SEGUNDOS = 10
+LOTE_RECONSTRUCAO = 10_000
+
+CAMPOS = ("maos", "vpip", "pfr", "agressivas", "calls", "folds", "investido", "ganho")
+MAOS, VPIP, PFR, AGRESSIVAS, CALLS, FOLDS, INVESTIDO, GANHO = range(len(CAMPOS))
+
+ACOES_VOLUNTARIAS = {"call", "raise", "allin"}
+ACOES_AGRESSIVAS = {"raise", "allin"}
+
+# Marcas do jogador na mão em andamento, pra VPIP e PFR contarem uma vez por mão
+_MARCA_VPIP, _MARCA_PFR = 1, 2
+
+
+def contabilizar_acao(contadores: list[int], marcas: int, acao: str, valor: int, rodada: str, dinheiro: bool) -> int:
+    """Soma uma ação nos contadores do jogador e retorna as marcas dele na mão, atualizadas."""
+    if acao in ACOES_AGRESSIVAS:
+        contadores[AGRESSIVAS] += 1
+    elif acao == "call":
+        contadores[CALLS] += 1
+    elif acao == "fold":
+        contadores[FOLDS] += 1
+
+    if rodada == "pre-flop" and acao in ACOES_VOLUNTARIAS:
+        if not marcas & _MARCA_VPIP:
+            contadores[VPIP] += 1
+            marcas |= _MARCA_VPIP
+        if acao in ACOES_AGRESSIVAS and not marcas & _MARCA_PFR:
+            contadores[PFR] += 1
+            marcas |= _MARCA_PFR
+
+    # Fichas de torneio não são dinheiro: não entram em investido/ganho
+    if dinheiro:
+        contadores[INVESTIDO] += valor or 0
+    return marcas
+
+
+class AcumuladorDeEstatisticas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._deltas: dict[int, list[int]] = {}
+        self._marcas: dict[int, dict[int, int]] = {}  # mesa_id -> {user_id: marcas} da mão em andamento
+
+    def _contadores(self, user_id: int) -> list[int]:
+        contadores = self._deltas.get(user_id)
+        if contadores is None:
+            contadores = self._deltas[user_id] = [0] * len(CAMPOS)
+        return contadores
+
+    def iniciar_mao(self, mesa_id: int, user_ids: list[int]):
+        with self._lock:
+            self._marcas[mesa_id] = {}
+            for user_id in user_ids:
+                self._contadores(user_id)[MAOS] += 1
+
+    def acao(self, mesa_id: int, user_id: int, acao: str, valor: int, rodada: str, dinheiro: bool):
+        with self._lock:
+            marcas = self._marcas.setdefault(mesa_id, {})
+            marcas[user_id] = contabilizar_acao(
+                self._contadores(user_id), marcas.get(user_id, 0), acao, valor, rodada, dinheiro
+            )
+
+    def finalizar_mao(self, mesa_id: int, ganhos: dict[int, int], dinheiro: bool):
+        with self._lock:
+            self._marcas.pop(mesa_id, None)
+            if dinheiro:
+                for user_id, valor in ganhos.items():
+                    self._contadores(user_id)[GANHO] += valor
+
+    def pendentes(self, user_id: int) -> list[int] | None:
+        with self._lock:
+            contadores = self._deltas.get(user_id)
+            return list(contadores) if contadores else None
+
+    def retirar(self) -> dict[int, list[int]]:
+        with self._lock:
+            deltas, self._deltas = self._deltas, {}
+            return deltas
+
+    def devolver(self, deltas: dict[int, list[int]]):
+        """Descarga falhou: os deltas voltam pra próxima tentativa."""
+        with self._lock:
+            for user_id, valores in deltas.items():
+                contadores = self._contadores(user_id)
+                for i, valor in enumerate(valores):
+                    contadores[i] += valor
+
+
+acumulador = AcumuladorDeEstatisticas()
+
+
+def acumular_no_commit(db: Session, metodo: str, *args):
+    """Guarda a chamada `acumulador.<metodo>(*args)` na sessão; ela só roda se a transação comitar."""
+    db.info.setdefault("estatisticas_pendentes", []).append((metodo, args))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _aplicar_estatisticas(session):
+    for metodo, args in session.info.pop("estatisticas_pendentes", ()):
+        getattr(acumulador, metodo)(*args)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar_estatisticas(session):
+    session.info.pop("estatisticas_pendentes", None)
+
+
+def _upsert(somar: bool):
+    stmt = insert(EstatisticaJogador)
+    campos = {
+        campo: (getattr(EstatisticaJogador, campo) + getattr(stmt.excluded, campo)) if somar else getattr(stmt.excluded, campo)
+        for campo in CAMPOS
+    }
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={**campos, "atualizado_em": stmt.excluded.atualizado_em},
+    )
+
+
+def _linhas(contadores_por_usuario: dict[int, list[int]]) -> list[dict]:
+    agora = datetime.utcnow()
+    return [
+        {"user_id": user_id, **dict(zip(CAMPOS, valores)), "atualizado_em": agora}
+        for user_id, valores in contadores_por_usuario.items()
+    ]
+
+
+def descarregar_estatisticas(db: Session):
+    """Tarefa periódica: um upsert em lote com os deltas acumulados desde a última descarga."""
+    deltas = acumulador.retirar()
+    if not deltas:
+        return
+    try:
+        db.execute(_upsert(somar=True), _linhas(deltas))
+        db.commit()
+    except Exception:
+        db.rollback()
+        acumulador.devolver(deltas)
+        raise
+
+
+def _formatar(user_id: int, valores: list[int]) -> dict:
+    maos = valores[MAOS]
+    return {
+        "user_id": user_id,
+        "maos": maos,
+        "vpip": round(100 * valores[VPIP] / maos, 1) if maos else 0.0,
+        "pfr": round(100 * valores[PFR] / maos, 1) if maos else 0.0,
+        "fator_agressao": round(valores[AGRESSIVAS] / valores[CALLS], 2) if valores[CALLS] else None,
+        "folds": valores[FOLDS],
+        "ganho": centavos_para_reais(valores[GANHO]),
+        "resultado": centavos_para_reais(valores[GANHO] - valores[INVESTIDO]),
+    }
+
+
+def ler_estatisticas(db: Session, user_ids: list[int]) -> list[dict]:
+    """Uma consulta por chave primária pra todos os ids, somando o que ainda está em memória."""
+    linhas = {
+        e.user_id: e
+        for e in db.query(EstatisticaJogador).filter(EstatisticaJogador.user_id.in_(user_ids))
+    }
+    resultado = []
+    for user_id in user_ids:
+        linha = linhas.get(user_id)
+        valores = [getattr(linha, campo) or 0 for campo in CAMPOS] if linha else [0] * len(CAMPOS)
+        for i, valor in enumerate(acumulador.pendentes(user_id) or ()):
+            valores[i] += valor
+        resultado.append(_formatar(user_id, valores))
+    return resultado
+
+
+router = APIRouter(prefix="/estatisticas", tags=["Estatísticas"], dependencies=[Depends(limitar_leitura)])
+
+
+@router.get("/mesa/{mesa_id}", response_model=List[EstatisticasJogadorOut])
+def estatisticas_da_mesa(mesa_id: int, db: Session = Depends(get_db)):
+    """HUD: estatísticas de quem está sentado na mesa."""
+    user_ids = [u for (u,) in db.query(JogadorNaMesa.user_id).filter(JogadorNaMesa.mesa_id == mesa_id)]
+    return ler_estatisticas(db, user_ids)
+
+
+@router.get("/{user_id}", response_model=EstatisticasJogadorOut)
+def estatisticas_do_jogador(user_id: int, db: Session = Depends(get_db)):
+    return ler_estatisticas(db, [user_id])[0]
+
+
+@router.get("", response_model=List[EstatisticasJogadorOut])
+def estatisticas_de_varios(usuarios: List[int] = Query(...), db: Session = Depends(get_db)):
+    if len(usuarios) > 50:
+        raise HTTPException(status_code=400, detail="No máximo 50 usuários por consulta.")
+    return ler_estatisticas(db, usuarios)
+
+
+# Reconstrução
+
+def _acoes_em_ordem(db: Session, lote: int):
+    """(mao_id, mesa_id, user_id, acao, valor, rodada) com as ações de cada mão contíguas."""
+    from game.arquivo_maos import ler_arquivo_em_lotes
+
+    colunas = ["mao_id", "mesa_id", "user_id", "acao", "valor", "rodada"]
+    for batch in ler_arquivo_em_lotes("acoes", colunas, lote):
+        yield from zip(*(batch.column(c).to_pylist() for c in colunas))
+
+    # Mãos ainda não arquivadas; as arquivadas que seguem no banco já vieram do Parquet
+    yield from (
+        db.query(AcaoMao.mao_id, Mao.mesa_id, AcaoMao.user_id, AcaoMao.acao, AcaoMao.valor, AcaoMao.rodada)
+        .join(Mao, Mao.id == AcaoMao.mao_id)
+        .filter(Mao.arquivada.is_(False))
+        .order_by(AcaoMao.mao_id, AcaoMao.id)
+        .yield_per(lote)
+    )
+
+
+def _maos(db: Session, lote: int):
+    """(mesa_id, jogadores, ganhos) de cada mão, arquivo e banco."""
+    from game.arquivo_maos import ler_arquivo_em_lotes
+
+    for batch in ler_arquivo_em_lotes("maos", ["mesa_id", "jogadores", "ganhos"], lote):
+        for mesa_id, jogadores, ganhos in zip(*(batch.column(i).to_pylist() for i in range(3))):
+            yield mesa_id, json.loads(jogadores) or [], json.loads(ganhos) or {}
+
+    yield from (
+        (mesa_id, jogadores or [], ganhos or {})
+        for mesa_id, jogadores, ganhos in db.query(Mao.mesa_id, Mao.jogadores, Mao.ganhos)
+        .filter(Mao.arquivada.is_(False))
+        .yield_per(lote)
+    )
+
+
+def reconstruir(db: Session, lote: int = LOTE_RECONSTRUCAO) -> dict[int, list[int]]:
+    """Recalcula os contadores de todos os jogadores numa passada pelo histórico inteiro."""
+    mesas_de_torneio = {id for (id,) in db.query(Mesa.id).filter(Mesa.torneio_id.isnot(None))}
+    totais: dict[int, list[int]] = {}
+
+    def contadores(user_id: int) -> list[int]:
+        if user_id not in totais:
+            totais[user_id] = [0] * len(CAMPOS)
+        return totais[user_id]
+
+    mao_atual, marcas, acoes = None, {}, 0
+    for mao_id, mesa_id, user_id, acao, valor, rodada in _acoes_em_ordem(db, lote):
+        if mao_id != mao_atual:
+            mao_atual, marcas = mao_id, {}
+        marcas[user_id] = contabilizar_acao(
+            contadores(user_id), marcas.get(user_id, 0), acao, valor, rodada, mesa_id not in mesas_de_torneio
+        )
+        acoes += 1
+        if acoes % 100_000 == 0:
+            print(f"  {acoes} ações...")
+
+    maos = 0
+    for mesa_id, jogadores, ganhos in _maos(db, lote):
+        for jogador in jogadores:
+            contadores(jogador["user_id"])[MAOS] += 1
+        if mesa_id not in mesas_de_torneio:
+            for user_id, valor in ganhos.items():
+                contadores(int(user_id))[GANHO] += valor
+        maos += 1
+
+    print(f"📊 {maos} mãos e {acoes} ações lidas, {len(totais)} jogadores.")
+    return totais
+
+
+def gravar_reconstrucao(db: Session, totais: dict[int, list[int]]):
+    """Substitui a tabela inteira numa transação só."""
+    db.query(EstatisticaJogador).delete(synchronize_session=False)
+    if totais:
+        db.execute(_upsert(somar=False), _linhas(totais))
+    db.commit()
+
+
+if __name__ == "__main__":
+    import argparse
+    from db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Estatísticas de jogadores")
+    parser.add_argument("--reconstruir", action="store_true", help="recalcula tudo a partir do histórico")
+    parser.add_argument("--usuario", type=int, action="append", help="mostra as estatísticas do usuário")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.reconstruir:
+            # Deltas em memória dos servidores rodando ainda vão somar por cima:
+            # rode com o jogo parado pra não contar em dobro as mãos mais recentes
+            gravar_reconstrucao(db, reconstruir(db))
+        for user_id in args.usuario or []:
+            print(ler_estatisticas(db, [user_id])[0])
+    finally:
+        db.close()
@@ -0,0 +1,107 @@
+import json
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from db.models import Mesa, JogadorNaMesa, Mao, AcaoMao
+from api import metricas
+from api.rastreamento import marcar_mao
+from game.estatisticas import acumular_no_commit
+
+# Registro do histórico de mãos. Nada aqui faz commit: as linhas entram
+# no mesmo commit da ação de jogo que as gerou. Cada ação registrada também
+# alimenta as estatísticas dos jogadores (game/estatisticas.py), só depois desse commit.
+
+
+def mao_atual(db: Session, mesa_id: int) -> Mao | None:
+    return (
+        db.query(Mao)
+        .filter(Mao.mesa_id == mesa_id, Mao.finalizada_em.is_(None))
+        .order_by(Mao.id.desc())
+        .first()
+    )
+
+
+def pote_da_mao(db: Session, mesa_id: int) -> int:
+    """Tudo o que já entrou no pote da mão aberta (blinds inclusos), numa consulta."""
+    mao_aberta = (
+        db.query(func.max(Mao.id))
+        .filter(Mao.mesa_id == mesa_id, Mao.finalizada_em.is_(None))
+        .scalar_subquery()
+    )
+    return db.query(func.coalesce(func.sum(AcaoMao.valor), 0)).filter(AcaoMao.mao_id == mao_aberta).scalar()
+
+
+def iniciar_mao(db: Session, mesa: Mesa, jogadores: list[JogadorNaMesa], inicio: str, semente: int | None = None) -> Mao:
+    """
+    Chamado depois dos blinds postados e das cartas distribuídas. `inicio` é
+    por onde a mão começou ("iniciar_partida" ou "nova_rodada"), pro replay.
+    """
+    # Mão anterior que ficou aberta (ex: todos foldaram) não deve ficar pendurada
+    anterior = mao_atual(db, mesa.id)
+    if anterior:
+        anterior.finalizada_em = datetime.utcnow()
+
+    ultimo_numero = db.query(func.max(Mao.numero)).filter(Mao.mesa_id == mesa.id).scalar() or 0
+
+    mao = Mao(
+        mesa_id=mesa.id,
+        numero=ultimo_numero + 1,
+        semente=semente,
+        inicio=inicio,
+        jogadores=[
+            {
+                "user_id": j.user_id,
+                "stack_inicial": j.stack + j.aposta_atual,
+                "cartas": json.loads(j.cartas) if j.cartas else [],
+            }
+            for j in sorted(jogadores, key=lambda j: j.id)
+        ],
+    )
+    db.add(mao)
+    metricas.maos_iniciadas.inc()
+    marcar_mao(mao.numero)
+    acumular_no_commit(db, "iniciar_mao", mesa.id, [j.user_id for j in jogadores])
+
+    for j in jogadores:
+        if j.id == mesa.small_blind_pos:
+            blind = ("small_blind", mesa.small_blind)
+        elif j.id == mesa.big_blind_pos:
+            blind = ("big_blind", mesa.big_blind)
+        else:
+            continue
+        db.add(AcaoMao(mao=mao, user_id=j.user_id, acao=blind[0], valor=blind[1], rodada="pre-flop"))
+        acumular_no_commit(db, "acao", mesa.id, j.user_id, blind[0], blind[1], "pre-flop", mesa.torneio_id is None)
+
+    return mao
+
+
+def registrar_acao(db: Session, mesa: Mesa, user_id: int, acao: str, valor: int = 0):
+    mao = mao_atual(db, mesa.id)
+    if mao is None:
+        return
+    marcar_mao(mao.numero)
+    db.add(AcaoMao(mao_id=mao.id, user_id=user_id, acao=acao, valor=valor, rodada=mesa.estado_da_rodada))
+    acumular_no_commit(db, "acao", mesa.id, user_id, acao, valor, mesa.estado_da_rodada, mesa.torneio_id is None)
+
+
+def finalizar_mao(
+    db: Session,
+    mesa: Mesa,
+    jogadores: list[JogadorNaMesa],
+    cartas_comunitarias: list[str],
+    vencedores: list[int],
+    ganhos: dict[int, int],
+):
+    mao = mao_atual(db, mesa.id)
+    if mao is None:
+        return
+    mao.finalizada_em = datetime.utcnow()
+    mao.cartas_comunitarias = list(cartas_comunitarias)
+    mao.pote = sum(ganhos.values())
+    mao.vencedores = list(vencedores)
+    mao.ganhos = {str(user_id): valor for user_id, valor in ganhos.items()}
+    mao.stacks_finais = {str(j.user_id): j.stack for j in jogadores}
+    db.add(mao)
+    metricas.maos_finalizadas.inc()
+    acumular_no_commit(db, "finalizar_mao", mesa.id, ganhos, mesa.torneio_id is None)
+    metricas.potes.observar(mao.pote)
@@ -1,23 +1,31 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from db.database import get_db
-from db.models import Mesa, JogadorNaMesa
+from db.models import Mesa
 from typing import List
-from api.schemas import MesaBase
+from api.auth import get_current_user, UsuarioAutenticado
+from api.schemas import MesaBase, MesaDisponivelOut, EntrarMesaOut, FaixaDeStakeOut
+from db.dinheiro import centavos_para_reais, reais_para_centavos
+from game.config_mesas import obter_config
+from game.assentos import contar_jogadores_por_mesa, indice_assentos, reservar_ou_abrir
+from game.mesas import sentar_na_mesa
+from api.limites import limitar_leitura, limitar_acao
 
-router = APIRouter(prefix="/lobby", tags=["Lobby"])
+router = APIRouter(prefix="/lobby", tags=["Lobby"], dependencies=[Depends(limitar_leitura)])
 
 
 @router.get("/mesas", response_model=List[MesaBase])
 def listar_todas_mesas_lobby(db: Session = Depends(get_db)):
-    mesas = db.query(Mesa).all()
+    # Só o status muda durante a vida da mesa; o resto vem da config em memória
+    mesas = db.query(Mesa.id, Mesa.status).all()
+    jogadores_por_mesa = contar_jogadores_por_mesa(db)
 
     mesas_com_jogadores = [
         {
             "id": mesa.id,
-            "nome": mesa.nome,
+            "nome": obter_config(db, mesa.id).nome,
             "status": mesa.status.value if hasattr(mesa.status, "value") else mesa.status,
-            "jogadores": db.query(JogadorNaMesa).filter(JogadorNaMesa.mesa_id == mesa.id).count(),
+            "jogadores": jogadores_por_mesa.get(mesa.id, 0),
         }
         for mesa in mesas
     ]
@@ -26,22 +34,64 @@ def listar_todas_mesas_lobby(db: Session = Depends(get_db)):
 
 
 
-@router.get("/disponiveis")
+@router.get("/disponiveis", response_model=List[MesaDisponivelOut])
 def listar_mesas_disponiveis_para_entrada(db: Session = Depends(get_db)):
-    mesas = db.query(Mesa).all()
+    mesas = db.query(Mesa.id, Mesa.status).all()
+    jogadores_por_mesa = contar_jogadores_por_mesa(db)
     mesas_disponiveis = []
 
     for mesa in mesas:
-        qtd_jogadores = db.query(JogadorNaMesa).filter(JogadorNaMesa.mesa_id == mesa.id).count()
-        if mesa.status == "aberta" and qtd_jogadores < mesa.limite_jogadores:
+        config = obter_config(db, mesa.id)
+        qtd_jogadores = jogadores_por_mesa.get(mesa.id, 0)
+        if mesa.status == "aberta" and qtd_jogadores < config.limite_jogadores and config.torneio_id is None:
             mesas_disponiveis.append({
                 "id": mesa.id,
                 "status": mesa.status,
-                "limite_jogadores": mesa.limite_jogadores,
+                "limite_jogadores": config.limite_jogadores,
                 "jogadores_atuais": qtd_jogadores,
-                "tipo_jogo": mesa.tipo_jogo,
-                "valor_minimo_aposta": mesa.valor_minimo_aposta
+                "tipo_jogo": config.tipo_jogo,
+                "valor_minimo_aposta": centavos_para_reais(config.valor_minimo_aposta)
             })
 
     return mesas_disponiveis
 
+
+@router.get("/stakes", response_model=List[FaixaDeStakeOut])
+def listar_faixas_de_stake():
+    return [
+        {
+            "stake": centavos_para_reais(big_blind),
+            "mesas": dados["mesas"],
+            "assentos_livres": dados["assentos_livres"],
+        }
+        for big_blind, dados in sorted(indice_assentos.faixas().items())
+    ]
+
+
+# Senta o jogador na mesa mais cheia com vaga da faixa, abrindo mesa nova se
+# todas estiverem lotadas. `stake` é o big blind em reais (ver /lobby/stakes).
+@router.post("/quick-seat", response_model=EntrarMesaOut, dependencies=[Depends(limitar_acao)])
+def quick_seat(
+    stake: float = Query(...),
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user),
+):
+    big_blind = reais_para_centavos(stake)
+    if not indice_assentos.tem_faixa(big_blind):
+        raise HTTPException(status_code=404, detail="Nenhuma mesa com esse stake.")
+
+    for _ in range(3):
+        mesa_id = reservar_ou_abrir(db, big_blind)
+        if mesa_id is None:
+            raise HTTPException(status_code=503, detail="Não foi possível abrir uma mesa agora.")
+        try:
+            return sentar_na_mesa(db, mesa_id, current_user)
+        except HTTPException as e:
+            db.rollback()
+            if e.detail != "Mesa cheia.":
+                indice_assentos.liberar(mesa_id)
+                raise
+            # Índice desatualizado (a mesa lotou por outro worker): tira ela e tenta a próxima
+            indice_assentos.marcar_cheia(mesa_id)
+
+    raise HTTPException(status_code=409, detail="Mesas da faixa lotando, tente de novo.")
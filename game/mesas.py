@@ -1,9 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Response
+from typing import List
+from sqlalchemy.orm import Session, joinedload
 from db.database import get_db
-from db.models import Mesa, User, JogadorNaMesa, MesaStatus
-from api.auth import get_current_user
+from db.models import Mesa, JogadorNaMesa, MesaStatus
+from api.auth import get_current_user, UsuarioAutenticado
 from game.partida import iniciar_partida, get_mesa, get_jogadores_da_mesa, ControladorDePartida
+from db.dinheiro import centavos_para_reais, formatar_reais
+from api.carteira import lancar, debitar_usuario, conta_usuario, conta_mesa, SaldoInsuficiente
+from game.config_mesas import obter_config
+from game.estado_mesa import payload_em_cache, estado_versionado
+from game.historico_maos import pote_da_mao
+from api.limites import limitar_leitura, limitar_acao
+from game.assentos import indice_assentos
+from api.schemas import (
+    MensagemOut, VezOut, JogadorNaMesaOut, EntrarMesaOut, CartasComunitariasOut,
+    EstadoRodadaOut, ShowdownOut, EstadoMesaOut,
+)
 import json
 
 
@@ -12,56 +24,116 @@ router = APIRouter(prefix="/mesas", tags=["Mesas"])
 
 
 
-@router.get("/{mesa_id}/vez")
-def vez_do_jogador(mesa_id: int, db: Session = Depends(get_db)):
-    mesa = db.query(Mesa).filter(Mesa.id == mesa_id).first()
-    if not mesa:
-        raise HTTPException(status_code=404, detail="Mesa não encontrada.")
-    
-    return {"jogador_da_vez": mesa.jogador_da_vez_id}
+def json_pronto(conteudo: bytes) -> Response:
+    return Response(content=conteudo, media_type="application/json")
 
 
+# As leituras de estado abaixo são serializadas uma vez por versão da mesa (game/estado_mesa.py)
+@router.get("/{mesa_id}/vez", response_model=VezOut, dependencies=[Depends(limitar_leitura)])
+def vez_do_jogador(mesa_id: int, db: Session = Depends(get_db)):
+    def gerar():
+        mesa = db.query(Mesa).filter(Mesa.id == mesa_id).first()
+        if not mesa:
+            raise HTTPException(status_code=404, detail="Mesa não encontrada.")
+        return {"jogador_da_vez": mesa.jogador_da_vez_id}
+
+    return json_pronto(payload_em_cache(db, mesa_id, "vez", gerar))
+
+
+
+
+@router.get("/{mesa_id}/estado", response_model=EstadoMesaOut, dependencies=[Depends(limitar_leitura)])
+def estado_da_mesa(mesa_id: int, desde: int | None = None, db: Session = Depends(get_db)):
+    """
+    Estado combinado da mesa (assentos, pote, rodada, vez, cartas reveladas).
+    Passe em `desde` a última versão recebida pra receber só o que mudou;
+    sem ela, ou se ela já saiu do histórico, vem o estado completo.
+    """
+    def gerar():
+        mesa = db.query(Mesa).filter(Mesa.id == mesa_id).first()
+        if not mesa:
+            raise HTTPException(status_code=404, detail="Mesa não encontrada.")
+        jogadores = db.query(JogadorNaMesa).options(joinedload(JogadorNaMesa.user)).filter_by(mesa_id=mesa_id).all()
+        user_da_posicao = {j.id: j.user_id for j in jogadores}
+        rodada = mesa.estado_da_rodada
+        return {
+            "mesa": {
+                "status": mesa.status.value,
+                "rodada": rodada,
+                "jogador_da_vez": mesa.jogador_da_vez_id,
+                "small_blind": user_da_posicao.get(mesa.small_blind_pos),
+                "big_blind": user_da_posicao.get(mesa.big_blind_pos),
+                "aposta_atual": centavos_para_reais(mesa.aposta_atual),
+                "pote": centavos_para_reais(pote_da_mao(db, mesa_id)) if mesa.status == MesaStatus.em_jogo else 0,
+                "flop": mesa.flop if rodada in ["flop", "turn", "river"] else [],
+                "turn": mesa.turn if rodada in ["turn", "river"] and mesa.mostrar_turn else None,
+                "river": mesa.river if rodada == "river" and mesa.mostrar_river else None,
+            },
+            # Chave em texto: é o que o JSON aceita
+            "assentos": {
+                str(j.user_id): {
+                    "username": j.user.username,
+                    "stack": centavos_para_reais(j.stack),
+                    "aposta": centavos_para_reais(j.aposta_atual),
+                    "foldado": j.foldado,
+                }
+                for j in jogadores
+            },
+        }
 
+    return json_pronto(estado_versionado(db, mesa_id, desde, gerar))
 
-@router.get("/{mesa_id}/jogadores")
-def listar_jogadores_na_mesa(mesa_id: int, db: Session = Depends(get_db)):
-    jogadores = db.query(JogadorNaMesa).filter_by(mesa_id=mesa_id).all()
-    return [
-        {
-            "id": j.user.id,
-            "username": j.user.username,
-            "stack": j.stack,
-            "saldo_restante": j.saldo_restante
-        }
-        for j in jogadores
-    ]
 
 
 
-# Entrar na mesa
-@router.post("/{mesa_id}/entrar")
-def entrar_na_mesa(mesa_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    mesa = db.query(Mesa).filter(Mesa.id == mesa_id).first()
-    if not mesa:
+@router.get("/{mesa_id}/jogadores", response_model=List[JogadorNaMesaOut], dependencies=[Depends(limitar_leitura)])
+def listar_jogadores_na_mesa(mesa_id: int, db: Session = Depends(get_db)):
+    def gerar():
+        # joinedload: username vem no mesmo SELECT, sem uma consulta de User por assento
+        jogadores = db.query(JogadorNaMesa).options(joinedload(JogadorNaMesa.user)).filter_by(mesa_id=mesa_id).all()
+        return [
+            {
+                "id": j.user.id,
+                "username": j.user.username,
+                "stack": centavos_para_reais(j.stack),
+                "saldo_restante": centavos_para_reais(j.saldo_restante)
+            }
+            for j in jogadores
+        ]
+
+    return json_pronto(payload_em_cache(db, mesa_id, "jogadores", gerar))
+
+
+
+def sentar_na_mesa(db: Session, mesa_id: int, current_user: UsuarioAutenticado) -> dict:
+    """Buy-in e assento. Usado por /entrar e pelo quick-seat do lobby."""
+    config = obter_config(db, mesa_id)
+    if not config:
         raise HTTPException(status_code=404, detail="Mesa não encontrada.")
+    if config.torneio_id is not None:
+        raise HTTPException(status_code=400, detail="Mesa de torneio: inscreva-se pelo torneio.")
 
-    if current_user.balance < mesa.valor_minimo_aposta:
-        raise HTTPException(status_code=400, detail="Saldo insuficiente para o buy-in.")
-
-    jogador_existente = db.query(JogadorNaMesa).filter_by(user_id=current_user.id, mesa_id=mesa_id).first()
-    if jogador_existente:
+    jogadores_sentados = db.query(JogadorNaMesa).filter_by(mesa_id=mesa_id).all()
+    if any(j.user_id == current_user.id for j in jogadores_sentados):
         raise HTTPException(status_code=400, detail="Você já está na mesa.")
+    if len(jogadores_sentados) >= config.limite_jogadores:
+        raise HTTPException(status_code=400, detail="Mesa cheia.")
+
+    try:
+        debitar_usuario(db, current_user.id, conta_mesa(mesa_id), config.valor_minimo_aposta, "buy_in")
+    except SaldoInsuficiente:
+        raise HTTPException(status_code=400, detail="Saldo insuficiente para o buy-in.")
 
+    mesa = db.query(Mesa).filter(Mesa.id == mesa_id).first()
     jogador_na_mesa = JogadorNaMesa(
         mesa_id=mesa.id,
         user_id=current_user.id,
-        stack_inicial=mesa.valor_minimo_aposta,
-        saldo_restante=mesa.valor_minimo_aposta,
-        stack=mesa.valor_minimo_aposta,
+        stack_inicial=config.valor_minimo_aposta,
+        saldo_restante=config.valor_minimo_aposta,
+        stack=config.valor_minimo_aposta,
     )
 
     db.add(jogador_na_mesa)
-    current_user.balance -= mesa.valor_minimo_aposta
     db.commit()
 
     jogadores_na_mesa = db.query(JogadorNaMesa).filter_by(mesa_id=mesa.id).order_by(JogadorNaMesa.id).all()
@@ -72,20 +144,31 @@ def entrar_na_mesa(mesa_id: int, db: Session = Depends(get_db), current_user: Us
         return {"msg": f"Você entrou na mesa {mesa.nome} com sucesso! Aguardando mais jogadores para iniciar a partida."}
 
 
+# Entrar na mesa
+@router.post("/{mesa_id}/entrar", response_model=EntrarMesaOut, dependencies=[Depends(limitar_acao)])
+def entrar_na_mesa(mesa_id: int, db: Session = Depends(get_db), current_user: UsuarioAutenticado = Depends(get_current_user)):
+    resultado = sentar_na_mesa(db, mesa_id, current_user)
+    indice_assentos.ocupar(mesa_id)
+    return resultado
+
+
 
 
 
 # Sair da mesa
-@router.post("/{mesa_id}/sair")
+@router.post("/{mesa_id}/sair", response_model=MensagemOut, dependencies=[Depends(limitar_acao)])
 def sair_da_mesa(
     mesa_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UsuarioAutenticado = Depends(get_current_user)
 ):
     # Buscar a mesa
     mesa = db.query(Mesa).filter(Mesa.id == mesa_id).first()
     if mesa is None:
         raise HTTPException(status_code=404, detail="Mesa não encontrada.")
+    if mesa.torneio_id is not None:
+        # Fichas de torneio não viram saldo, então não há cash out
+        raise HTTPException(status_code=400, detail="Não é possível sair de uma mesa de torneio.")
     
     # Buscar o jogador na mesa usando o usuário autenticado
     jogador = db.query(JogadorNaMesa).filter_by(mesa_id=mesa_id, user_id=current_user.id).first()
@@ -93,11 +176,13 @@ def sair_da_mesa(
         raise HTTPException(status_code=400, detail="Você não está nesta mesa.")
 
     # Devolver saldo para o jogador
-    current_user.balance += jogador.saldo_restante
+    if jogador.saldo_restante:
+        lancar(db, conta_mesa(mesa.id), conta_usuario(current_user.id), jogador.saldo_restante, "cash_out")
 
     # Remover jogador da mesa
     db.delete(jogador)
     db.commit()
+    indice_assentos.liberar(mesa_id)
 
     # Verificar se a mesa deve ser reaberta
     jogadores_restantes = db.query(JogadorNaMesa).filter_by(mesa_id=mesa_id).count()
@@ -109,29 +194,31 @@ def sair_da_mesa(
         db.commit()
 
     return {
-        "msg": f"Você saiu da mesa {mesa.nome} com sucesso! Saldo devolvido: R$ {jogador.saldo_restante:.2f}"
+        "msg": f"Você saiu da mesa {mesa.nome} com sucesso! Saldo devolvido: {formatar_reais(jogador.saldo_restante)}"
     }
 
 
 
-@router.get("/{mesa_id}/cartas_comunitarias")
-def get_cartas_comunitarias(mesa_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    mesa = db.query(Mesa).filter(Mesa.id == mesa_id).first()
-    if not mesa:
-        raise HTTPException(status_code=404, detail="Mesa não encontrada.")
+@router.get("/{mesa_id}/cartas_comunitarias", response_model=CartasComunitariasOut, dependencies=[Depends(limitar_leitura)])
+def get_cartas_comunitarias(mesa_id: int, db: Session = Depends(get_db), current_user: UsuarioAutenticado = Depends(get_current_user)):
+    def gerar():
+        mesa = db.query(Mesa).filter(Mesa.id == mesa_id).first()
+        if not mesa:
+            raise HTTPException(status_code=404, detail="Mesa não encontrada.")
 
-    response = {
-        "flop": mesa.flop if mesa.estado_da_rodada in ["flop", "turn", "river"] else [],
-        "turn": mesa.turn if mesa.estado_da_rodada in ["turn", "river"] and mesa.mostrar_turn else None,
-        "river": mesa.river if mesa.estado_da_rodada == "river" and mesa.mostrar_river else None
-    }
-    return response
+        return {
+            "flop": mesa.flop if mesa.estado_da_rodada in ["flop", "turn", "river"] else [],
+            "turn": mesa.turn if mesa.estado_da_rodada in ["turn", "river"] and mesa.mostrar_turn else None,
+            "river": mesa.river if mesa.estado_da_rodada == "river" and mesa.mostrar_river else None
+        }
+
+    return json_pronto(payload_em_cache(db, mesa_id, "cartas_comunitarias", gerar))
 
 
 
 
-@router.get("/{mesa_id}/minhas_cartas")
-def minhas_cartas(mesa_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.get("/{mesa_id}/minhas_cartas", response_model=List[str], dependencies=[Depends(limitar_leitura)])
+def minhas_cartas(mesa_id: int, db: Session = Depends(get_db), current_user: UsuarioAutenticado = Depends(get_current_user)):
     jogador = db.query(JogadorNaMesa).filter_by(mesa_id=mesa_id, user_id=current_user.id).first()
     if not jogador or not jogador.cartas:
         return []
@@ -139,7 +226,7 @@ def minhas_cartas(mesa_id: int, db: Session = Depends(get_db), current_user: Use
 
 
 
-@router.post("/{mesa_id}/avancar_rodada")
+@router.post("/{mesa_id}/avancar_rodada", response_model=EstadoRodadaOut)
 def avancar_rodada(mesa_id: int, db: Session = Depends(get_db)):
     mesa = get_mesa(db, mesa_id)
 
@@ -158,7 +245,7 @@ def avancar_rodada(mesa_id: int, db: Session = Depends(get_db)):
     return {"estado_atual": mesa.estado_da_rodada}
 
 
-@router.post("/{mesa_id}/showdown", tags=["Mesas"])
+@router.post("/{mesa_id}/showdown", tags=["Mesas"], response_model=ShowdownOut)
 def finalizar_partida(mesa_id: int, db: Session = Depends(get_db)):
     mesa = get_mesa(db, mesa_id)
     jogadores = get_jogadores_da_mesa(mesa_id, db)
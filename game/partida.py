@@ -4,13 +4,29 @@ import random
 import json
 from db.database import get_db
 from db.models import Mesa, JogadorNaMesa, MesaStatus
-from game.baralho import criar_baralho, embaralhar, distribuir_cartas, distribuir_comunidade
+from game.baralho import criar_baralho, embaralhar, distribuir_cartas, distribuir_comunidade, nova_semente, baralho_da_semente
 from game.verificar_vencedor import determinar_vencedores
 from game.distribuir_pote import distribuir_pote
+from db.dinheiro import centavos_para_reais, formatar_reais
+from game.historico_maos import iniciar_mao, finalizar_mao
+from game.config_mesas import obter_config
 from datetime import datetime
+from sqlalchemy import func
+from db.tarefas import executar_com_sessao
+from api import metricas
+from api.rastreamento import rastreado
 
 router = APIRouter(prefix="/mesas", tags=["Mesas"])
 
+
+def contar_mesas_ativas() -> int:
+    return executar_com_sessao(
+        lambda db: db.query(func.count(Mesa.id)).filter(Mesa.status == MesaStatus.em_jogo).scalar()
+    )
+
+
+metricas.Coletor("panopoker_mesas_ativas", "Mesas com partida em andamento", contar_mesas_ativas)
+
 def get_mesa(db: Session, mesa_id: int) -> Mesa:
     mesa = db.query(Mesa).filter(Mesa.id == mesa_id).first()
     if not mesa:
@@ -23,21 +39,27 @@ def get_jogadores_da_mesa(mesa_id: int, db: Session):
 
 
 
+@rastreado("definir_blinds", mesa=lambda mesa, *_, **__: mesa.id)
 def definir_blinds(mesa: Mesa, jogadores: list[JogadorNaMesa], db: Session):
     print(">>> DEFININDO BLINDS ROTATIVOS")
 
-    if mesa.valor_minimo == 0.30:
-        small_blind_valor = 0.01
-        big_blind_valor = 0.02
-    else:
-        small_blind_valor = round(mesa.valor_minimo * 0.1, 2)
-        big_blind_valor = round(mesa.valor_minimo * 0.2, 2)
+    # Blinds vêm da configuração da mesa em memória (centavos)
+    config = obter_config(db, mesa.id)
+    small_blind_valor = config.small_blind
+    big_blind_valor = config.big_blind
+    if config.torneio_id is not None:
+        # Torneio: blinds do nível em vigor; a mesa guarda os valores pro histórico da mão
+        from game.torneios import blinds_do_torneio
+        small_blind_valor, big_blind_valor = blinds_do_torneio(db, config.torneio_id)
+        mesa.small_blind, mesa.big_blind = small_blind_valor, big_blind_valor
+
+    aposta_da_mesa = big_blind_valor
 
     jogadores_ordenados = sorted(jogadores, key=lambda j: j.id)
     ids = [j.id for j in jogadores_ordenados]
 
-    if mesa.small_blind_pos is None:
-        # Primeira rodada
+    if mesa.small_blind_pos not in ids:
+        # Primeira rodada (ou o small blind anterior trocou de mesa)
         small_index = 0
         big_index = 1 if len(jogadores) > 1 else 0
     else:
@@ -48,6 +70,11 @@ def definir_blinds(mesa: Mesa, jogadores: list[JogadorNaMesa], db: Session):
     jogador_small = jogadores_ordenados[small_index]
     jogador_big = jogadores_ordenados[big_index]
 
+    if config.torneio_id is not None:
+        # No torneio quem não cobre o blind fica all-in com o que tem
+        small_blind_valor = min(small_blind_valor, jogador_small.stack)
+        big_blind_valor = min(big_blind_valor, jogador_big.stack)
+
     if jogador_small.stack < small_blind_valor:
         raise HTTPException(status_code=400, detail="Small blind sem stack suficiente")
     if jogador_big.stack < big_blind_valor:
@@ -64,9 +91,7 @@ def definir_blinds(mesa: Mesa, jogadores: list[JogadorNaMesa], db: Session):
 
     mesa.small_blind_pos = jogador_small.id
     mesa.big_blind_pos = jogador_big.id
-    mesa.small_blind = small_blind_valor
-    mesa.big_blind = big_blind_valor
-    mesa.aposta_atual = big_blind_valor
+    mesa.aposta_atual = aposta_da_mesa
 
     db.add(mesa)
     db.commit()
@@ -102,7 +127,26 @@ def atualizar_vez(mesa: Mesa, jogadores: list[JogadorNaMesa], db: Session):
 
 
 
-def iniciar_partida(mesa: Mesa, jogadores_na_mesa: list[JogadorNaMesa], db: Session):
+def definir_primeiro_a_agir(mesa: Mesa, jogadores: list[JogadorNaMesa]):
+    # 🔁 Definir o jogador da vez corretamente (após o big blind e ativo)
+    jogadores_ordenados = sorted(jogadores, key=lambda j: j.id)
+    ids_ordenados = [j.id for j in jogadores_ordenados]
+
+    if mesa.big_blind_pos in ids_ordenados:
+        big_index = ids_ordenados.index(mesa.big_blind_pos)
+
+        for offset in range(1, len(jogadores_ordenados)):
+            idx = (big_index + offset) % len(jogadores_ordenados)
+            jogador = jogadores_ordenados[idx]
+            if not jogador.foldado and jogador.stack > 0:
+                mesa.jogador_da_vez_id = jogador.user_id
+                break
+    else:
+        mesa.jogador_da_vez_id = jogadores_ordenados[0].user_id  # fallback
+
+
+@rastreado("iniciar_partida", mesa=lambda mesa, *_, **__: mesa.id, inicia_mao=True)
+def iniciar_partida(mesa: Mesa, jogadores_na_mesa: list[JogadorNaMesa], db: Session, semente: int | None = None):
     mesa.status = MesaStatus.em_jogo
 
     # Agora já define blinds e aplica apostas corretas com rotação
@@ -110,8 +154,9 @@ def iniciar_partida(mesa: Mesa, jogadores_na_mesa: list[JogadorNaMesa], db: Sess
 
     mesa.estado_da_rodada = "pre-flop"
 
-    # Baralho e distribuição
-    baralho = embaralhar(criar_baralho())
+    # Baralho e distribuição (semente informada só no replay de mãos, game/replay.py)
+    semente = nova_semente() if semente is None else semente
+    baralho = baralho_da_semente(semente)
     jogadores_ids = [j.user_id for j in jogadores_na_mesa]
     mao_jogadores, baralho = distribuir_cartas(jogadores_ids, baralho)
     flop, turn, river, baralho = distribuir_comunidade(baralho)
@@ -120,21 +165,7 @@ def iniciar_partida(mesa: Mesa, jogadores_na_mesa: list[JogadorNaMesa], db: Sess
     mesa.turn = turn
     mesa.river = river
 
-    # 🔁 Definir o jogador da vez corretamente (após o big blind e ativo)
-    jogadores_ordenados = sorted(jogadores_na_mesa, key=lambda j: j.id)
-    ids_ordenados = [j.id for j in jogadores_ordenados]
-
-    if mesa.big_blind_pos in ids_ordenados:
-        big_index = ids_ordenados.index(mesa.big_blind_pos)
-
-        for offset in range(1, len(jogadores_ordenados)):
-            idx = (big_index + offset) % len(jogadores_ordenados)
-            jogador = jogadores_ordenados[idx]
-            if not jogador.foldado and jogador.stack > 0:
-                mesa.jogador_da_vez_id = jogador.user_id
-                break
-    else:
-        mesa.jogador_da_vez_id = jogadores_ordenados[0].user_id  # fallback
+    definir_primeiro_a_agir(mesa, jogadores_na_mesa)
 
     db.add(mesa)
 
@@ -143,6 +174,7 @@ def iniciar_partida(mesa: Mesa, jogadores_na_mesa: list[JogadorNaMesa], db: Sess
             jogador.cartas = json.dumps(mao_jogadores[jogador.user_id])
             db.add(jogador)
 
+    iniciar_mao(db, mesa, jogadores_na_mesa, "iniciar_partida", semente)
     db.commit()
 
     return {
@@ -150,7 +182,7 @@ def iniciar_partida(mesa: Mesa, jogadores_na_mesa: list[JogadorNaMesa], db: Sess
         "small_blind": mesa.small_blind_pos,
         "big_blind": mesa.big_blind_pos,
         "jogador_da_vez": mesa.jogador_da_vez_id,
-        "aposta_atual_mesa": mesa.aposta_atual,
+        "aposta_atual_mesa": centavos_para_reais(mesa.aposta_atual),
         "estado_da_rodada": mesa.estado_da_rodada,
         "maos": [{"user_id": str(user_id), "cartas": cartas} for user_id, cartas in mao_jogadores.items()],
         "flop": flop,
@@ -165,17 +197,19 @@ class ControladorDePartida:
         self.mesa = mesa
         self.jogadores = jogadores
         self.db = db
-        self.baralho = embaralhar(criar_baralho())
-        self.community_cards = []
+        self.baralho = None
+        # As cartas comunitárias da mão saem no início dela e ficam na mesa
+        self.community_cards = list(mesa.flop or []) + [c for c in (mesa.turn, mesa.river) if c]
         self.rodada_atual = "pre-flop"
         self.pote = 0
 
 
 
+    @rastreado("verificar_proxima_etapa", mesa=lambda self: self.mesa.id)
     def verificar_proxima_etapa(self):
         from datetime import datetime
 
-        self.jogadores = self.db.query(JogadorNaMesa).filter_by(mesa_id=self.mesa.id).all()
+        # self.jogadores já vem carregado por quem criou o controlador (sem reconsultar)
         jogadores_ativos = [j for j in self.jogadores if not j.foldado and j.stack >= 0]
 
         if len(jogadores_ativos) <= 1:
@@ -186,11 +220,8 @@ class ControladorDePartida:
             print(f"Jogador {j.user_id} | Foldado: {j.foldado} | Stack: {j.stack} | Aposta Atual: {j.aposta_atual} | Já Agiu: {j.rodada_ja_agiu}")
         print("--------------------------------------------------")
 
-        def iguais(valores):
-            return all(abs(v - valores[0]) < 0.001 for v in valores)
-
-        apostas = [j.aposta_atual for j in jogadores_ativos]
-        if not iguais(apostas):
+        # Apostas em centavos inteiros: comparação exata
+        if len({j.aposta_atual for j in jogadores_ativos}) > 1:
             return
 
         if not all(j.rodada_ja_agiu for j in jogadores_ativos):
@@ -211,7 +242,7 @@ class ControladorDePartida:
             print("✅ Todas as rodadas finalizadas. Showdown em breve.")
             self.mesa.jogador_da_vez_id = None
             self.db.add(self.mesa)
-            self.db.commit()
+            self.db.flush()
             self.realizar_showdown()
             return
 
@@ -219,18 +250,18 @@ class ControladorDePartida:
             j.rodada_ja_agiu = False
             self.db.add(j)
 
-        self.db.add(self.mesa)
-        self.db.commit()
-
         # Só define nova vez se ainda não for showdown
         if self.mesa.estado_da_rodada in ["flop", "turn", "river"]:
             ativos = [j for j in self.jogadores if not j.foldado and j.stack > 0]
             if ativos:
                 self.mesa.jogador_da_vez_id = ativos[0].user_id
-                self.db.add(self.mesa)
-                self.db.commit()
                 print(f"🎯 Nova rodada: vez do jogador {self.mesa.jogador_da_vez_id}")
 
+        # flush e não commit: o commit vem em avancar_vez, e commitar aqui expiraria
+        # mesa e jogadores, que seriam recarregados um a um logo em seguida
+        self.db.add(self.mesa)
+        self.db.flush()
+
 
 
 
@@ -258,6 +289,14 @@ class ControladorDePartida:
 
 
 
+    def ordem_a_partir_do_small_blind(self):
+        # user_ids na ordem da mesa começando pelo small blind (primeiro à esquerda do botão),
+        # usada pra decidir quem leva os centavos que sobram numa divisão de pote
+        ordenados = sorted(self.jogadores, key=lambda j: j.id)
+        ids = [j.id for j in ordenados]
+        inicio = ids.index(self.mesa.small_blind_pos) if self.mesa.small_blind_pos in ids else 0
+        return [j.user_id for j in ordenados[inicio:] + ordenados[:inicio]]
+
     def jogadores_ativos(self):
         return [j for j in self.jogadores if not j.foldado and j.stack >= 0]
 
@@ -273,20 +312,21 @@ class ControladorDePartida:
     def encerrar_partida_por_fold(self):
         vencedor = self.jogadores_ativos()[0]
         vencedor.stack += self.pote
-        print(f"🏆 Vitória por fold! Jogador {vencedor.user_id} leva o pote de R${self.pote:.2f}")
+        print(f"🏆 Vitória por fold! Jogador {vencedor.user_id} leva o pote de {formatar_reais(self.pote)}")
         return {
             "vencedores": [vencedor.user_id],
-            "pote": self.pote,
+            "pote": centavos_para_reais(self.pote),
             "motivo": "fold"
         }
 
+    @rastreado("realizar_showdown", mesa=lambda self: self.mesa.id)
     def realizar_showdown(self):
         print("💥 Showdown!")
 
         # 🔐 Garante que community_cards foram geradas
         if not self.community_cards:
             print("⚠️ Cartas comunitárias estavam vazias. Gerando agora...")
-            flop, turn, river, self.baralho = distribuir_comunidade(self.baralho)
+            flop, turn, river, self.baralho = distribuir_comunidade(self.baralho or embaralhar(criar_baralho()))
             self.community_cards = list(flop) + [turn, river]
             print("Cartas comunitárias geradas no showdown:", self.community_cards)
 
@@ -314,8 +354,10 @@ class ControladorDePartida:
                 "aposta": j.aposta_atual
             })
 
-        vencedores = determinar_vencedores(jogadores_info, self.community_cards)
-        ganhos = distribuir_pote(jogadores_info, vencedores)
+        with metricas.avaliador_duracao.medir():
+            vencedores = determinar_vencedores(jogadores_info, self.community_cards)
+        metricas.showdowns.inc()
+        ganhos = distribuir_pote(jogadores_info, vencedores, self.ordem_a_partir_do_small_blind())
 
         for jogador in jogadores:
             ganho = ganhos.get(jogador.user_id, 0)
@@ -324,18 +366,17 @@ class ControladorDePartida:
             jogador.aposta_atual = 0
             self.db.add(jogador)
 
+        finalizar_mao(self.db, self.mesa, self.jogadores, self.community_cards, vencedores, ganhos)
+
         self.db.add(self.mesa)  # ✅ Garante que o estado da mesa seja salvo
         self.db.commit()
 
         print(f"🏆 Vencedor(es): {vencedores}")
         print("✅ Fim do showdown. Pote distribuído e nova rodada será iniciada.")
 
-        # Inicia nova rodada automaticamente
-        self.nova_rodada()
-
-        return {
+        resultado = {
             "vencedores": vencedores,
-            "ganhos": ganhos,
+            "ganhos": {jogador_id: centavos_para_reais(valor) for jogador_id, valor in ganhos.items()},
             "cartas_comunitarias": self.community_cards,
             "maos": [
                 {
@@ -346,9 +387,22 @@ class ControladorDePartida:
             ]
         }
 
+        if self.mesa.torneio_id is not None:
+            # Elimina quem zerou e equilibra as mesas; com menos de dois aqui a mesa para
+            from game.torneios import encerrar_mao_de_torneio
+            self.jogadores = encerrar_mao_de_torneio(self.db, self.mesa, self.jogadores)
+            if len(self.jogadores) < 2:
+                return resultado
+
+        # Inicia nova rodada automaticamente
+        self.nova_rodada()
+
+        return resultado
+
     
 
-    def nova_rodada(self):
+    @rastreado("nova_rodada", mesa=lambda self, *_, **__: self.mesa.id, inicia_mao=True)
+    def nova_rodada(self, semente: int | None = None):
         print("🔄 Iniciando nova rodada!")
 
         # Resetar jogadores
@@ -361,8 +415,9 @@ class ControladorDePartida:
 
         self.db.commit()
 
-        # Redefinir baralho e community cards
-        self.baralho = embaralhar(criar_baralho())
+        # Redefinir baralho e community cards (semente informada só no replay)
+        semente = nova_semente() if semente is None else semente
+        self.baralho = baralho_da_semente(semente)
         self.community_cards = []
         self.pote = 0
 
@@ -383,12 +438,18 @@ class ControladorDePartida:
         print("FLOP, TURN E RIVER:", flop, turn, river)
         self.community_cards = list(flop) + [turn, river]
         print("Community cards set:", self.community_cards)
+        self.mesa.flop = flop
+        self.mesa.turn = turn
+        self.mesa.river = river
 
         # ⚠️ ESSENCIAL: Resetar os estados de exibição
         self.mesa.mostrar_turn = False
         self.mesa.mostrar_river = False
+        self.mesa.estado_da_rodada = "pre-flop"
+        definir_primeiro_a_agir(self.mesa, self.jogadores)
         self.db.add(self.mesa)
 
+        iniciar_mao(self.db, self.mesa, self.jogadores, "nova_rodada", semente)
         self.db.commit()
 
         print("🃏 Nova rodada pronta para começar!")
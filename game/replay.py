@@ -0,0 +1,276 @@
+import contextlib
+import os
+import statistics
+import sys
+import time
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+from db.database import Base
+from db.models import Mesa, MesaStatus, JogadorNaMesa, User, Mao, AcaoMao
+from db.dinheiro import centavos_para_reais
+from api.auth import UsuarioAutenticado
+from game.config_mesas import invalidar_config
+from game.partida import iniciar_partida, ControladorDePartida
+from game import acoes
+
+# Corpus de replay: mãos reais (semente do baralho + sequência de ações) num
+# arquivo JSON lines, uma mão por linha, pra rodar de novo no motor e conferir
+# que cartas, ações, vencedores, ganhos e stacks finais saem idênticos. Cada mão
+# roda numa mesa nova de um SQLite em memória e o tempo do motor (iniciar_partida
+# + ações) é medido por mão: serve de teste de regressão e de desempenho pra
+# mudanças em ControladorDePartida, distribuir_pote e no avaliador.
+#
+# Entram no corpus as mãos de mesa de dinheiro que chegaram ao showdown e têm
+# semente (gravada desde o snapshot das mesas) e início. Ficam de fora as
+# arquivadas (o Parquet não guarda a semente) e as em que agiu alguém que sentou
+# com a mão em andamento. Cada mão grava por onde começou (Mao.inicio): em
+# iniciar_partida (mesa que estava parada) ou dentro da última ação da anterior
+# (showdown, nova_rodada, avancar_vez), e o replay segue o mesmo caminho.
+#python -m game.replay capturar corpus.jsonl --limite 5000
+#python -m game.replay executar corpus.jsonl --repeticoes 3
+
+LOTE_CAPTURA = 1000
+
+
+def _linha_do_corpus(mao: Mao, acoes_da_mao: list[AcaoMao]) -> dict:
+    blinds = {a.acao: a.valor for a in acoes_da_mao if a.acao in ("small_blind", "big_blind")}
+    return {
+        "mao_id": mao.id,
+        "mesa_id": mao.mesa_id,
+        "numero": mao.numero,
+        "inicio": mao.inicio,
+        "semente": mao.semente,
+        "small_blind": blinds.get("small_blind"),
+        "big_blind": blinds.get("big_blind"),
+        "jogadores": mao.jogadores,
+        "acoes": [{"user_id": a.user_id, "acao": a.acao, "valor": a.valor, "rodada": a.rodada} for a in acoes_da_mao],
+        "vencedores": mao.vencedores,
+        "ganhos": mao.ganhos,
+        "stacks_finais": mao.stacks_finais,
+    }
+
+
+def capturar(db: Session, destino: str, mesa_id: int | None = None, limite: int | None = None) -> int:
+    """Grava no corpus as mãos elegíveis do banco, das mais antigas pras mais novas."""
+    consulta = (
+        db.query(Mao)
+        .join(Mesa, Mesa.id == Mao.mesa_id)
+        .filter(Mao.finalizada_em.isnot(None), Mao.vencedores.isnot(None), Mao.semente.isnot(None))
+        .filter(Mao.inicio.isnot(None))
+        .filter(Mesa.torneio_id.is_(None))
+        .order_by(Mao.id)
+    )
+    if mesa_id is not None:
+        consulta = consulta.filter(Mao.mesa_id == mesa_id)
+
+    gravadas = 0
+    ultimo_id = 0
+    with open(destino, "wb") as arquivo:
+        while True:
+            tamanho = LOTE_CAPTURA if limite is None else min(LOTE_CAPTURA, limite - gravadas)
+            maos = consulta.filter(Mao.id > ultimo_id).limit(tamanho).all()
+            if not maos:
+                break
+            por_mao: dict[int, list[AcaoMao]] = {}
+            for acao in db.query(AcaoMao).filter(AcaoMao.mao_id.in_([m.id for m in maos])).order_by(AcaoMao.id):
+                por_mao.setdefault(acao.mao_id, []).append(acao)
+            linhas = [
+                orjson.dumps(_linha_do_corpus(m, por_mao.get(m.id, []))) + b"\n"
+                for m in maos
+                if {a.user_id for a in por_mao.get(m.id, [])} <= {j["user_id"] for j in m.jogadores or []}
+            ]
+            arquivo.write(b"".join(linhas))
+            gravadas += len(linhas)
+            ultimo_id = maos[-1].id
+            if limite is not None and gravadas >= limite:
+                break
+    return gravadas
+
+
+def ler_corpus(origem: str):
+    with open(origem, "rb") as arquivo:
+        for linha in arquivo:
+            if linha.strip():
+                yield orjson.loads(linha)
+
+
+def criar_banco_em_memoria() -> sessionmaker:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def _preparar_mesa(db: Session, mao: dict) -> Mesa:
+    """Mesa nova com os jogadores na ordem dos assentos da mão e o botão antes do small blind gravado."""
+    usuarios_existentes = {u for (u,) in db.query(User.id).filter(User.id.in_([j["user_id"] for j in mao["jogadores"]]))}
+    for jogador in mao["jogadores"]:
+        if jogador["user_id"] not in usuarios_existentes:
+            uid = jogador["user_id"]
+            db.add(User(id=uid, username=f"replay{uid}", email=f"replay{uid}@replay", password="-"))
+
+    mesa = Mesa(
+        nome=f"Replay {mao['mao_id']}",
+        status=MesaStatus.aberta,
+        limite_jogadores=max(len(mao["jogadores"]), 2),
+        valor_minimo=0,
+        valor_minimo_aposta=0,
+        small_blind=mao["small_blind"],
+        big_blind=mao["big_blind"],
+    )
+    db.add(mesa)
+    db.flush()
+
+    assentos = []
+    for jogador in mao["jogadores"]:  # gravados em ordem de assento
+        assento = JogadorNaMesa(
+            mesa_id=mesa.id, user_id=jogador["user_id"], stack_inicial=jogador["stack_inicial"],
+            stack=jogador["stack_inicial"], saldo_restante=jogador["stack_inicial"],
+        )
+        db.add(assento)
+        assentos.append(assento)
+    db.flush()
+
+    # definir_blinds passa o small blind pro assento seguinte ao anterior
+    small_blind_user = next((a["user_id"] for a in mao["acoes"] if a["acao"] == "small_blind"), None)
+    ordem = [a.user_id for a in assentos]
+    if small_blind_user in ordem:
+        mesa.small_blind_pos = assentos[(ordem.index(small_blind_user) - 1) % len(assentos)].id
+    db.commit()
+    return mesa
+
+
+def _executar_acao(db: Session, mesa: Mesa, acao: dict):
+    usuario = UsuarioAutenticado(id=acao["user_id"], username=f"replay{acao['user_id']}", email="", is_admin=False)
+    if acao["acao"] == "raise":
+        # A rota recebe o aumento sobre a aposta da mesa; o histórico guarda o que entrou no pote
+        jogador = db.query(JogadorNaMesa).filter_by(mesa_id=mesa.id, user_id=acao["user_id"]).first()
+        aumento = jogador.aposta_atual + acao["valor"] - mesa.aposta_atual
+        return lambda: acoes.raise_aposta(mesa_id=mesa.id, valor=centavos_para_reais(aumento), db=db, current_user=usuario)
+    rota = {"call": acoes.call, "check": acoes.check, "allin": acoes.allin, "fold": acoes.fold}[acao["acao"]]
+    return lambda: rota(mesa_id=mesa.id, db=db, current_user=usuario)
+
+
+def _comparar(mao: dict, obtida: Mao | None, cartas: dict, acoes_obtidas: list[AcaoMao]) -> list[str]:
+    if obtida is None or obtida.finalizada_em is None:
+        return ["a mão não terminou"]
+    diferencas = []
+    esperadas = {j["user_id"]: j["cartas"] for j in mao["jogadores"]}
+    if cartas != esperadas:
+        diferencas.append(f"cartas: {cartas} != {esperadas}")
+    sequencia = [{"user_id": a.user_id, "acao": a.acao, "valor": a.valor, "rodada": a.rodada} for a in acoes_obtidas]
+    if sequencia != mao["acoes"]:
+        diferencas.append("sequência de ações diferente")
+    for campo in ("vencedores", "ganhos", "stacks_finais"):
+        if getattr(obtida, campo) != mao[campo]:
+            diferencas.append(f"{campo}: {getattr(obtida, campo)} != {mao[campo]}")
+    return diferencas
+
+
+def reproduzir_mao(fabrica: sessionmaker, mao: dict) -> tuple[float, list[str]]:
+    """Roda uma mão do corpus. Retorna o tempo do motor (s) e as diferenças encontradas."""
+    db = fabrica()
+    mesa = None
+    try:
+        mesa = _preparar_mesa(db, mao)
+        jogadores = db.query(JogadorNaMesa).filter_by(mesa_id=mesa.id).order_by(JogadorNaMesa.id).all()
+
+        inicio = time.perf_counter()
+        if mao["inicio"] == "iniciar_partida":
+            iniciar_partida(mesa, jogadores, db, semente=mao["semente"])
+        else:
+            mesa.status = MesaStatus.em_jogo
+            controlador = ControladorDePartida(mesa, jogadores, db)
+            controlador.nova_rodada(semente=mao["semente"])
+            controlador.avancar_vez()
+        tempo = time.perf_counter() - inicio
+        cartas = {j.user_id: orjson.loads(j.cartas or "[]") for j in jogadores}
+
+        apostas = [a for a in mao["acoes"] if a["acao"] not in ("small_blind", "big_blind")]
+        for n, acao in enumerate(apostas):
+            executar = _executar_acao(db, mesa, acao)
+            inicio = time.perf_counter()
+            try:
+                executar()
+            except HTTPException as erro:
+                # A última ação fecha a mão e já começa a seguinte; essa pode falhar
+                # (ex: blind sem stack) sem que a mão gravada mude
+                if n < len(apostas) - 1:
+                    return tempo, [f"ação {n + 1} ({acao['acao']} de {acao['user_id']}) recusada: {erro.detail}"]
+            finally:
+                tempo += time.perf_counter() - inicio
+
+        db.rollback()
+        obtida = db.query(Mao).filter_by(mesa_id=mesa.id, numero=1).first()
+        acoes_obtidas = db.query(AcaoMao).filter_by(mao_id=obtida.id).order_by(AcaoMao.id).all() if obtida else []
+        return tempo, _comparar(mao, obtida, cartas, acoes_obtidas)
+    finally:
+        db.close()
+        if mesa is not None:
+            invalidar_config(mesa.id)
+
+
+def executar_corpus(origem: str, repeticoes: int = 1) -> dict:
+    fabrica = criar_banco_em_memoria()
+    tempos: list[float] = []
+    divergentes: dict[int, list[str]] = {}
+    total = 0
+    # O motor escreve bastante no stdout; no replay isso só atrapalha a leitura
+    with open(os.devnull, "w") as nulo:
+        for mao in ler_corpus(origem):
+            total += 1
+            melhor = None
+            for _ in range(repeticoes):
+                with contextlib.redirect_stdout(nulo):
+                    tempo, diferencas = reproduzir_mao(fabrica, mao)
+                melhor = tempo if melhor is None else min(melhor, tempo)
+                if diferencas:
+                    divergentes[mao["mao_id"]] = diferencas
+                    break
+            tempos.append(melhor)
+
+    ordenados = sorted(tempos)
+    return {
+        "maos": total,
+        "divergentes": divergentes,
+        "tempo_total_ms": round(sum(tempos) * 1000, 2),
+        "media_ms": round(statistics.fmean(tempos) * 1000, 3) if tempos else 0,
+        "p50_ms": round(ordenados[len(ordenados) // 2] * 1000, 3) if tempos else 0,
+        "p95_ms": round(ordenados[int(len(ordenados) * 0.95)] * 1000, 3) if tempos else 0,
+        "max_ms": round(ordenados[-1] * 1000, 3) if tempos else 0,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    from db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Corpus de replay de mãos")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_capturar = sub.add_parser("capturar", help="grava as mãos do banco no corpus")
+    p_capturar.add_argument("corpus")
+    p_capturar.add_argument("--mesa", type=int)
+    p_capturar.add_argument("--limite", type=int)
+    p_executar = sub.add_parser("executar", help="reproduz o corpus e confere os resultados")
+    p_executar.add_argument("corpus")
+    p_executar.add_argument("--repeticoes", type=int, default=1, help="vale o menor tempo de cada mão")
+    args = parser.parse_args()
+
+    if args.comando == "capturar":
+        db = SessionLocal()
+        try:
+            print(f"📼 {capturar(db, args.corpus, args.mesa, args.limite)} mãos gravadas em {args.corpus}.")
+        finally:
+            db.close()
+    else:
+        resultado = executar_corpus(args.corpus, args.repeticoes)
+        for mao_id, diferencas in resultado["divergentes"].items():
+            print(f"❌ Mão {mao_id}: " + "; ".join(diferencas))
+        print(
+            f"{resultado['maos']} mãos, {len(resultado['divergentes'])} divergentes | motor: "
+            f"total {resultado['tempo_total_ms']} ms, média {resultado['media_ms']} ms, "
+            f"p50 {resultado['p50_ms']} ms, p95 {resultado['p95_ms']} ms, máx {resultado['max_ms']} ms"
+        )
+        sys.exit(1 if resultado["divergentes"] else 0)
@@ -0,0 +1,240 @@
+import fcntl
+import os
+import time
+from datetime import datetime
+from contextlib import contextmanager
+import orjson
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from db.database import BASE_DIR
+from db.models import Mesa, JogadorNaMesa, MesaStatus, Mao, AcaoMao
+from game.estado_mesa import marcar_alterada
+from game.partida import iniciar_partida
+
+# Snapshot das mesas em jogo, pra reinício rápido. A cada poucos segundos (e no
+# desligamento) o estado de toda mesa em jogo que esteja consistente vai pra um
+# arquivo JSON compacto, escrito em arquivo temporário e trocado atomicamente.
+# Cada mesa leva a mão em andamento, a semente do baralho (as cartas já saíram
+# todas no início da mão, nos jogadores e na mesa) e o id da última ação.
+#
+# Antes de o servidor subir, restaurar_mesas() confere as mesas em jogo no banco, em lote:
+#   - estado consistente: o banco é mais novo que o snapshot e fica como está
+#   - meio-estado (ex: caiu entre os commits de uma nova rodada) e o snapshot é
+#     da mesma mão com os mesmos jogadores: volta ao snapshot e descarta as ações
+#     registradas depois dele
+#   - sem snapshot utilizável: a mão é anulada, cada um recebe de volta o stack
+#     do início da mão e a mesa começa outra
+# O custo depende só de quantas mesas estão em jogo, não do tamanho do histórico.
+#
+# A restauração é um passo de pré-inicialização, rodado uma vez com os workers
+# parados, e não fica no lifespan: um worker reiniciado sozinho (o uvicorn sobe
+# outro quando um cai) pegaria no meio de uma nova rodada uma mesa que os outros
+# workers estão jogando e a voltaria ao snapshot ou anularia a mão.
+#python -m game.snapshot_mesas && uvicorn main:app --workers 4
+
+SNAPSHOT_DIR = os.path.join(BASE_DIR, "data", "snapshots")
+SNAPSHOT_ARQUIVO = os.path.join(SNAPSHOT_DIR, "mesas.json")
+SNAPSHOT_MESAS_INTERVALO_SEGUNDOS = 5
+
+CAMPOS_MESA = (
+    "aposta_atual", "small_blind_pos", "big_blind_pos", "small_blind", "big_blind", "flop", "turn", "river",
+    "estado_da_rodada", "mostrar_turn", "mostrar_river", "jogador_da_vez_id",
+)
+CAMPOS_JOGADOR = ("id", "user_id", "stack", "saldo_restante", "aposta_atual", "foldado", "rodada_ja_agiu", "cartas")
+
+
+def carregar_mesas_em_jogo(db: Session) -> list[tuple[Mesa, list[JogadorNaMesa], Mao | None, int | None]]:
+    """(mesa, jogadores, mão aberta, id da última ação) de todas as mesas em jogo, em quatro consultas."""
+    mesas = db.query(Mesa).filter(Mesa.status == MesaStatus.em_jogo).order_by(Mesa.id).all()
+    ids = [m.id for m in mesas]
+    if not ids:
+        return []
+
+    jogadores: dict[int, list[JogadorNaMesa]] = {}
+    for jogador in db.query(JogadorNaMesa).filter(JogadorNaMesa.mesa_id.in_(ids)).order_by(JogadorNaMesa.id):
+        jogadores.setdefault(jogador.mesa_id, []).append(jogador)
+
+    # A mão aberta mais recente de cada mesa (ix_maos_mesa_id_id)
+    ultimas = (
+        db.query(func.max(Mao.id))
+        .filter(Mao.mesa_id.in_(ids), Mao.finalizada_em.is_(None))
+        .group_by(Mao.mesa_id)
+    )
+    maos = {m.mesa_id: m for m in db.query(Mao).filter(Mao.id.in_(ultimas.scalar_subquery()))}
+    ultima_acao = dict(
+        db.query(AcaoMao.mao_id, func.max(AcaoMao.id))
+        .filter(AcaoMao.mao_id.in_([m.id for m in maos.values()]))
+        .group_by(AcaoMao.mao_id)
+        .all()
+    )
+
+    return [
+        (m, jogadores.get(m.id, []), maos.get(m.id), ultima_acao.get(maos[m.id].id) if m.id in maos else None)
+        for m in mesas
+    ]
+
+
+def estado_consistente(mesa: Mesa, jogadores: list[JogadorNaMesa], mao: Mao | None) -> bool:
+    """Invariantes de uma mesa no meio de uma mão, checadas sem ir ao banco."""
+    if mao is None or len(jogadores) < 2:
+        return False
+    if not mesa.flop or len(mesa.flop) != 3 or not mesa.turn or not mesa.river:
+        return False
+    na_mao = {j["user_id"] for j in mao.jogadores or []}
+    ativos = {j.user_id for j in jogadores if not j.foldado}
+    if mesa.jogador_da_vez_id not in ativos:
+        return False
+    for jogador in jogadores:
+        if jogador.user_id in na_mao and not jogador.foldado and len(orjson.loads(jogador.cartas or "[]")) != 2:
+            return False
+    return True
+
+
+def _snapshot_da_mesa(mesa: Mesa, jogadores: list[JogadorNaMesa], mao: Mao, ultima_acao_id: int | None) -> dict:
+    return {
+        "mesa_id": mesa.id,
+        **{campo: getattr(mesa, campo) for campo in CAMPOS_MESA},
+        "mao_id": mao.id,
+        "semente": mao.semente,
+        "ultima_acao_id": ultima_acao_id,
+        "jogadores": [{campo: getattr(j, campo) for campo in CAMPOS_JOGADOR} for j in jogadores],
+    }
+
+
+def gravar_snapshot_mesas(db: Session) -> int:
+    """Tarefa periódica. Mesas em meio-estado ficam com o snapshot anterior delas."""
+    anteriores = {m["mesa_id"]: m for m in ler_snapshot().get("mesas", [])}
+    mesas = []
+    for mesa, jogadores, mao, ultima_acao_id in carregar_mesas_em_jogo(db):
+        if estado_consistente(mesa, jogadores, mao):
+            mesas.append(_snapshot_da_mesa(mesa, jogadores, mao, ultima_acao_id))
+        elif mesa.id in anteriores:
+            mesas.append(anteriores[mesa.id])
+
+    conteudo = orjson.dumps({"gerado_em": datetime.utcnow().isoformat(), "mesas": mesas})
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    temporario = f"{SNAPSHOT_ARQUIVO}.{os.getpid()}.tmp"
+    with open(temporario, "wb") as arquivo:
+        arquivo.write(conteudo)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+    # Troca atômica: quem ler (ou um restart no meio) vê o arquivo antigo ou o novo inteiro
+    os.replace(temporario, SNAPSHOT_ARQUIVO)
+    return len(mesas)
+
+
+def ler_snapshot() -> dict:
+    try:
+        with open(SNAPSHOT_ARQUIVO, "rb") as arquivo:
+            return orjson.loads(arquivo.read())
+    except FileNotFoundError:
+        return {}
+    except orjson.JSONDecodeError:
+        print("⚠️ Snapshot das mesas ilegível, ignorando.")
+        return {}
+
+
+@contextmanager
+def _trava_de_restauracao():
+    # Duas restaurações ao mesmo tempo (ex: deploy disparado duas vezes): a segunda
+    # espera e encontra as mesas já consistentes
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(os.path.join(SNAPSHOT_DIR, ".trava"), "w") as trava:
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(trava, fcntl.LOCK_UN)
+
+
+def anular_mao(db: Session, mesa: Mesa, jogadores: list[JogadorNaMesa], mao: Mao | None) -> list[dict]:
+    """
+    Devolve a cada jogador o stack do início da mão (blinds inclusos), apaga a mão
+    do histórico e deixa a mesa esperando nova partida. Não faz commit; retorna o
+    UPDATE em lote dos jogadores pra quem chamou juntar com os das outras mesas.
+    """
+    inicio = {j["user_id"]: j["stack_inicial"] for j in (mao.jogadores if mao else None) or []}
+    if mao is not None:
+        db.query(AcaoMao).filter(AcaoMao.mao_id == mao.id).delete(synchronize_session=False)
+        db.delete(mao)
+
+    mesa.status = MesaStatus.aberta
+    mesa.aposta_atual = 0
+    mesa.jogador_da_vez_id = None
+    mesa.estado_da_rodada = "pre-flop"
+    mesa.mostrar_turn = False
+    mesa.mostrar_river = False
+    marcar_alterada(db, mesa.id)
+
+    trocas = []
+    for jogador in jogadores:
+        stack = inicio.get(jogador.user_id, jogador.stack + jogador.aposta_atual)
+        trocas.append({
+            "id": jogador.id, "stack": stack, "saldo_restante": stack, "aposta_atual": 0,
+            "foldado": False, "rodada_ja_agiu": False, "cartas": "[]",
+        })
+    return trocas
+
+
+def restaurar_mesas(db: Session, snapshot: dict | None = None) -> dict:
+    """Pré-inicialização, com os workers parados. Retorna quantas mesas caíram em cada caso."""
+    inicio = time.perf_counter()
+    with _trava_de_restauracao():
+        snapshot = ler_snapshot() if snapshot is None else snapshot
+        do_snapshot = {m["mesa_id"]: m for m in snapshot.get("mesas", [])}
+        resumo = {"consistentes": 0, "restauradas": 0, "anuladas": 0}
+        mesas_update, jogadores_update, recomecar = [], [], []
+
+        for mesa, jogadores, mao, _ in carregar_mesas_em_jogo(db):
+            if estado_consistente(mesa, jogadores, mao):
+                resumo["consistentes"] += 1
+                continue
+
+            salvo = do_snapshot.get(mesa.id)
+            if (
+                salvo is not None and mao is not None and salvo["mao_id"] == mao.id
+                and {j["id"] for j in salvo["jogadores"]} == {j.id for j in jogadores}
+            ):
+                mesas_update.append({"id": mesa.id, **{campo: salvo[campo] for campo in CAMPOS_MESA}})
+                jogadores_update.extend(salvo["jogadores"])
+                if salvo["ultima_acao_id"] is not None:
+                    db.query(AcaoMao).filter(
+                        AcaoMao.mao_id == mao.id, AcaoMao.id > salvo["ultima_acao_id"]
+                    ).delete(synchronize_session=False)
+                marcar_alterada(db, mesa.id)
+                resumo["restauradas"] += 1
+            else:
+                jogadores_update.extend(anular_mao(db, mesa, jogadores, mao))
+                if len(jogadores) >= 2:
+                    recomecar.append(mesa.id)
+                resumo["anuladas"] += 1
+
+        db.flush()
+        if mesas_update:
+            db.execute(update(Mesa), mesas_update)
+        if jogadores_update:
+            db.execute(update(JogadorNaMesa), jogadores_update)
+        db.commit()
+
+        # Mesas anuladas começam outra mão do zero
+        for mesa in db.query(Mesa).filter(Mesa.id.in_(recomecar)).all():
+            jogadores = db.query(JogadorNaMesa).filter_by(mesa_id=mesa.id).order_by(JogadorNaMesa.id).all()
+            iniciar_partida(mesa, jogadores, db)
+
+    print(
+        f"♻️ Mesas em jogo: {resumo['consistentes']} consistentes, {resumo['restauradas']} restauradas do snapshot, "
+        f"{resumo['anuladas']} com a mão anulada ({(time.perf_counter() - inicio) * 1000:.0f} ms)."
+    )
+    return resumo
+
+
+if __name__ == "__main__":
+    from db.database import SessionLocal
+    from game.config_mesas import carregar_configs
+
+    db = SessionLocal()
+    try:
+        carregar_configs(db)  # as mesas anuladas começam outra mão com a config delas
+        restaurar_mesas(db)
+    finally:
+        db.close()
@@ -0,0 +1,495 @@
+import math
+import random
+import threading
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException
+from typing import List
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from db.database import get_db
+from db.models import Mesa, JogadorNaMesa, MesaStatus, Torneio, InscricaoTorneio
+from db.dinheiro import centavos_para_reais, reais_para_centavos
+from api.auth import get_current_user, UsuarioAutenticado
+from api.admin import exigir_admin
+from api.carteira import lancar, debitar_usuario, conta_usuario, conta_torneio, SaldoInsuficiente
+from api.schemas import TorneioInput, TorneioOut, MensagemOut
+from game.config_mesas import obter_config
+from game.partida import iniciar_partida
+from game.estado_mesa import marcar_alterada
+
+# Torneios multi-mesa em cima de Mesa/JogadorNaMesa. Cada torneio abre as suas
+# mesas (mesas.torneio_id) e o jogo nelas é o mesmo das mesas de cash; o que muda:
+#   - blinds: definir_blinds pega o nível em vigor da estrutura, que sobe pelo relógio
+#   - eliminação: no fim de cada mão quem zerou sai e recebe a posição final
+#   - equilíbrio: depois de cada eliminação o BalanceadorDeMesas decide quem troca
+#     de mesa (quebra a menor mesa quando dá, senão nivela as contagens)
+#
+# Jogador só troca de mesa entre mãos: movimentos cuja origem está no meio de uma
+# mão ficam pendentes e saem no fim da mão dela. Todos os movimentos aplicados de
+# uma vez viram um único UPDATE em lote. O balanceador é por worker e é remontado
+# do banco quando falta (ex: restart), então um torneio deve ser servido por um
+# único worker de jogo.
+
+router = APIRouter(prefix="/torneios", tags=["Torneios"])
+
+# Percentual do prêmio por posição, pela quantidade de inscritos
+ESTRUTURA_DE_PREMIOS = [
+    (30, [40, 25, 15, 10, 6, 4]),
+    (10, [50, 30, 20]),
+    (6, [65, 35]),
+    (2, [100]),
+]
+
+
+class BalanceadorDeMesas:
+    """
+    Contagem de jogadores por mesa com as mesas agrupadas em baldes por contagem.
+    Como a contagem vai de 0 a jogadores_por_mesa, achar a mesa mais cheia ou a
+    mais vazia é olhar no máximo jogadores_por_mesa + 1 baldes, e mover alguém é
+    tirar de um balde e pôr no vizinho: o custo por eliminação não depende de
+    quantas mesas ou inscritos o torneio tem.
+    """
+
+    def __init__(self, jogadores_por_mesa: int):
+        self.jogadores_por_mesa = jogadores_por_mesa
+        self.contagem: dict[int, int] = {}
+        self.baldes: list[set[int]] = [set() for _ in range(jogadores_por_mesa + 1)]
+        self.total = 0
+        self.pendentes: dict[int, list[int]] = {}  # mesa de origem -> destinos, pra aplicar no fim da mão dela
+        self.chegando: dict[int, int] = {}  # mesa de destino -> jogadores a caminho (pendentes)
+        self.lock = threading.Lock()
+
+    def adicionar(self, mesa_id: int, jogadores: int):
+        self.contagem[mesa_id] = jogadores
+        self.baldes[jogadores].add(mesa_id)
+        self.total += jogadores
+
+    def _remover(self, mesa_id: int) -> int:
+        jogadores = self.contagem.pop(mesa_id)
+        self.baldes[jogadores].discard(mesa_id)
+        self.total -= jogadores
+        return jogadores
+
+    def _somar(self, mesa_id: int, delta: int):
+        atual = self.contagem[mesa_id]
+        self.baldes[atual].discard(mesa_id)
+        self.contagem[mesa_id] = atual + delta
+        self.baldes[atual + delta].add(mesa_id)
+        self.total += delta
+
+    def _menor(self) -> int:
+        return next(n for n, mesas in enumerate(self.baldes) if mesas)
+
+    def _maior(self) -> int:
+        return next(n for n in range(len(self.baldes) - 1, -1, -1) if self.baldes[n])
+
+    def eliminar(self, mesa_id: int):
+        """
+        A contagem de uma mesa com movimentos pendentes é só de quem fica nela (mesa
+        em quebra nem está mais na contagem). Se quem fica já acabou, o eliminado era
+        um dos que iam sair: o movimento é cancelado e o destino não o recebe mais.
+        """
+        if self.contagem.get(mesa_id, 0) > 0:
+            self._somar(mesa_id, -1)
+            return
+        destino = self.pendentes[mesa_id].pop()
+        if not self.pendentes[mesa_id]:
+            del self.pendentes[mesa_id]
+        self._descontar_chegada(destino)
+        self._somar(destino, -1)
+
+    def adiar(self, origem: int, destino: int):
+        """Movimento que só sai no fim da mão em andamento na origem."""
+        self.pendentes.setdefault(origem, []).append(destino)
+        self.chegando[destino] = self.chegando.get(destino, 0) + 1
+
+    def retirar_pendentes(self, origem: int) -> list[int]:
+        """Destinos dos movimentos pendentes da origem, que está entre mãos e vai aplicá-los."""
+        destinos = self.pendentes.pop(origem, [])
+        for destino in destinos:
+            self._descontar_chegada(destino)
+        return destinos
+
+    def _descontar_chegada(self, destino: int):
+        self.chegando[destino] -= 1
+        if not self.chegando[destino]:
+            del self.chegando[destino]
+
+    def _quebravel(self) -> int | None:
+        """A mesa mais vazia sem ninguém a caminho dela (quebrá-la perderia quem ainda vai chegar)."""
+        for mesas in self.baldes:
+            for mesa_id in mesas:
+                if mesa_id not in self.chegando:
+                    return mesa_id
+        return None
+
+    def balancear(self) -> list[tuple[int, int]]:
+        """Movimentos (mesa_origem, mesa_destino), um por jogador. Já conta como feitos."""
+        movimentos = []
+
+        # Quebra: se todo mundo cabe numa mesa a menos, esvazia a mais vazia
+        while len(self.contagem) > 1 and self.total <= (len(self.contagem) - 1) * self.jogadores_por_mesa:
+            origem = self._quebravel()
+            if origem is None:
+                break  # tenta de novo na próxima eliminação, quando os pendentes já chegaram
+            for _ in range(self._remover(origem)):
+                destino = next(iter(self.baldes[self._menor()]))
+                self._somar(destino, 1)
+                movimentos.append((origem, destino))
+
+        # Equilíbrio: mais cheia e mais vazia não podem diferir em mais de um
+        while self.contagem and self._maior() - self._menor() > 1:
+            origem = next(iter(self.baldes[self._maior()]))
+            destino = next(iter(self.baldes[self._menor()]))
+            self._somar(origem, -1)
+            self._somar(destino, 1)
+            movimentos.append((origem, destino))
+
+        return movimentos
+
+
+_balanceadores: dict[int, BalanceadorDeMesas] = {}
+_estruturas: dict[int, tuple[datetime, list[dict]]] = {}  # torneio_id -> (iniciado_em, niveis)
+_lock = threading.Lock()
+
+
+def _montar_balanceador(db: Session, torneio: Torneio) -> BalanceadorDeMesas:
+    balanceador = BalanceadorDeMesas(torneio.jogadores_por_mesa)
+    contagens = dict(
+        db.query(Mesa.id, func.count(JogadorNaMesa.id))
+        .outerjoin(JogadorNaMesa, JogadorNaMesa.mesa_id == Mesa.id)
+        .filter(Mesa.torneio_id == torneio.id, Mesa.status != MesaStatus.encerrada)
+        .group_by(Mesa.id)
+        .all()
+    )
+    for mesa_id, jogadores in contagens.items():
+        balanceador.adicionar(mesa_id, jogadores)
+    return balanceador
+
+
+def obter_balanceador(db: Session, torneio_id: int) -> BalanceadorDeMesas:
+    balanceador = _balanceadores.get(torneio_id)
+    if balanceador is not None:
+        return balanceador
+    with _lock:
+        if torneio_id not in _balanceadores:
+            torneio = db.query(Torneio).filter(Torneio.id == torneio_id).first()
+            _balanceadores[torneio_id] = _montar_balanceador(db, torneio)
+        return _balanceadores[torneio_id]
+
+
+def nivel_em_vigor(iniciado_em: datetime | None, niveis: list[dict], agora: datetime | None = None) -> tuple[int, int | None]:
+    """Índice do nível e segundos até o próximo (None no último, que vale até o fim)."""
+    if iniciado_em is None:
+        return 0, None
+    decorrido = ((agora or datetime.utcnow()) - iniciado_em).total_seconds()
+    fim = 0
+    for indice, nivel in enumerate(niveis[:-1]):
+        fim += nivel["duracao_segundos"]
+        if decorrido < fim:
+            return indice, math.ceil(fim - decorrido)
+    return len(niveis) - 1, None
+
+
+def blinds_do_torneio(db: Session, torneio_id: int) -> tuple[int, int]:
+    """Chamado por definir_blinds a cada mão. A estrutura não muda depois do início e fica em memória."""
+    estrutura = _estruturas.get(torneio_id)
+    if estrutura is None:
+        torneio = db.query(Torneio).filter(Torneio.id == torneio_id).first()
+        estrutura = (torneio.iniciado_em, torneio.niveis)
+        if torneio.iniciado_em is not None:
+            _estruturas[torneio_id] = estrutura
+    indice, _ = nivel_em_vigor(*estrutura)
+    nivel = estrutura[1][indice]
+    return nivel["small_blind"], nivel["big_blind"]
+
+
+def premios_por_posicao(inscritos: int, buy_in: int) -> list[int]:
+    """Prêmio em centavos de cada posição paga; o resto da divisão vai pro campeão."""
+    percentuais = next((p for minimo, p in ESTRUTURA_DE_PREMIOS if inscritos >= minimo), [100])
+    total = inscritos * buy_in
+    premios = [total * p // 100 for p in percentuais]
+    premios[0] += total - sum(premios)
+    return premios
+
+
+def _parar_se_vazia(db: Session, mesa_id: int, jogadores: int):
+    """Mesa com menos de dois volta a esperar jogadores; vazia é quebrada."""
+    if jogadores >= 2:
+        return
+    marcar_alterada(db, mesa_id)
+    db.query(Mesa).filter(Mesa.id == mesa_id).update({
+        Mesa.status: MesaStatus.encerrada if jogadores == 0 else MesaStatus.aberta,
+        Mesa.small_blind_pos: None,
+        Mesa.big_blind_pos: None,
+        Mesa.jogador_da_vez_id: None,
+        Mesa.aposta_atual: 0,
+    })
+
+
+def _aplicar_movimentos(db: Session, movimentos: list[tuple[int, int]]) -> list[int]:
+    """
+    Troca os jogadores de mesa num único UPDATE em lote. Quem chega numa mesa no meio
+    de uma mão entra foldado e joga a partir da próxima. Retorna as mesas de destino.
+    """
+    if not movimentos:
+        return []
+
+    origens = {origem for origem, _ in movimentos}
+    por_origem: dict[int, list[JogadorNaMesa]] = {}
+    for jogador in db.query(JogadorNaMesa).filter(JogadorNaMesa.mesa_id.in_(origens)).order_by(JogadorNaMesa.id.desc()):
+        por_origem.setdefault(jogador.mesa_id, []).append(jogador)
+
+    trocas = []
+    for origem, destino in movimentos:
+        if not por_origem.get(origem):
+            continue  # origem esvaziou por eliminação; a próxima rodada do balanceador corrige
+        jogador = por_origem[origem].pop(0)
+        trocas.append({
+            "id": jogador.id, "mesa_id": destino, "foldado": True, "aposta_atual": 0,
+            "rodada_ja_agiu": False, "cartas": "[]",
+        })
+
+    if trocas:
+        db.execute(update(JogadorNaMesa), trocas)
+        for mesa_id in origens | {t["mesa_id"] for t in trocas}:
+            marcar_alterada(db, mesa_id)
+
+    for origem in origens:
+        _parar_se_vazia(db, origem, len(por_origem.get(origem, [])))
+
+    db.commit()
+    print(f"🔀 {len(trocas)} jogadores trocaram de mesa.")
+    return sorted({t["mesa_id"] for t in trocas})
+
+
+def _iniciar_mesas_paradas(db: Session, mesa_ids: list[int]):
+    """Mesa de destino que estava esperando e agora tem dois ou mais começa a jogar."""
+    for mesa in db.query(Mesa).filter(Mesa.id.in_(mesa_ids), Mesa.status == MesaStatus.aberta).all():
+        jogadores = db.query(JogadorNaMesa).filter_by(mesa_id=mesa.id).order_by(JogadorNaMesa.id).all()
+        if len(jogadores) >= 2:
+            iniciar_partida(mesa, jogadores, db)
+
+
+def _finalizar_torneio(db: Session, torneio: Torneio, campeao: JogadorNaMesa):
+    agora = datetime.utcnow()
+    inscricoes = db.query(InscricaoTorneio).filter_by(torneio_id=torneio.id).all()
+    for inscricao in inscricoes:
+        if inscricao.user_id == campeao.user_id:
+            inscricao.posicao_final = 1
+            inscricao.eliminado_em = agora
+
+    premios = premios_por_posicao(len(inscricoes), torneio.buy_in)
+    for inscricao in inscricoes:
+        if inscricao.posicao_final and inscricao.posicao_final <= len(premios):
+            inscricao.premio = premios[inscricao.posicao_final - 1]
+            lancar(db, conta_torneio(torneio.id), conta_usuario(inscricao.user_id), inscricao.premio, "premio_torneio")
+
+    marcar_alterada(db, campeao.mesa_id)
+    db.query(Mesa).filter(Mesa.id == campeao.mesa_id).update({Mesa.status: MesaStatus.encerrada, Mesa.jogador_da_vez_id: None})
+    db.delete(campeao)
+    torneio.status = "finalizado"
+    torneio.finalizado_em = agora
+    db.commit()
+
+    with _lock:
+        _balanceadores.pop(torneio.id, None)
+        _estruturas.pop(torneio.id, None)
+    print(f"🏆 Torneio {torneio.nome} finalizado. Campeão: {campeao.user_id}")
+
+
+def encerrar_mao_de_torneio(db: Session, mesa: Mesa, jogadores: list[JogadorNaMesa]) -> list[JogadorNaMesa]:
+    """
+    Chamado no fim do showdown de uma mesa de torneio, antes da nova rodada.
+    Elimina quem zerou, equilibra as mesas e retorna quem continua nesta mesa
+    (menos de dois = a mesa não começa outra mão).
+    """
+    torneio = db.query(Torneio).filter(Torneio.id == mesa.torneio_id).first()
+    balanceador = obter_balanceador(db, torneio.id)
+    eliminados = sorted((j for j in jogadores if j.stack <= 0), key=lambda j: j.id)
+
+    with balanceador.lock:
+        if eliminados:
+            # Eliminados na mesma mão dividem as posições pela ordem do assento
+            agora = datetime.utcnow()
+            posicoes = {j.user_id: balanceador.total - i for i, j in enumerate(eliminados)}
+            for inscricao in db.query(InscricaoTorneio).filter(
+                InscricaoTorneio.torneio_id == torneio.id,
+                InscricaoTorneio.user_id.in_(posicoes),
+            ):
+                inscricao.posicao_final = posicoes[inscricao.user_id]
+                inscricao.eliminado_em = agora
+            for jogador in eliminados:
+                db.delete(jogador)
+                balanceador.eliminar(mesa.id)
+            print(f"💀 Torneio {torneio.nome}: {len(eliminados)} eliminado(s), restam {balanceador.total}.")
+
+        vivos = [j for j in jogadores if j.stack > 0]
+        if balanceador.total <= 1:
+            _finalizar_torneio(db, torneio, vivos[0])
+            return []
+
+        movimentos = balanceador.balancear() if eliminados else []
+        # Esta mesa está entre mãos: o que sai dela (agora ou de antes) vai já
+        agora_daqui = balanceador.retirar_pendentes(mesa.id)
+        paradas = {
+            id for (id,) in db.query(Mesa.id).filter(
+                Mesa.torneio_id == torneio.id, Mesa.status != MesaStatus.em_jogo
+            )
+        }
+        aplicar = [(mesa.id, destino) for destino in agora_daqui]
+        for origem, destino in movimentos:
+            if origem == mesa.id or origem in paradas:
+                aplicar.append((origem, destino))
+            else:
+                balanceador.adiar(origem, destino)
+
+    db.flush()  # a sessão não tem autoflush: os eliminados precisam sair antes das consultas abaixo
+    destinos = _aplicar_movimentos(db, aplicar)
+    continuam = db.query(JogadorNaMesa).filter_by(mesa_id=mesa.id).order_by(JogadorNaMesa.id).all()
+    _parar_se_vazia(db, mesa.id, len(continuam))
+    db.commit()
+    _iniciar_mesas_paradas(db, [d for d in destinos if d != mesa.id])
+
+    return continuam
+
+
+def _torneio_out(db: Session, torneio: Torneio) -> dict:
+    indice, proximo = nivel_em_vigor(torneio.iniciado_em, torneio.niveis)
+    nivel = torneio.niveis[indice]
+    inscritos, restantes = db.query(
+        func.count(InscricaoTorneio.id), func.count(InscricaoTorneio.id) - func.count(InscricaoTorneio.posicao_final)
+    ).filter(InscricaoTorneio.torneio_id == torneio.id).one()
+    mesas = (
+        db.query(Mesa.id, func.count(JogadorNaMesa.id))
+        .join(JogadorNaMesa, JogadorNaMesa.mesa_id == Mesa.id)
+        .filter(Mesa.torneio_id == torneio.id)
+        .group_by(Mesa.id)
+        .all()
+    )
+    return {
+        "id": torneio.id,
+        "nome": torneio.nome,
+        "status": torneio.status,
+        "buy_in": centavos_para_reais(torneio.buy_in),
+        "stack_inicial": centavos_para_reais(torneio.stack_inicial),
+        "inscritos": inscritos,
+        "restantes": restantes,
+        "nivel": indice + 1,
+        "small_blind": centavos_para_reais(nivel["small_blind"]),
+        "big_blind": centavos_para_reais(nivel["big_blind"]),
+        "proximo_nivel_em": proximo if torneio.status == "em_andamento" else None,
+        "mesas": {str(mesa_id): jogadores for mesa_id, jogadores in mesas},
+    }
+
+
+@router.post("", response_model=TorneioOut)
+def criar_torneio(dados: TorneioInput, db: Session = Depends(get_db), admin: UsuarioAutenticado = Depends(exigir_admin)):
+    if not dados.niveis:
+        raise HTTPException(status_code=400, detail="O torneio precisa de ao menos um nível de blinds.")
+    torneio = Torneio(
+        nome=dados.nome,
+        buy_in=reais_para_centavos(dados.buy_in),
+        stack_inicial=reais_para_centavos(dados.stack_inicial),
+        jogadores_por_mesa=dados.jogadores_por_mesa,
+        niveis=[
+            {
+                "small_blind": reais_para_centavos(n.small_blind),
+                "big_blind": reais_para_centavos(n.big_blind),
+                "duracao_segundos": n.duracao_minutos * 60,
+            }
+            for n in dados.niveis
+        ],
+    )
+    db.add(torneio)
+    db.commit()
+    return _torneio_out(db, torneio)
+
+
+@router.get("", response_model=List[TorneioOut])
+def listar_torneios(db: Session = Depends(get_db)):
+    return [_torneio_out(db, t) for t in db.query(Torneio).order_by(Torneio.id.desc()).limit(50)]
+
+
+@router.get("/{torneio_id}", response_model=TorneioOut)
+def ver_torneio(torneio_id: int, db: Session = Depends(get_db)):
+    torneio = db.query(Torneio).filter(Torneio.id == torneio_id).first()
+    if not torneio:
+        raise HTTPException(status_code=404, detail="Torneio não encontrado.")
+    return _torneio_out(db, torneio)
+
+
+@router.post("/{torneio_id}/inscrever", response_model=MensagemOut)
+def inscrever(torneio_id: int, db: Session = Depends(get_db), current_user: UsuarioAutenticado = Depends(get_current_user)):
+    torneio = db.query(Torneio).filter(Torneio.id == torneio_id).first()
+    if not torneio:
+        raise HTTPException(status_code=404, detail="Torneio não encontrado.")
+    if torneio.status != "inscricoes":
+        raise HTTPException(status_code=400, detail="Inscrições encerradas.")
+    if db.query(InscricaoTorneio).filter_by(torneio_id=torneio_id, user_id=current_user.id).first():
+        raise HTTPException(status_code=400, detail="Você já está inscrito.")
+
+    try:
+        debitar_usuario(db, current_user.id, conta_torneio(torneio_id), torneio.buy_in, "buy_in_torneio")
+    except SaldoInsuficiente:
+        raise HTTPException(status_code=400, detail="Saldo insuficiente para o buy-in.")
+    db.add(InscricaoTorneio(torneio_id=torneio_id, user_id=current_user.id))
+    db.commit()
+    return {"msg": f"Inscrição no torneio {torneio.nome} confirmada."}
+
+
+@router.post("/{torneio_id}/iniciar", response_model=TorneioOut)
+def iniciar_torneio(torneio_id: int, db: Session = Depends(get_db), admin: UsuarioAutenticado = Depends(exigir_admin)):
+    torneio = db.query(Torneio).filter(Torneio.id == torneio_id).first()
+    if not torneio:
+        raise HTTPException(status_code=404, detail="Torneio não encontrado.")
+    if torneio.status != "inscricoes":
+        raise HTTPException(status_code=400, detail="Torneio já iniciado.")
+
+    inscritos = [i.user_id for i in db.query(InscricaoTorneio).filter_by(torneio_id=torneio_id)]
+    if len(inscritos) < 2:
+        raise HTTPException(status_code=400, detail="São necessários ao menos dois inscritos.")
+    random.shuffle(inscritos)
+
+    # Sorteio dos assentos: o mínimo de mesas, distribuindo um a um pra ficarem equilibradas
+    nivel = torneio.niveis[0]
+    quantidade = math.ceil(len(inscritos) / torneio.jogadores_por_mesa)
+    mesas = [
+        Mesa(
+            nome=f"{torneio.nome} - Mesa {i + 1}",
+            status=MesaStatus.aberta,
+            limite_jogadores=torneio.jogadores_por_mesa,
+            valor_minimo=0,
+            valor_minimo_aposta=0,
+            small_blind=nivel["small_blind"],
+            big_blind=nivel["big_blind"],
+            torneio_id=torneio.id,
+        )
+        for i in range(quantidade)
+    ]
+    db.add_all(mesas)
+    db.flush()
+
+    db.add_all(
+        JogadorNaMesa(
+            mesa_id=mesas[i % quantidade].id,
+            user_id=user_id,
+            stack_inicial=torneio.stack_inicial,
+            saldo_restante=torneio.stack_inicial,
+            stack=torneio.stack_inicial,
+        )
+        for i, user_id in enumerate(inscritos)
+    )
+    torneio.status = "em_andamento"
+    torneio.iniciado_em = datetime.utcnow()
+    db.commit()
+
+    for mesa in mesas:
+        obter_config(db, mesa.id)
+        jogadores = db.query(JogadorNaMesa).filter_by(mesa_id=mesa.id).order_by(JogadorNaMesa.id).all()
+        iniciar_partida(mesa, jogadores, db)
+
+    with _lock:
+        _balanceadores[torneio.id] = _montar_balanceador(db, torneio)
+    print(f"🏁 Torneio {torneio.nome} iniciado com {len(inscritos)} jogadores em {quantidade} mesas.")
+    return _torneio_out(db, torneio)
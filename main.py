@@ -1,8 +1,72 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi.responses import Response
 from fastapi.openapi.utils import get_openapi
 from routers.routes import router
+from db.tarefas import executar_periodicamente, executar_com_sessao
+from api.carteira import gerar_snapshots, SNAPSHOT_INTERVALO_SEGUNDOS
+from game.arquivo_maos import arquivar_e_podar, ARQUIVAMENTO_INTERVALO_SEGUNDOS
+from game.config_mesas import carregar_configs, CONFIG_INTERVALO_SEGUNDOS
+from game.assentos import carregar_indice_assentos, ASSENTOS_INTERVALO_SEGUNDOS
+from db.database import engine
+from api.metricas import MiddlewareDeMetricas, instrumentar_engine, gerar_texto, CONTENT_TYPE
+from api import perfil_sql, rastreamento
+from api.gateway import get_gateway
+from api.fila_ipn import executar_fila_ipn
+from api.pedidos_pagamento import executar_despachante
+from game.estatisticas import descarregar_estatisticas, ESTATISTICAS_INTERVALO_SEGUNDOS
+from game.snapshot_mesas import gravar_snapshot_mesas, SNAPSHOT_MESAS_INTERVALO_SEGUNDOS
+
+
+# Tarefas de fundo que vivem junto com o servidor. Roda em cada worker, inclusive
+# num que o uvicorn reinicia sozinho: a restauração das mesas depois de uma queda
+# é um passo à parte, antes de subir (python -m game.snapshot_mesas)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    executar_com_sessao(carregar_configs)
+    executar_com_sessao(carregar_indice_assentos)
+
+    tarefas = [
+        asyncio.create_task(executar_periodicamente(gerar_snapshots, SNAPSHOT_INTERVALO_SEGUNDOS)),
+        asyncio.create_task(executar_periodicamente(arquivar_e_podar, ARQUIVAMENTO_INTERVALO_SEGUNDOS)),
+        asyncio.create_task(executar_fila_ipn()),
+        asyncio.create_task(executar_despachante()),
+        asyncio.create_task(executar_periodicamente(carregar_configs, CONFIG_INTERVALO_SEGUNDOS)),
+        asyncio.create_task(executar_periodicamente(carregar_indice_assentos, ASSENTOS_INTERVALO_SEGUNDOS)),
+        asyncio.create_task(executar_periodicamente(descarregar_estatisticas, ESTATISTICAS_INTERVALO_SEGUNDOS)),
+        asyncio.create_task(executar_periodicamente(gravar_snapshot_mesas, SNAPSHOT_MESAS_INTERVALO_SEGUNDOS)),
+    ]
+    if rastreamento.ATIVO:
+        tarefas.append(asyncio.create_task(rastreamento.executar_exportador()))
+    yield
+    for tarefa in tarefas:
+        tarefa.cancel()
+    executar_com_sessao(descarregar_estatisticas)  # o que ainda estava só em memória
+    executar_com_sessao(gravar_snapshot_mesas)
+    rastreamento.exportar_spans()
+    await get_gateway().fechar()
+
+
+# orjson como serializador padrão das respostas
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# Métricas do worker pro Prometheus (api/metricas.py)
+app.add_middleware(MiddlewareDeMetricas)
+instrumentar_engine(engine)
+
+# Perfil de SQL por request, só com PANO_PERFIL_SQL setado (api/perfil_sql.py)
+perfil_sql.instalar(app, engine)
+
+# Spans do ciclo de vida das mãos, só com PANO_TRACE_AMOSTRAGEM > 0 (api/rastreamento.py)
+rastreamento.instalar(engine)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(gerar_texto(), media_type=CONTENT_TYPE)
 
-app = FastAPI()
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,56 @@
+from db.database import Base, engine
+import db.models  # registra as tabelas no metadata
+
+# Migração única: converte as colunas de dinheiro de FLOAT (reais) pra INTEGER (centavos).
+# O SQLite não altera tipo de coluna, então cada tabela é recriada com o schema
+# atual dos models e os dados são copiados convertendo os valores.
+# O saldo antigo de users.balance é tratado pelo migrar_ledger.py.
+#python migrar_centavos.py
+
+COLUNAS_MONETARIAS = {
+    "transactions": ["valor", "saldo_restante"],
+    "mesas": ["valor_minimo_aposta", "valor_minimo", "aposta_atual", "small_blind", "big_blind"],
+    "jogadores_na_mesa": ["stack_inicial", "saldo_restante", "aposta_atual", "stack"],
+    "side_pots": ["valor"],
+}
+
+with engine.begin() as conn:
+    conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+    # Sem isso o RENAME reescreve as FKs das outras tabelas pra apontar pra tabela antiga
+    conn.exec_driver_sql("PRAGMA legacy_alter_table=ON")
+
+    for tabela in Base.metadata.sorted_tables:
+        monetarias = COLUNAS_MONETARIAS.get(tabela.name)
+        if not monetarias:
+            continue
+
+        info = conn.exec_driver_sql(f"PRAGMA table_info({tabela.name})").fetchall()
+        tipos = {linha[1]: linha[2].upper() for linha in info}
+        if not tipos:
+            print(f"Tabela {tabela.name} não existe, pulando.")
+            continue
+        if all(tipos.get(coluna) == "INTEGER" for coluna in monetarias if coluna in tipos):
+            print(f"Tabela {tabela.name} já está em centavos.")
+            continue
+
+        for indice in conn.exec_driver_sql(f"PRAGMA index_list({tabela.name})").fetchall():
+            if not indice[1].startswith("sqlite_autoindex"):
+                conn.exec_driver_sql(f"DROP INDEX {indice[1]}")
+
+        antiga = f"{tabela.name}_reais"
+        conn.exec_driver_sql(f"ALTER TABLE {tabela.name} RENAME TO {antiga}")
+        tabela.create(conn)
+
+        colunas = [c.name for c in tabela.columns if c.name in tipos]
+        origem = [
+            f"CAST(ROUND({c} * 100) AS INTEGER)" if c in monetarias else c
+            for c in colunas
+        ]
+        conn.exec_driver_sql(
+            f"INSERT INTO {tabela.name} ({', '.join(colunas)}) "
+            f"SELECT {', '.join(origem)} FROM {antiga}"
+        )
+        conn.exec_driver_sql(f"DROP TABLE {antiga}")
+        print(f"Tabela {tabela.name} convertida para centavos.")
+
+print("Migração concluída!")
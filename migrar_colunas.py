@@ -0,0 +1,28 @@
+from db.database import Base, engine
+import db.models  # registra as tabelas no metadata
+
+# Colunas adicionadas a tabelas que já existiam: create_all cria as tabelas
+# novas, mas não altera as existentes. Pode rodar quantas vezes quiser.
+#python migrar_colunas.py
+
+COLUNAS_NOVAS = [
+    ("mesas", "torneio_id", "INTEGER REFERENCES torneios(id)", "ix_mesas_torneio_id"),
+    ("maos", "semente", "INTEGER", None),
+    ("notificacoes_ipn", "proxima_tentativa_em", "DATETIME", None),
+    ("pedidos_pagamento", "proxima_tentativa_em", "DATETIME", None),
+    ("mesas", "versao", "INTEGER NOT NULL DEFAULT 0", None),
+    ("maos", "inicio", "VARCHAR", None),
+]
+
+Base.metadata.create_all(bind=engine)
+
+with engine.begin() as conn:
+    for tabela, coluna, tipo, indice in COLUNAS_NOVAS:
+        colunas = {linha[1] for linha in conn.exec_driver_sql(f"PRAGMA table_info({tabela})")}
+        if coluna in colunas:
+            print(f"Coluna {tabela}.{coluna} já existe.")
+            continue
+        conn.exec_driver_sql(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}")
+        if indice:
+            conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {indice} ON {tabela} ({coluna})")
+        print(f"Coluna {tabela}.{coluna} criada.")
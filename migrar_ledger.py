@@ -0,0 +1,37 @@
+from db.database import Base, SessionLocal, engine
+from db.models import Lancamento
+from api.carteira import lancar, conta_usuario, CONTA_BONUS
+from db.dinheiro import reais_para_centavos
+
+# Migração única: leva o saldo guardado em users.balance pro livro-razão como
+# lançamento de abertura e remove a coluna antiga. Pode rodar antes ou depois
+# do migrar_centavos.py (a coluna é convertida de reais se ainda for FLOAT).
+#python migrar_ledger.py
+
+Base.metadata.create_all(bind=engine)
+
+db = SessionLocal()
+
+colunas = {linha[1]: linha[2].upper() for linha in db.connection().exec_driver_sql("PRAGMA table_info(users)")}
+
+if "balance" not in colunas:
+    print("Coluna users.balance não existe mais, nada a migrar.")
+else:
+    em_reais = colunas["balance"] != "INTEGER"
+    saldos = db.connection().exec_driver_sql("SELECT id, balance FROM users WHERE balance IS NOT NULL").fetchall()
+
+    abertos = 0
+    for user_id, balance in saldos:
+        valor = reais_para_centavos(balance) if em_reais else int(balance)
+        referencia = f"abertura:{user_id}"
+        if valor <= 0 or db.query(Lancamento).filter_by(referencia=referencia).first():
+            continue
+        lancar(db, CONTA_BONUS, conta_usuario(user_id), valor, "abertura", referencia=referencia)
+        abertos += 1
+
+    db.commit()
+    db.connection().exec_driver_sql("ALTER TABLE users DROP COLUMN balance")
+    db.commit()
+    print(f"{abertos} saldos levados para o livro-razão e coluna balance removida.")
+
+db.close()
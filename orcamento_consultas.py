@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+
+# Confere o orçamento de consultas SQL das rotas de leitura contra o banco local,
+# com o perfil em modo estrito (api/perfil_sql.py). Sai com código 1 se alguma
+# rota passar do orçamento, então serve de gate no benchmark/CI.
+#python orcamento_consultas.py
+#python orcamento_consultas.py --usuario mk --senha 123
+
+os.environ["PANO_PERFIL_SQL"] = "estrito"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Orçamento de consultas SQL por rota")
+    parser.add_argument("--usuario")
+    parser.add_argument("--senha")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+    from api import perfil_sql
+
+    falhas = []
+    with TestClient(app_main.app, raise_server_exceptions=False) as c:
+        def get(url, **kwargs):
+            r = c.get(url, **kwargs)
+            if r.status_code >= 500:
+                falhas.append(f"GET {url} -> {r.status_code}")
+            return r
+
+        for _ in range(args.repeticoes):
+            mesas = get("/lobby/mesas").json()
+            get("/lobby/disponiveis")
+            for mesa in mesas if isinstance(mesas, list) else []:
+                for sufixo in ("vez", "jogadores", "cartas_comunitarias"):
+                    get(f"/mesas/{mesa['id']}/{sufixo}")
+
+            if args.usuario:
+                token = c.post("/login", json={"username": args.usuario, "password": args.senha}).json()["access_token"]
+                headers = {"Authorization": f"Bearer {token}"}
+                get("/balance", headers=headers)
+                get("/historico/", headers=headers)
+
+    print(f"{'rota':40} {'req':>5} {'média':>7} {'máx':>5} {'orçamento':>10}")
+    for rota, dados in perfil_sql.relatorio.gerar().items():
+        marca = "  <-- estourou" if dados["acima_do_orcamento"] else ""
+        if dados["acima_do_orcamento"]:
+            falhas.append(f"{rota} passou de {dados['orcamento']} consultas")
+        print(f"{rota:40} {dados['requisicoes']:>5} {dados['media_consultas']:>7} {dados['max_consultas']:>5} {dados['orcamento']:>10}{marca}")
+        for sql, n in dados["n_mais_1"].items():
+            print(f"    N+1? {n}x {sql[:100]}")
+
+    if falhas:
+        print("\nFalhas:")
+        for falha in falhas:
+            print(" ", falha)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Relatório de tempo de inicialização: quanto cada módulo custa pra importar
+# (python -X importtime) e quanto o app leva pra subir, incluindo o lifespan.
+#python perfil_inicializacao.py --top 20
+#PANO_MODULOS=jogo python perfil_inicializacao.py
+
+CODIGO_STARTUP = """
+import time
+inicio = time.perf_counter()
+import main
+importado = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app):
+    pronto = time.perf_counter()
+print(f"STARTUP {importado - inicio:.4f} {pronto - importado:.4f}")
+"""
+
+
+def medir_imports(top: int):
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True, text=True, env=os.environ.copy(),
+    )
+    if resultado.returncode != 0:
+        print(resultado.stderr)
+        sys.exit(1)
+
+    modulos = []
+    for linha in resultado.stderr.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, cumulativo, nome = linha[len("import time:"):].split("|")
+        modulos.append((nome.strip(), int(proprio), int(cumulativo)))
+
+    total_us = next((c for nome, _, c in modulos if nome == "main"), 0)
+    print(f"Import de main: {total_us / 1000:.1f} ms, {len(modulos)} módulos carregados\n")
+
+    print(f"Top {top} por tempo acumulado (ms):")
+    for nome, _, cumulativo in sorted(modulos, key=lambda m: m[2], reverse=True)[:top]:
+        print(f"  {cumulativo / 1000:9.1f}  {nome}")
+
+    print(f"\nTop {top} por tempo próprio (ms):")
+    for nome, proprio, _ in sorted(modulos, key=lambda m: m[1], reverse=True)[:top]:
+        print(f"  {proprio / 1000:9.1f}  {nome}")
+
+    pesados = ["httpx", "passlib", "pyarrow", "numpy"]
+    carregados = {nome for nome, _, _ in modulos}
+    print("\nMódulos pesados carregados no import:", [p for p in pesados if p in carregados] or "nenhum")
+
+
+def medir_startup(repeticoes: int):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = subprocess.run(
+            [sys.executable, "-c", CODIGO_STARTUP], capture_output=True, text=True, env=os.environ.copy()
+        )
+        total = time.perf_counter() - inicio
+        linha = next((l for l in resultado.stdout.splitlines() if l.startswith("STARTUP")), None)
+        if linha is None:
+            print(resultado.stderr)
+            sys.exit(1)
+        _, importado, lifespan = linha.split()
+        tempos.append((total, float(importado), float(lifespan)))
+
+    tempos.sort()
+    total, importado, lifespan = tempos[len(tempos) // 2]
+    print(f"\nStartup (mediana de {repeticoes}): processo {total * 1000:.0f} ms | "
+          f"import {importado * 1000:.0f} ms | lifespan {lifespan * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perfil de inicialização do PanoPoker")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"PANO_MODULOS={os.getenv('PANO_MODULOS', '(todos)')}\n")
+    medir_imports(args.top)
+    medir_startup(args.repeticoes)
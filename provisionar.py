@@ -0,0 +1,118 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import insert
+from db.database import SessionLocal
+from db.models import Mesa, MesaStatus, User
+from db.dinheiro import reais_para_centavos
+from api.auth import hash_password
+from api.carteira import lancar_em_lote, conta_usuario, CONTA_BONUS
+
+# Provisionamento em massa pra staging e teste de carga: mesas a partir de um
+# arquivo de configuração e usuários com saldo inicial, tudo com INSERT em lote.
+# O bcrypt dos usuários roda num pool de processos, um lote por vez; cada lote é
+# commitado junto com os saldos, então rodar de novo continua de onde parou e
+# pula o que já existe (mesas pelo nome, usuários pelo username).
+# Pra carga, PANO_BCRYPT_ROUNDS baixo deixa o hash bem mais rápido.
+#python provisionar.py provisionamento.exemplo.json
+#python provisionar.py provisionamento.exemplo.json --so usuarios --processos 8
+#
+# Formato do arquivo (valores em reais):
+# {
+#   "mesas": [{"nome": "Bronze", "quantidade": 500, "limite_jogadores": 6,
+#              "small_blind": 0.01, "big_blind": 0.02, "buy_in": 0.30}],
+#   "usuarios": {"prefixo": "carga", "quantidade": 20000, "senha": "123",
+#                "dominio": "carga.pano.com", "saldo": 100}
+# }
+# A senha pode usar {n} (número do usuário) pra cada um ter a sua.
+
+LOTE_USUARIOS = 1000
+
+
+def provisionar_mesas(db, modelos: list[dict]) -> int:
+    existentes = {nome for (nome,) in db.query(Mesa.nome)}
+    novas = []
+    for modelo in modelos:
+        for n in range(1, modelo["quantidade"] + 1):
+            nome = f"{modelo['nome']} {n}"
+            if nome in existentes:
+                continue
+            buy_in = reais_para_centavos(modelo["buy_in"])
+            novas.append({
+                "nome": nome,
+                "status": MesaStatus.aberta,
+                "limite_jogadores": modelo.get("limite_jogadores", 6),
+                "tipo_jogo": modelo.get("tipo_jogo", "Texas Hold'em"),
+                "valor_minimo": buy_in,
+                "valor_minimo_aposta": buy_in,
+                "small_blind": reais_para_centavos(modelo["small_blind"]),
+                "big_blind": reais_para_centavos(modelo["big_blind"]),
+            })
+
+    if novas:
+        db.execute(insert(Mesa), novas)
+        db.commit()
+    print(f"🃏 Mesas: {len(novas)} criadas, {sum(m['quantidade'] for m in modelos) - len(novas)} já existiam.")
+    return len(novas)
+
+
+def _hash(senha: str) -> str:
+    return hash_password(senha)
+
+
+def provisionar_usuarios(db, config: dict, processos: int) -> int:
+    prefixo = config["prefixo"]
+    quantidade = config["quantidade"]
+    dominio = config.get("dominio", "carga.pano.com")
+    saldo = reais_para_centavos(config.get("saldo", 0))
+    senha = config.get("senha", "123")
+
+    existentes = {u for (u,) in db.query(User.username).filter(User.username.like(f"{prefixo}%"))}
+    faltando = [n for n in range(1, quantidade + 1) if f"{prefixo}{n}" not in existentes]
+    print(f"👤 Usuários: {quantidade - len(faltando)} já existiam, {len(faltando)} a criar com {processos} processos.")
+    if not faltando:
+        return 0
+
+    inicio = time.perf_counter()
+    criados = 0
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        for i in range(0, len(faltando), LOTE_USUARIOS):
+            lote = faltando[i:i + LOTE_USUARIOS]
+            hashes = pool.map(_hash, [senha.format(n=n) for n in lote], chunksize=max(1, len(lote) // (processos * 4)))
+            linhas = [
+                {"username": f"{prefixo}{n}", "email": f"{prefixo}{n}@{dominio}", "password": h, "is_admin": False}
+                for n, h in zip(lote, hashes)
+            ]
+            ids = db.execute(insert(User).returning(User.id), linhas).scalars().all()
+            if saldo > 0:
+                lancar_em_lote(db, [(CONTA_BONUS, conta_usuario(user_id), saldo, "bonus", None) for user_id in ids])
+            db.commit()
+
+            criados += len(lote)
+            decorrido = time.perf_counter() - inicio
+            print(f"  {criados}/{len(faltando)} usuários ({criados / decorrido:.0f}/s)", flush=True)
+
+    return criados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Provisiona mesas e usuários em massa")
+    parser.add_argument("config", help="arquivo JSON com 'mesas' e/ou 'usuarios'")
+    parser.add_argument("--so", choices=["mesas", "usuarios"], help="provisiona só uma das partes")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1, help="processos pro bcrypt")
+    args = parser.parse_args()
+
+    with open(args.config, encoding="utf-8") as arquivo:
+        config = json.load(arquivo)
+
+    db = SessionLocal()
+    try:
+        if args.so in (None, "mesas") and config.get("mesas"):
+            if provisionar_mesas(db, config["mesas"]):
+                print("Servidor rodando? POST /admin/mesas/recarregar_config pra ele enxergar as mesas novas.")
+        if args.so in (None, "usuarios") and config.get("usuarios"):
+            provisionar_usuarios(db, config["usuarios"], args.processos)
+    finally:
+        db.close()
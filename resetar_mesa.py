@@ -1,39 +1,59 @@
+import argparse
 from db.database import SessionLocal
 from db.models import Mesa, JogadorNaMesa, MesaStatus
+from game.config_mesas import carregar_configs
+from game.partida import iniciar_partida
+from game.snapshot_mesas import anular_mao, restaurar_mesas, carregar_mesas_em_jogo
+from sqlalchemy import update
+
+# Conserta mesas travadas. As escritas passam pelo SessionLocal: a versão das
+# mesas (game/estado_mesa.py) sobe junto e os workers no ar veem o estado novo.
+#   --restaurar   roda a mesma recuperação de antes de subir (python -m game.snapshot_mesas)
+#                 em todas as mesas em jogo: só mexe nas que estiverem em meio-estado
+#   mesa_ids      anula a mão em andamento das mesas indicadas (stacks voltam ao início
+#                 da mão) e começa outra se houver ao menos dois jogadores
+#python resetar_mesa.py --restaurar
+#python resetar_mesa.py 2 5
+
+parser = argparse.ArgumentParser(description="Reseta mesas travadas")
+parser.add_argument("mesa_ids", type=int, nargs="*")
+parser.add_argument("--restaurar", action="store_true", help="recupera pelo snapshot as mesas em meio-estado")
+args = parser.parse_args()
+
+if not args.mesa_ids and not args.restaurar:
+    parser.error("informe as mesas ou --restaurar")
 
-# ID da mesa que você quer resetar
-mesa_id = 1  # Altere para o ID da mesa desejada
-
-# Criar uma nova sessão
 db = SessionLocal()
-
-# Buscar a mesa
-mesa = db.query(Mesa).filter(Mesa.id == mesa_id).first()
-
-if mesa:
-    # Resetar status da mesa
-    mesa.status = MesaStatus.aberta if hasattr(MesaStatus, "aberta") else "aberta"
-
-    # Resetar valores de aposta
-    mesa.aposta_atual = 0
-    mesa.small_blind_pos = 1
-    mesa.big_blind_pos = 2
-    mesa.small_blind = 0.01
-    mesa.big_blind = 0.02
-
-    # Resetar os jogadores da mesa
-    for jogador in mesa.jogadores:
-        jogador.aposta_atual = 0
-        jogador.stack = jogador.saldo_restante  # Retorna para o stack inicial da entrada
-        jogador.status = "esperando"  # Se você estiver controlando status como 'ativo', 'esperando', etc.
-
-    # Commitar as mudanças
+carregar_configs(db)
+
+if args.restaurar:
+    restaurar_mesas(db)
+
+if args.mesa_ids:
+    em_jogo = {mesa.id: (mesa, jogadores, mao) for mesa, jogadores, mao, _ in carregar_mesas_em_jogo(db)}
+    trocas, recomecar = [], []
+    for mesa_id in args.mesa_ids:
+        if mesa_id in em_jogo:
+            mesa, jogadores, mao = em_jogo[mesa_id]
+        else:
+            mesa = db.query(Mesa).filter(Mesa.id == mesa_id).first()
+            if mesa is None:
+                print(f"Mesa {mesa_id} não encontrada.")
+                continue
+            jogadores, mao = db.query(JogadorNaMesa).filter_by(mesa_id=mesa_id).all(), None
+        trocas.extend(anular_mao(db, mesa, jogadores, mao))
+        if len(jogadores) >= 2:
+            recomecar.append(mesa_id)
+        print(f"Mesa {mesa_id}: mão anulada, {len(jogadores)} jogadores.")
+
+    db.flush()
+    if trocas:
+        db.execute(update(JogadorNaMesa), trocas)
     db.commit()
 
-    print(f"Mesa {mesa_id} resetada com sucesso e pronta para nova partida!")
-
-else:
-    print(f"Mesa com ID {mesa_id} não encontrada.")
+    for mesa in db.query(Mesa).filter(Mesa.id.in_(recomecar), Mesa.status == MesaStatus.aberta).all():
+        jogadores = db.query(JogadorNaMesa).filter_by(mesa_id=mesa.id).order_by(JogadorNaMesa.id).all()
+        iniciar_partida(mesa, jogadores, db)
+        print(f"Mesa {mesa.id}: nova mão iniciada.")
 
-# Fechar a sessão
 db.close()
@@ -1,48 +1,40 @@
 from fastapi import APIRouter, Depends, HTTPException, Form
-from fastapi.security import OAuth2PasswordBearer
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 
 from db.database import SessionLocal, get_db
 from db.models import User
-from api.auth import hash_password, verify_password, create_access_token, decode_access_token
-from api.schemas import UserCreate
-
-# Rotas de outros módulos
-from game.lobby import router as lobby_router
-from game.mesas import router as mesas_router
-from game.partida import router as partida_router
-from game.acoes import router as acoes_router
-from api.mercadopago_ipn import router as mp_router
-from api.historico_transacoes import router as historico_router
-from api.saque import router as saque_router
-from api.depositar import router as depositar_router
+from api.auth import create_access_token, get_current_user, UsuarioAutenticado
+from api.senhas import hash_senha, verificar_senha
+from api.schemas import UserCreate, SaldoOut
+from db.dinheiro import centavos_para_reais
+from api.carteira import saldo_usuario
 
+import importlib
 import logging
+import os
 
 router = APIRouter()
 
+# Rotas de outros módulos, por grupo. PANO_MODULOS escolhe os grupos montados
+# neste worker (ex: "jogo" num worker só de gameplay). Grupos fora da lista
+# nem são importados, então o worker sobe sem carregar o que não usa.
+GRUPOS_DE_ROTAS = {
+    "jogo": ["game.lobby", "game.mesas", "game.partida", "game.acoes", "game.torneios", "game.estatisticas", "game.dicas"],
+    "pagamentos": ["api.mercadopago_ipn", "api.historico_transacoes", "api.saque", "api.depositar", "api.pedidos_pagamento"],
+    "admin": ["api.admin"],
+    # Análises pesadas (NumPy): fora dos workers de gameplay com PANO_MODULOS=jogo
+    "analise": ["game.equidade"],
+}
+MODULOS_ATIVOS = [m.strip() for m in os.getenv("PANO_MODULOS", ",".join(GRUPOS_DE_ROTAS)).split(",") if m.strip()]
+
 # Inclui sub-rotas
-router.include_router(lobby_router)
-router.include_router(mesas_router)
-router.include_router(partida_router)
-router.include_router(acoes_router)
-router.include_router(mp_router)
-router.include_router(historico_router)
-router.include_router(saque_router)
-router.include_router(depositar_router)
-
-# Auth e user
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
-
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    payload = decode_access_token(token)
-    if payload is None:
-        raise HTTPException(status_code=401, detail="Token inválido ou expirado")
-    user = db.query(User).filter(User.username == payload["sub"]).first()
-    if user is None:
-        raise HTTPException(status_code=404, detail="Usuário não encontrado")
-    return user
+for grupo in MODULOS_ATIVOS:
+    for modulo in GRUPOS_DE_ROTAS[grupo]:
+        router.include_router(importlib.import_module(modulo).router)
+
+# Auth e user: a dependência get_current_user vem de api.auth (com cache)
 
 class UserInput(BaseModel):
     username: str
@@ -59,33 +51,49 @@ class LoginInput(BaseModel):
     username: str
     password: str
 
+def buscar_usuario_por_username(db: Session, username: str):
+    return db.query(User).filter(User.username == username).first()
+
+
+def salvar(db: Session, *objetos):
+    db.add_all(objetos)
+    db.commit()
+
+
+# register e login são async: o bcrypt roda no pool de senhas (api/senhas.py)
+# e as consultas curtas no threadpool, sem segurar worker enquanto o hash roda
 @router.post("/register")
-def register_user(request: RegisterRequest, db: Session = Depends(get_db)):
+async def register_user(request: RegisterRequest, db: Session = Depends(get_db)):
     logging.warning(f"📥 Chegou no backend: {request}")
-    existing_user = db.query(User).filter(User.username == request.username).first()
+    existing_user = await run_in_threadpool(buscar_usuario_por_username, db, request.username)
     if existing_user:
         raise HTTPException(status_code=400, detail="Usuário já existe")
 
     user = User(
         username=request.username,
         email=request.email,
-        password=hash_password(request.password),
+        password=await hash_senha(request.password),
     )
-    db.add(user)
-    db.commit()
+    await run_in_threadpool(salvar, db, user)
     return {"msg": "Usuário registrado com sucesso!"}
 
 
 @router.post("/login")
-def login_user(data: LoginInput, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == data.username).first()
+async def login_user(data: LoginInput, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(buscar_usuario_por_username, db, data.username)
 
     if not db_user:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
-    if not verify_password(data.password, db_user.password):
+    senha_ok, novo_hash = await verificar_senha(data.password, db_user.password)
+    if not senha_ok:
         raise HTTPException(status_code=401, detail="Senha inválida")
 
+    if novo_hash:
+        # Hash com custo antigo: grava o novo aproveitando que temos a senha em mãos
+        db_user.password = novo_hash
+        await run_in_threadpool(salvar, db, db_user)
+
     access_token = create_access_token(user_id=db_user.id)
 
     return {
@@ -94,8 +102,8 @@ def login_user(data: LoginInput, db: Session = Depends(get_db)):
         "token_type": "bearer"
     }
 
-@router.get("/balance")
-def get_balance(current_user: User = Depends(get_current_user)):
-    return {"balance": current_user.balance}
+@router.get("/balance", response_model=SaldoOut)
+def get_balance(current_user: UsuarioAutenticado = Depends(get_current_user), db: Session = Depends(get_db)):
+    return {"balance": centavos_para_reais(saldo_usuario(db, current_user.id))}
 
 
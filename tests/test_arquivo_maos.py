@@ -0,0 +1,54 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from db.database import Base
+from db.models import Mao, AcaoMao
+from game import arquivo_maos
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def test_acoes_intercaladas_de_mesas_simultaneas_vao_todas_pro_arquivo(tmp_path, monkeypatch):
+    monkeypatch.setattr(arquivo_maos, "ARQUIVO_DIR", str(tmp_path))
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+
+    agora = datetime(2025, 4, 20, 12, 0)
+    db.add_all([
+        Mao(id=10, mesa_id=1, numero=1, iniciada_em=agora, finalizada_em=agora, arquivada=False),
+        Mao(id=11, mesa_id=2, numero=1, iniciada_em=agora, finalizada_em=agora, arquivada=False),
+    ])
+    # Duas mesas jogando ao mesmo tempo: ids das ações intercalam entre as mãos
+    for i, mao_id in enumerate([10, 11, 10, 11, 10], start=1):
+        db.add(AcaoMao(id=i, mao_id=mao_id, user_id=1, acao="call", valor=i, rodada="pre-flop", created_at=agora))
+    db.commit()
+
+    assert arquivo_maos.arquivar_maos(db) == 2
+
+    acoes = pq.read_table(str(tmp_path / "acoes")).to_pydict()
+    por_mao = {}
+    for mao_id, acao_id in zip(acoes["mao_id"], acoes["id"]):
+        por_mao.setdefault(mao_id, []).append(acao_id)
+    assert por_mao == {10: [1, 3, 5], 11: [2, 4]}
+
+
+def test_arquivamento_simultaneo_nao_duplica_o_lote(tmp_path, monkeypatch):
+    monkeypatch.setattr(arquivo_maos, "ARQUIVO_DIR", str(tmp_path))
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    agora = datetime.utcnow()  # dentro da retenção: a poda não apaga
+    db.add(Mao(id=1, mesa_id=1, numero=1, iniciada_em=agora, finalizada_em=agora, arquivada=False))
+    db.commit()
+
+    # Outro worker segurando a trava: este pula o ciclo sem ler nem escrever nada
+    with arquivo_maos._trava_de_arquivamento() as travou:
+        assert travou
+        arquivo_maos.arquivar_e_podar(db)
+    assert not (tmp_path / "maos").exists()
+    assert db.query(Mao).filter(Mao.arquivada.is_(False)).count() == 1
+
+    arquivo_maos.arquivar_e_podar(db)
+    assert db.query(Mao).filter(Mao.arquivada.is_(True)).count() == 1
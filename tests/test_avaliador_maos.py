@@ -0,0 +1,20 @@
+import random
+from game.avaliador_maos import avaliar_mao, categoria_da_mao, CARTAS, RANKING
+
+
+def test_flush_com_dez():
+    mao = ["10♠", "7♠", "4♠", "2♠", "K♠", "3♦", "9♣"]
+    assert avaliar_mao(mao) == (RANKING["flush"], [11, 8, 5, 2, 0])
+
+
+def test_as_fora_da_sequencia_nao_faz_royal():
+    assert avaliar_mao(["A♠", "9♠", "8♠", "7♠", "6♠", "5♠", "2♣"])[0] == RANKING["straight_flush"]
+    assert avaliar_mao(["10♥", "J♥", "Q♥", "K♥", "A♥", "2♣", "3♦"])[0] == RANKING["royal_flush"]
+
+
+def test_showdown_e_dicas_dao_a_mesma_categoria():
+    baralho = list(CARTAS)
+    sorteio = random.Random(7)
+    for _ in range(3000):
+        mao = sorteio.sample(baralho, sorteio.choice([5, 6, 7]))
+        assert avaliar_mao(mao)[0] == categoria_da_mao(mao), mao
@@ -0,0 +1,43 @@
+import threading
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from db.database import Base
+from api.carteira import lancar, debitar_usuario, saldo_usuario, conta_usuario, SaldoInsuficiente, CONTA_BONUS
+
+
+def test_debitos_simultaneos_nao_gastam_o_mesmo_saldo(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'carteira.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Sessao = sessionmaker(bind=engine)
+
+    db = Sessao()
+    lancar(db, CONTA_BONUS, conta_usuario(1), 100, "bonus")
+    db.commit()
+
+    # Primeiro débito ainda sem commit quando o segundo começa (dois workers, mesma conta)
+    primeiro = Sessao()
+    debitar_usuario(primeiro, 1, "mesa:1", 70, "buy_in")
+
+    resultado = {}
+
+    def segundo_debito():
+        segundo = Sessao()
+        try:
+            debitar_usuario(segundo, 1, "mesa:2", 70, "buy_in")
+            segundo.commit()
+            resultado["segundo"] = "debitou"
+        except SaldoInsuficiente:
+            segundo.rollback()
+            resultado["segundo"] = "saldo insuficiente"
+        finally:
+            segundo.close()
+
+    concorrente = threading.Thread(target=segundo_debito)
+    concorrente.start()
+    time.sleep(0.3)
+    primeiro.commit()
+    concorrente.join()
+
+    assert resultado["segundo"] == "saldo insuficiente"
+    assert saldo_usuario(db, 1) == 30
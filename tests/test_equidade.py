@@ -0,0 +1,35 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+from game import equidade as eq  # noqa: E402
+
+
+def _forca_bruta(faixa_a: str, faixa_b: str, mesa: list[str]) -> tuple[float, float]:
+    pesos_a, pesos_b = eq.pesos_da_faixa(faixa_a), eq.pesos_da_faixa(faixa_b)
+    cartas_mesa = [eq.INDICE[c] for c in mesa]
+    vitorias = empates = total = 0.0
+    for a in np.flatnonzero(pesos_a):
+        for b in np.flatnonzero(pesos_b):
+            mao_a, mao_b = [int(c) for c in eq.COMBOS[a]], [int(c) for c in eq.COMBOS[b]]
+            if len(set(mao_a + mao_b + cartas_mesa)) < 4 + len(cartas_mesa):
+                continue
+            peso = pesos_a[a] * pesos_b[b]
+            pa, pb = eq.pontuar(np.array([cartas_mesa + mao_a, cartas_mesa + mao_b]))
+            total += peso
+            vitorias += peso * (pa > pb)
+            empates += peso * (pa == pb)
+    return (vitorias + empates / 2) / total, empates / total
+
+
+@pytest.mark.parametrize("faixa_a, faixa_b", [
+    ("TT+", "AK"),
+    ("AA,KK:0.5,AKs", "AA,KK,QQ,AK:0.3"),  # faixas com as mesmas combinações e pesos
+    ("22+,AK,T9s", "22+,AK,T9s:0.7"),
+])
+def test_equidade_no_river_bate_com_forca_bruta(faixa_a, faixa_b):
+    mesa = ["A♥", "10♣", "2♦", "K♦", "5♠"]
+    resultado = eq.equidade(faixa_a, faixa_b, mesa)
+    equidade_a, empate = _forca_bruta(faixa_a, faixa_b, mesa)
+    assert resultado["exato"]
+    assert resultado["equidade_a"] == pytest.approx(equidade_a, abs=1e-6)
+    assert resultado["empate"] == pytest.approx(empate, abs=1e-6)
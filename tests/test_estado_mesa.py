@@ -0,0 +1,45 @@
+import orjson
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from db.database import Base, SessionLocal
+from db.models import Mesa
+from game import estado_mesa
+
+
+def _gerar(db, mesa_id):
+    def gerar():
+        mesa = db.query(Mesa).filter(Mesa.id == mesa_id).one()
+        return {"mesa": {"rodada": mesa.estado_da_rodada, "aposta_atual": mesa.aposta_atual}, "assentos": {}}
+    return gerar
+
+
+def test_estado_versionado_ve_o_commit_feito_por_outra_sessao():
+    # Um banco só, como os workers do uvicorn: cada sessão faz o papel de um processo
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    escrita = SessionLocal(bind=engine)
+    leitura = SessionLocal(bind=engine)
+
+    escrita.add(Mesa(id=77, nome="Teste", small_blind=1, big_blind=2, aposta_atual=0))
+    escrita.commit()
+    antes = orjson.loads(estado_mesa.estado_versionado(leitura, 77, None, _gerar(leitura, 77)))
+    assert antes["completo"] and antes["mesa"]["rodada"] == "pre-flop"
+
+    mesa = escrita.get(Mesa, 77)
+    mesa.estado_da_rodada = "flop"
+    mesa.aposta_atual = 40
+    escrita.commit()
+    leitura.expire_all()
+
+    depois = orjson.loads(estado_mesa.estado_versionado(leitura, 77, antes["versao"], _gerar(leitura, 77)))
+    assert depois["versao"] == escrita.get(Mesa, 77).versao > antes["versao"]
+    assert depois["base"] == antes["versao"]
+    assert depois["mesa"] == {"rodada": "flop", "aposta_atual": 40}
+
+    # Versão sobe junto com a escrita e volta com o rollback
+    mesa.aposta_atual = 80
+    escrita.flush()
+    escrita.rollback()
+    leitura.expire_all()
+    igual = orjson.loads(estado_mesa.estado_versionado(leitura, 77, depois["versao"], _gerar(leitura, 77)))
+    assert igual["versao"] == depois["versao"] and "mesa" not in igual
@@ -0,0 +1,28 @@
+from datetime import datetime
+from sqlalchemy import create_engine
+from db.database import Base, SessionLocal
+from db.models import Mesa, Mao
+from game.estatisticas import acumulador, CAMPOS, CALLS, INVESTIDO
+from game.historico_maos import registrar_acao
+
+
+def test_acao_desfeita_por_rollback_nao_conta_nas_estatisticas():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = SessionLocal(bind=engine)
+    mesa = Mesa(id=5, nome="Teste", small_blind=1, big_blind=2, estado_da_rodada="flop")
+    db.add_all([mesa, Mao(mesa_id=5, numero=1, iniciada_em=datetime.utcnow())])
+    db.commit()
+    acumulador.retirar()
+
+    registrar_acao(db, mesa, 42, "call", 10)
+    assert acumulador.pendentes(42) is None  # nada antes do commit
+    db.rollback()
+    assert acumulador.pendentes(42) is None
+
+    registrar_acao(db, mesa, 42, "call", 10)
+    db.commit()
+    esperado = [0] * len(CAMPOS)
+    esperado[CALLS], esperado[INVESTIDO] = 1, 10
+    assert acumulador.pendentes(42) == esperado
+    acumulador.retirar()
@@ -0,0 +1,16 @@
+from starlette.requests import Request
+from api import limites
+
+
+def _request(ip: str, encaminhado: str | None = None) -> Request:
+    cabecalhos = [(b"x-forwarded-for", encaminhado.encode())] if encaminhado else []
+    return Request({"type": "http", "client": (ip, 5000), "headers": cabecalhos, "path_params": {}})
+
+
+def test_x_forwarded_for_so_vale_vindo_de_proxy_confiavel(monkeypatch):
+    monkeypatch.setattr(limites, "PROXIES_CONFIAVEIS", {"10.0.0.2"})
+    # Direto da internet: cabeçalho ignorado, senão cada requisição teria balde novo
+    assert limites.ip_do_cliente(_request("203.0.113.9", "1.2.3.4")) == "203.0.113.9"
+    # Pelo proxy: vale o último endereço que ele anotou, não o que o cliente inventou à esquerda
+    assert limites.ip_do_cliente(_request("10.0.0.2", "1.2.3.4, 198.51.100.7")) == "198.51.100.7"
+    assert limites.ip_do_cliente(_request("10.0.0.2")) == "10.0.0.2"
@@ -0,0 +1,39 @@
+from game.torneios import BalanceadorDeMesas
+
+
+def _balanceador(contagens: dict[int, int], jogadores_por_mesa: int = 9) -> BalanceadorDeMesas:
+    balanceador = BalanceadorDeMesas(jogadores_por_mesa)
+    for mesa_id, jogadores in contagens.items():
+        balanceador.adicionar(mesa_id, jogadores)
+    return balanceador
+
+
+def test_eliminacao_na_mesa_em_quebra_cancela_o_movimento_pendente():
+    balanceador = _balanceador({1: 6, 2: 6, 3: 7})
+    balanceador.eliminar(3)
+    movimentos = balanceador.balancear()
+    origem = movimentos[0][0]
+    assert {o for o, _ in movimentos} == {origem} and len(movimentos) == 6
+    for o, destino in movimentos:
+        balanceador.adiar(o, destino)  # a mesa quebrada está no meio de uma mão
+
+    balanceador.eliminar(origem)
+
+    assert balanceador.total == 17
+    assert len(balanceador.pendentes[origem]) == 5
+    assert sum(balanceador.contagem.values()) == 17
+    assert sum(balanceador.chegando.values()) == 5
+    assert len(balanceador.retirar_pendentes(origem)) == 5
+    assert balanceador.chegando == {}
+
+
+def test_mesa_com_jogadores_a_caminho_nao_e_quebrada():
+    balanceador = _balanceador({1: 3, 2: 6, 3: 9})
+    balanceador.adiar(3, 1)
+    balanceador._somar(3, -1)
+    balanceador._somar(1, 1)
+    balanceador.eliminar(3)
+    # Cabem em duas mesas, mas a 1 (a menor) ainda espera alguém da 3
+    movimentos = balanceador.balancear()
+    assert all(origem != 1 for origem, _ in movimentos)
+    assert 1 in balanceador.contagem